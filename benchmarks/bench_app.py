@@ -0,0 +1,5 @@
+"""ASGI entrypoint for the load test: the regular app plus the stub processors."""
+
+import stubs  # noqa: F401  registers the stub processors
+
+from ocrorchestrator.main import app  # noqa: E402, F401
@@ -0,0 +1,79 @@
+"""
+Compare response field projection strategies on a large offline result.
+
+_format_response used to build a new pydantic model class per item; it
+now projects plain dicts. The cached-model variant is what
+create_dynamic_message does for any remaining callers.
+
+    pdm run python benchmarks/bench_projection.py -n 1000 --fields 8
+"""
+
+import argparse
+import statistics
+import time
+
+from pydantic import create_model
+
+from ocrorchestrator.config.app_config import FieldInfo
+from ocrorchestrator.utils.misc import create_dynamic_message, project_fields
+
+
+def uncached_model(resp, fields):
+    # The previous implementation: one model class per call
+    field_definitions = {
+        field.name: (type(resp[field.name]), ...)
+        for field in fields
+        if field.name in resp
+    }
+    DynamicMessage = create_model("DynamicMessage", **field_definitions)
+    return DynamicMessage(**resp)
+
+
+def make_results(n: int, num_fields: int):
+    return [
+        {
+            **{f"field_{i}": f"value {j} {i}" for i in range(num_fields)},
+            "total_amount": 100.0 + j,
+            "is_signed": j % 2 == 0,
+            "page": j,
+        }
+        for j in range(n)
+    ]
+
+
+def bench(fn, results, fields, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for r in results:
+            fn(r, fields)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=1000, help="items per result")
+    parser.add_argument("--fields", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = make_results(args.n, args.fields)
+    fields = [FieldInfo(name=f"field_{i}") for i in range(0, args.fields, 2)]
+    fields += [FieldInfo(name="total_amount"), FieldInfo(name="page")]
+
+    for name, fn in [
+        ("create_model per item", uncached_model),
+        ("cached model", create_dynamic_message),
+        ("dict projection", project_fields),
+    ]:
+        timings = bench(fn, results, fields, args.repeat)
+        print(
+            f"{name:<22} median={statistics.median(timings):9.2f}ms "
+            f"min={min(timings):9.2f}ms  per item="
+            f"{statistics.median(timings) * 1000 / args.n:8.2f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare per-call repo construction with the shared RepoFactory registry.
+
+Each iteration resolves the save location and writes one small JSON
+result, which is what BaseProcessor.process does for every request with
+save_options.
+
+    pdm run python benchmarks/bench_repo_saves.py --uri gs://my-bucket/bench/
+    pdm run python benchmarks/bench_repo_saves.py --uri file://my-bucket/bench/
+
+Point STORAGE_EMULATOR_HOST at a fake-gcs-server to run without GCP.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from urllib.parse import urlparse
+
+from ocrorchestrator.repos import GCSRepo, LocalRepo
+from ocrorchestrator.repos.factory import RepoFactory
+from ocrorchestrator.utils.constants import LOCAL_DIR, LOCAL_REPO
+
+
+def fresh_repo(uri: str):
+    # Mirrors the old behaviour: a brand new repo (and storage client) per call
+    parsed = urlparse(uri)
+    prefix = parsed.path.lstrip("/")
+    if parsed.scheme == "gs":
+        from google.cloud import storage
+
+        return GCSRepo(parsed.netloc, LOCAL_DIR, client=storage.Client()), prefix
+    homedir = os.path.join(LOCAL_REPO, parsed.netloc)
+    return LocalRepo(homedir, homedir), prefix
+
+
+def shared_repo(uri: str):
+    return RepoFactory.from_uri(uri, read_prefix=False)
+
+
+def run(uri: str, n: int, resolve) -> list:
+    payload = json.dumps({"field": "value", "amount": 123.45})
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        repo, prefix = resolve(uri)
+        repo.save_file(f"{prefix}{i}.json", payload)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(name: str, latencies: list):
+    latencies = sorted(latencies)
+    total = sum(latencies) / 1000
+    print(
+        f"{name:>8}: n={len(latencies)} total={total:.2f}s "
+        f"throughput={len(latencies) / total:.1f}/s "
+        f"p50={statistics.median(latencies):.2f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1]:.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uri", default="file://my-bucket/bench/")
+    parser.add_argument("-n", type=int, default=1000)
+    args = parser.parse_args()
+    uri = args.uri.rstrip("/") + "/"
+
+    summarize("fresh", run(uri, args.n, fresh_repo))
+    summarize("shared", run(uri, args.n, shared_repo))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,556 @@
+"""
+Load test the API end to end with stub processors.
+
+Starts the app under uvicorn with a generated config whose tasks use the
+stubs in benchmarks/stubs.py (a fake LLM with configurable latency,
+resnet18 on CPU, ApiProcessor against a local fake API), drives
+/predict (also routed over a fast, flaky and a slow fake endpoint),
+/predict_stream, /predict_batch, /predict_offline (also with packed LLM
+calls) and /update_config at the given concurrency, and reports
+throughput, latency percentiles (and time to first streamed field) and
+the server's peak RSS, plus the routed task's endpoint stats.
+
+    pdm run python benchmarks/load_test.py --concurrency 16 --requests 500
+    pdm run python benchmarks/load_test.py --save-baseline
+    pdm run python benchmarks/load_test.py --compare
+    pdm run python benchmarks/load_test.py --server-env LOG_ASYNC=0
+
+Baselines live in benchmarks/baselines/<name>.json and are recorded with
+--save-baseline on the machine that later runs --compare (see
+benchmarks/baselines/README.md). --compare exits with status 1 when any
+scenario's p95 latency, throughput or RSS is worse than the baseline by
+more than --tolerance, or when the baseline is missing.
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import yaml
+from PIL import Image, ImageDraw
+
+from ocrorchestrator.utils.constants import LOCAL_REPO
+
+BENCH_DIR = Path(__file__).parent
+BASELINE_DIR = BENCH_DIR / "baselines"
+WORKSPACE = "bench"  # under LOCAL_REPO, i.e. file://bench/...
+APP_PREFIX = "/ocrorchestrator"
+
+
+class FakeApiServer:
+    """JSON echo endpoint for ApiProcessor that answers after `latency_ms`."""
+
+    def __init__(self, latency_ms: float):
+        latency = latency_ms / 1000
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(latency)
+                body = json.dumps({"text": "stub", "confidence": 0.99}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/predict"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_image(idx: int, size=(1240, 1754)) -> bytes:
+    # A4 at 150 dpi with a few lines of "text", close to a scanned page
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for line in range(40):
+        y = 80 + line * 40
+        draw.text((80, y), f"Document {idx} line {line} " * 4, fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def prepare_workspace(args, api_url: str) -> Path:
+    root = Path(LOCAL_REPO) / WORKSPACE
+    shutil.rmtree(root, ignore_errors=True)
+    for sub in ("configs", "prompts", "images"):
+        (root / sub).mkdir(parents=True)
+
+    shutil.copy(
+        Path(LOCAL_REPO) / "my-bucket" / "prompts" / "general.txt",
+        root / "prompts" / "general.txt",
+    )
+    for i in range(args.offline_files):
+        (root / "images" / f"page_{i:03d}.png").write_bytes(make_image(i))
+
+    config = {
+        "categories": {
+            "bench": {
+                "llm": {
+                    "processor": "FakeLLMProcessor",
+                    "prompt_template": "general.txt",
+                    "model": "fake",
+                    "params": [{"latency_ms": args.llm_latency_ms}],
+                },
+                "llm_packed": {
+                    "processor": "FakeLLMProcessor",
+                    "prompt_template": "general.txt",
+                    "model": "fake",
+                    "params": [
+                        {
+                            "latency_ms": args.llm_latency_ms,
+                            "batch_size": args.llm_pack_size,
+                        }
+                    ],
+                },
+                # Fast endpoint hitting its quota now and then, slow one
+                # with spare capacity
+                "llm_routed": {
+                    "processor": "FakeLLMProcessor",
+                    "prompt_template": "general.txt",
+                    "endpoints": [
+                        {
+                            "model": "fake",
+                            "location": "region-a",
+                            "params": {
+                                "latency_ms": args.llm_latency_ms,
+                                "error_rate": args.llm_quota_error_rate,
+                            },
+                        },
+                        {
+                            "model": "fake",
+                            "location": "region-b",
+                            "params": {"latency_ms": args.llm_latency_ms * 3},
+                        },
+                    ],
+                },
+                "classifier": {
+                    "processor": "StubClassifierProcessor",
+                    "model": "resnet18",
+                    "classes": ["blanks", "blurs", "clean", "dirty"],
+                },
+                "api": {
+                    "processor": "ApiProcessor",
+                    "api": api_url,
+                    "params": [{"image": "$image", "guid": "$guid"}],
+                },
+            }
+        }
+    }
+    (root / "configs" / "config.yaml").write_text(yaml.safe_dump(config))
+    return root
+
+
+@dataclass
+class Scenario:
+    name: str
+    path: str
+    body: Callable[[int], Dict[str, Any]]
+    max_concurrency: Optional[int] = None
+    requests: Optional[int] = None
+    stream: bool = False  # NDJSON response, also time the first field event
+
+
+def build_scenarios(args, images: List[str]) -> List[Scenario]:
+    def predict(task: str, **extra):
+        return lambda i: {
+            "image": images[i % len(images)],
+            "category": "bench",
+            "task": task,
+            "log_result": False,
+            **extra,
+        }
+
+    fields = ["invoice_no", "issue_date", "total_amount", "is_signed"]
+    return [
+        Scenario("predict_llm", "/predict", predict("llm", fields=fields)),
+        Scenario(
+            "predict_stream",
+            "/predict_stream",
+            predict("llm", fields=fields),
+            stream=True,
+        ),
+        Scenario(
+            "predict_llm_routed",
+            "/predict",
+            predict("llm_routed", fields=fields),
+        ),
+        Scenario("predict_classifier", "/predict", predict("classifier")),
+        Scenario("predict_api", "/predict", predict("api")),
+        Scenario(
+            "predict_batch",
+            "/predict_batch",
+            lambda i: {
+                "category": "bench",
+                "task": "classifier",
+                "log_result": False,
+                "items": [
+                    {"image": images[(i + j) % len(images)]}
+                    for j in range(args.batch_size)
+                ],
+            },
+            requests=max(1, args.requests // args.batch_size),
+        ),
+        Scenario(
+            "predict_offline",
+            "/predict_offline",
+            lambda i: {
+                "location": f"file://{WORKSPACE}/images/",
+                "category": "bench",
+                "task": "llm",
+                "fields": fields,
+                "patterns": ["*.png"],
+                "save_options": {"path": f"file://{WORKSPACE}/output/{i}/"},
+                "resume": False,
+                "log_result": False,
+            },
+            requests=max(1, args.requests // args.offline_files),
+        ),
+        Scenario(
+            "predict_offline_packed",
+            "/predict_offline",
+            lambda i: {
+                "location": f"file://{WORKSPACE}/images/",
+                "category": "bench",
+                "task": "llm_packed",
+                "fields": fields,
+                "patterns": ["*.png"],
+                "save_options": {"path": f"file://{WORKSPACE}/output/packed/{i}/"},
+                "resume": False,
+                "log_result": False,
+            },
+            requests=max(1, args.requests // args.offline_files),
+        ),
+        # Every refresh tears down and rebuilds all processors
+        Scenario(
+            "update_config",
+            "/update_config",
+            lambda i: {"config_file": "configs/config.yaml"},
+            max_concurrency=1,
+            requests=args.config_updates,
+        ),
+    ]
+
+
+class RssSampler:
+    """Peak resident set size of a process, sampled from /proc (Linux only)."""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _read_kb(self) -> int:
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, self._read_kb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_kb = max(self.peak_kb, self._read_kb())
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    first_fields: List[float] = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def post_stream(i: int, start: float) -> bool:
+        url = APP_PREFIX + scenario.path
+        async with client.stream("POST", url, json=scenario.body(i)) as resp:
+            ok = resp.status_code == 200
+            first = True
+            async for line in resp.aiter_lines():
+                event = json.loads(line)
+                if event["event"] == "field" and first:
+                    first_fields.append((time.perf_counter() - start) * 1000)
+                    first = False
+                ok = ok and event["event"] != "error"
+        return ok
+
+    async def worker():
+        nonlocal errors
+        for i in pending:
+            start = time.perf_counter()
+            try:
+                if scenario.stream:
+                    ok = await post_stream(i, start)
+                else:
+                    resp = await client.post(
+                        APP_PREFIX + scenario.path, json=scenario.body(i)
+                    )
+                    ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        **(
+            {"p50_first_field_ms": round(percentile(first_fields, 50), 3)}
+            if first_fields
+            else {}
+        ),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(
+    port: int,
+    log_path: Path,
+    timeout: float,
+    extra_env: Dict[str, str],
+) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "CONFIG_PATH": f"file://{WORKSPACE}/configs/config.yaml",
+        "CUDA_VISIBLE_DEVICES": "",  # resnet18 on CPU
+        **extra_env,
+    }
+    cmd = [
+        sys.executable, "-m", "uvicorn", "bench_app:app",
+        "--app-dir", str(BENCH_DIR),
+        "--host", "127.0.0.1",
+        "--port", str(port),
+        "--log-level", "warning",
+    ]  # fmt: skip
+    log_file = open(log_path, "wb")
+    proc = subprocess.Popen(cmd, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    log_file.close()
+
+    deadline = time.monotonic() + timeout
+    url = f"http://127.0.0.1:{port}{APP_PREFIX}/metrics"
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with {proc.returncode}, see {log_path}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError(f"Server not ready after {timeout}s, see {log_path}")
+
+
+async def run_all(args, base_url: str, scenarios: List[Scenario], pid: int):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    timeout = httpx.Timeout(args.request_timeout)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        for scenario in scenarios:
+            concurrency = min(args.concurrency, scenario.max_concurrency or args.concurrency)
+            requests = scenario.requests or args.requests
+            if args.warmup:
+                await run_scenario(client, scenario, args.warmup, concurrency)
+            with RssSampler(pid) as rss:
+                stats = await run_scenario(client, scenario, requests, concurrency)
+            stats["peak_rss_mb"] = round(rss.peak_kb / 1024, 1)
+            results[scenario.name] = stats
+            print(f"{scenario.name:<20} {format_stats(stats)}", flush=True)
+        if "predict_llm_routed" in results:
+            resp = await client.get("/ocrorchestrator/usage")
+            for endpoint in resp.json()["endpoints"].get("bench__llm_routed", []):
+                print(f"  endpoint {json.dumps(endpoint)}", flush=True)
+    return results
+
+
+def format_stats(stats: Dict[str, Any]) -> str:
+    return (
+        f"n={stats['requests']:<5} c={stats['concurrency']:<3} "
+        f"rps={stats['throughput_rps']:>9.2f}  p50={stats['p50_ms']:>9.1f}ms  "
+        f"p95={stats['p95_ms']:>9.1f}ms  p99={stats['p99_ms']:>9.1f}ms  "
+        f"rss={stats['peak_rss_mb']:>7.1f}MB  errors={stats['errors']}"
+    )
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions = []
+    for name, base in baseline["scenarios"].items():
+        current = results.get(name)
+        if current is None:
+            continue
+        checks = [
+            ("p95_ms", current["p95_ms"] > base["p95_ms"] * (1 + tolerance)),
+            ("peak_rss_mb", current["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance)),
+            ("throughput_rps", current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance)),
+        ]  # fmt: skip
+        for metric, regressed in checks:
+            if regressed:
+                regressions.append(
+                    f"{name}.{metric}: {current[metric]} vs baseline {base[metric]}"
+                )
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{name}.errors: {current['errors']} vs {base['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="per scenario")
+    parser.add_argument("--scenarios", nargs="*", help="subset to run, default all")
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--api-latency-ms", type=float, default=50)
+    parser.add_argument("--offline-files", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--llm-pack-size", type=int, default=8)
+    parser.add_argument(
+        "--llm-quota-error-rate",
+        type=float,
+        default=0.05,
+        help="share of quota errors on the routed task's fast endpoint",
+    )
+    parser.add_argument("--config-updates", type=int, default=5)
+    parser.add_argument("--request-timeout", type=float, default=300)
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument(
+        "--server-env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="extra server environment, e.g. LOG_ASYNC=0",
+    )
+    parser.add_argument("--name", default="load_test", help="baseline name")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--output", help="also write the results as JSON here")
+    args = parser.parse_args()
+
+    baseline_path = BASELINE_DIR / f"{args.name}.json"
+    if args.compare and not baseline_path.exists():
+        # Checked before the run, which takes minutes
+        sys.exit(
+            f"No baseline at {baseline_path}. Record one on this machine with "
+            f"--save-baseline (see {BASELINE_DIR / 'README.md'})."
+        )
+
+    api = FakeApiServer(args.api_latency_ms)
+    root = prepare_workspace(args, api.url)
+    images = [
+        base64.b64encode(p.read_bytes()).decode()
+        for p in sorted((root / "images").glob("*.png"))
+    ]
+    scenarios = build_scenarios(args, images)
+    if args.scenarios:
+        scenarios = [s for s in scenarios if s.name in args.scenarios]
+
+    port = free_port()
+    log_path = root / "server.log"
+    print(f"Starting server on :{port} (log: {log_path})", flush=True)
+    server_env = dict(item.split("=", 1) for item in args.server_env)
+    proc = start_server(port, log_path, args.startup_timeout, server_env)
+    try:
+        results = asyncio.run(
+            run_all(args, f"http://127.0.0.1:{port}", scenarios, proc.pid)
+        )
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        api.stop()
+
+    report = {
+        "settings": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "llm_latency_ms": args.llm_latency_ms,
+            "api_latency_ms": args.api_latency_ms,
+            "offline_files": args.offline_files,
+            "batch_size": args.batch_size,
+            "server_env": server_env,
+        },
+        "scenarios": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Saved baseline to {baseline_path}")
+    if args.compare:
+        baseline = json.loads(baseline_path.read_text())
+        if baseline["settings"] != report["settings"]:
+            print("Warning: settings differ from the baseline", baseline["settings"])
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
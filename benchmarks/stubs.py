@@ -0,0 +1,199 @@
+"""
+Stub processors for the load test.
+
+Registered with ProcessorFactory on import, so a config can name them like
+any built-in processor. They keep the real request path (decoding, prompt
+and parser building, output parsing, saving) and only replace the parts
+that need GCP or a trained checkpoint.
+"""
+
+import json
+import random
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from ocrorchestrator.datamodels.api_io import OCRRequest
+from ocrorchestrator.processors import BaseProcessor, LLMProcessor
+from ocrorchestrator.processors.factory import ProcessorFactory
+from ocrorchestrator.utils.constants import IMG_SIZE
+from ocrorchestrator.utils.img import request_image
+from ocrorchestrator.utils.metrics import phase
+from ocrorchestrator.utils.mixins import TorchClassifierMixin
+
+_FAKE_VALUES = {list: [], bool: True, int: 1, float: 1.0, dict: {}}
+
+
+class FakeQuotaError(Exception):
+    """Stands in for google.api_core's ResourceExhausted."""
+
+    code = 429
+
+
+class FakeChatModel:
+    """
+    Stands in for ChatVertexAI: waits `latency_ms`, then answers with
+    `respond`. `error_rate` is the share of calls failing with a quota error.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float,
+        respond: Callable[[List[Any]], str],
+        error_rate: float = 0.0,
+    ):
+        self.latency_ms = latency_ms
+        self.respond = respond
+        self.error_rate = error_rate
+
+    def _check_quota(self):
+        if random.random() < self.error_rate:
+            raise FakeQuotaError("429 Quota exceeded (fake)")
+
+    @staticmethod
+    def _usage(messages, answer: str) -> Dict[str, int]:
+        # Rough counts, about 4 characters per token and 258 per image
+        content = messages[0].content
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        input_tokens = sum(
+            len(part["text"]) // 4 if part["type"] == "text" else 258
+            for part in content
+        )
+        output_tokens = len(answer) // 4
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+
+    def invoke(self, messages, **kwargs) -> AIMessage:
+        time.sleep(self.latency_ms / 1000)
+        self._check_quota()
+        answer = self.respond(messages)
+        return AIMessage(content=answer, usage_metadata=self._usage(messages, answer))
+
+    def stream(
+        self, messages, chunk_chars: int = 16, **kwargs
+    ) -> Iterator[AIMessageChunk]:
+        """The same answer in small chunks, with the latency spread over them."""
+        self._check_quota()
+        answer = self.respond(messages)
+        chunks = [
+            answer[i : i + chunk_chars] for i in range(0, len(answer), chunk_chars)
+        ]
+        for i, chunk in enumerate(chunks):
+            time.sleep(self.latency_ms / 1000 / len(chunks))
+            last = i == len(chunks) - 1
+            yield AIMessageChunk(
+                content=chunk,
+                usage_metadata=self._usage(messages, answer) if last else None,
+            )
+
+
+@ProcessorFactory.register
+class FakeLLMProcessor(LLMProcessor):
+    """
+    LLMProcessor backed by FakeChatModel. The answer is a JSON object with
+    a placeholder value for every field its prompt asks for, keyed
+    by document label for packed calls. `fail_packed` drops that share of
+    the packed outputs, to exercise the per-image fallback. With
+    `endpoints`, each one is a fake model whose `latency_ms` and
+    `error_rate` can be set in its params.
+
+    params: [{latency_ms: 500, batch_size: 8, fail_packed: 0.1}]
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._parsers: Dict[str, Any] = {}  # by prompt, for tasks without fields
+
+    def create_chat_model(
+        self,
+        model_name: str,
+        location: Optional[str] = None,
+        **model_config,
+    ) -> FakeChatModel:
+        kwargs = self.task_config.kwargs
+        return FakeChatModel(
+            model_config.get("latency_ms", kwargs.get("latency_ms", 500)),
+            self._fake_answer,
+            model_config.get("error_rate", kwargs.get("error_rate", 0.0)),
+        )
+
+    def _compile_prompt(self, key):
+        output_parser, prompt = super()._compile_prompt(key)
+        self._parsers[prompt] = output_parser
+        return output_parser, prompt
+
+    def _answer_parser(self, text: str) -> Any:
+        """The parser whose prompt, or format instructions (fix calls), `text` has."""
+        parsers = dict(self._parsers)
+        if self.fields:
+            parsers[self.prompt_temp] = self.output_parser
+        for prompt, output_parser in parsers.items():
+            if text.endswith(prompt):
+                return output_parser
+        for output_parser in parsers.values():
+            if self.format_instructions(output_parser) in text:
+                return output_parser
+        raise ValueError("Fake model got an unknown prompt")
+
+    def _fake_answer(self, messages: List[Any]) -> str:
+        content = messages[0].content
+        text = content if isinstance(content, str) else content[-1]["text"]
+        fields = self._answer_parser(text).pydantic_object.model_fields
+        output = {
+            name: _FAKE_VALUES.get(field.annotation, "stub")
+            for name, field in fields.items()
+        }
+        if isinstance(content, str):
+            return json.dumps(output)  # text-only fix call
+        images = sum(1 for part in content if part["type"] == "image_url")
+        if images == 1:
+            return json.dumps(output)
+        fail_packed = self.task_config.kwargs.get("fail_packed", 0.0)
+        return json.dumps(
+            {
+                f"doc_{i}": output
+                for i in range(images)
+                if random.random() >= fail_packed
+            }
+        )
+
+
+@ProcessorFactory.register
+class StubClassifierProcessor(BaseProcessor, TorchClassifierMixin):
+    """
+    Torchvision classifier with ImageNet weights and an untrained head, so
+    the real CPU inference cost is measured without a checkpoint.
+    """
+
+    def _setup(self):
+        self.load_model(
+            self.task_config.model or "resnet18",
+            None,
+            self.task_config.classes,
+        )
+        self.load_tfms(
+            self.task_config.kwargs.get("img_size", IMG_SIZE),
+            self.general_config.normalization_stats,
+        )
+
+    def _process(self, req: OCRRequest) -> Dict[str, Any]:
+        with phase("decode"):
+            image = request_image(req)
+        with phase("model"):
+            op = self.predict(image, self.task_config.classes)
+        return {"prediction": op.prediction, "confidence": op.conf}
+
+    def _process_batch(
+        self,
+        reqs: List[OCRRequest],
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        with phase("decode"):
+            images = [request_image(req) for req in reqs]
+        with phase("model"):
+            ops = self.predict_batch(images, self.task_config.classes)
+        return [{"prediction": op.prediction, "confidence": op.conf} for op in ops]
@@ -1,9 +1,19 @@
+import atexit
 import logging
 import sys
 
+import orjson
 import structlog
 from structlog.processors import CallsiteParameter
 
+from .utils.constants import (
+    LOG_ASYNC,
+    LOG_INFO_SAMPLE_RATE,
+    LOG_QUEUE_POLICY,
+    LOG_QUEUE_SIZE,
+)
+from .utils.log_writer import InfoSampler, LogWriter, QueueLoggerFactory
+
 # Disable uvicorn logging
 logging.getLogger("uvicorn.error").disabled = True
 logging.getLogger("uvicorn.access").disabled = True
@@ -14,21 +24,41 @@ logging.basicConfig(
     stream=sys.stdout,
     level=logging.INFO,
 )
-structlog.configure(
-    processors=[
-        structlog.contextvars.merge_contextvars,
-        structlog.processors.add_log_level,
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.ExceptionRenderer(),
-        structlog.dev.set_exc_info,
-        structlog.processors.CallsiteParameterAdder(
-            [
-                CallsiteParameter.FUNC_NAME,
-                CallsiteParameter.LINENO,
-            ],
-        ),
-        structlog.processors.TimeStamper(fmt="iso", utc=True),
-        structlog.processors.JSONRenderer(),
-    ],
-    logger_factory=structlog.PrintLoggerFactory(),
-)
\ No newline at end of file
+processors = [
+    structlog.contextvars.merge_contextvars,
+    structlog.processors.add_log_level,
+    InfoSampler(LOG_INFO_SAMPLE_RATE),
+    structlog.processors.StackInfoRenderer(),
+    structlog.processors.ExceptionRenderer(),
+    structlog.dev.set_exc_info,
+    structlog.processors.CallsiteParameterAdder(
+        [
+            CallsiteParameter.FUNC_NAME,
+            CallsiteParameter.LINENO,
+        ],
+    ),
+    structlog.processors.TimeStamper(fmt="iso", utc=True),
+]
+if LOG_ASYNC:
+    # Rendering and writing happen on the log writer thread
+    log_writer = LogWriter(
+        sys.stdout.buffer,
+        maxsize=LOG_QUEUE_SIZE,
+        policy=LOG_QUEUE_POLICY,
+    )
+    atexit.register(log_writer.shutdown)
+    structlog.configure(
+        processors=processors,
+        logger_factory=QueueLoggerFactory(log_writer),
+    )
+else:
+    structlog.configure(
+        processors=[
+            *processors,
+            structlog.processors.JSONRenderer(
+                serializer=orjson.dumps,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+            ),
+        ],
+        logger_factory=structlog.BytesLoggerFactory(),
+    )
@@ -1,5 +1,5 @@
 from collections import OrderedDict
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field, root_validator, validator
 
@@ -15,6 +15,76 @@ class FieldInfo(BaseModel):
     description: str = ""
 
 
+class PipelineStep(BaseModel):
+    name: str
+    task: str  # "category__task" of the processor running this step
+    needs: List[str] = Field(default_factory=list)
+    # "<step>.<field>" or "not <step>.<field>", run only if truthy
+    when: Optional[str] = None
+    fields: Optional[List[FieldInfo]] = None  # defaults to the request's
+
+    @validator("fields", pre=True)
+    def convert_fields_to_fieldinfo(cls, v):
+        if v is None:
+            return v
+        return [
+            FieldInfo(name=field) if isinstance(field, str) else field for field in v
+        ]
+
+    @validator("when")
+    def check_condition(cls, v):
+        if v is None:
+            return v
+        ref = v[len("not ") :] if v.startswith("not ") else v
+        if ref.count(".") != 1:
+            raise ValueError(f"Condition must be '<step>.<field>', got '{v}'")
+        return v
+
+    @property
+    def condition(self) -> Optional[tuple[bool, str, str]]:
+        """(negated, step, field) parsed from `when`."""
+        if self.when is None:
+            return None
+        negated = self.when.startswith("not ")
+        ref = self.when[len("not ") :] if negated else self.when
+        step, field = ref.split(".")
+        return negated, step, field
+
+
+class ImagePrepConfig(BaseModel):
+    """How an image is reduced before it is sent to a remote model."""
+
+    max_edge: Optional[int] = Field(default=None, gt=0)  # longest side, in pixels
+    format: Literal["jpeg", "webp", "png"] = "jpeg"
+    quality: int = Field(default=85, ge=1, le=100)  # jpeg and webp only
+    grayscale: bool = False
+    crop_to_document: bool = False
+
+    @property
+    def cache_key(self) -> tuple:
+        return (
+            "prepared",
+            self.max_edge,
+            self.format,
+            self.quality,
+            self.grayscale,
+            self.crop_to_document,
+        )
+
+
+class ModelEndpoint(BaseModel):
+    """One model and region an LLM task can be routed to."""
+
+    model: str
+    location: Optional[str] = None  # Vertex AI region, the default one when unset
+    weight: float = Field(default=1.0, gt=0)
+    params: Dict[str, Any] = Field(default_factory=dict)  # model settings overrides
+
+    @property
+    def name(self) -> str:
+        return f"{self.model}@{self.location}" if self.location else self.model
+
+
 class TaskConfig(BaseModel):
     processor: str
     api: Optional[str] = None
@@ -25,6 +95,19 @@ class TaskConfig(BaseModel):
     classes: Optional[List[str]] = None
     args: List[Any] = Field(default_factory=list)
     kwargs: Dict[str, Any] = Field(default_factory=dict)
+    # Admission control, unlimited when max_concurrency is unset
+    max_concurrency: Optional[int] = Field(default=None, gt=0)
+    max_queue: Optional[int] = Field(default=None, ge=0)
+    queue_timeout: Optional[float] = Field(default=None, gt=0)
+    bulk_min_share: float = Field(default=0.1, ge=0, le=1)
+    # Budgets, unlimited when unset
+    max_qps: Optional[float] = Field(default=None, gt=0)
+    token_budget: Optional[int] = Field(default=None, gt=0)  # LLM tokens per window
+    token_budget_window: float = Field(default=3600, gt=0)  # seconds
+    steps: Optional[List[PipelineStep]] = None  # PipelineProcessor only
+    endpoints: Optional[List[ModelEndpoint]] = None  # LLMProcessor, replaces model
+    # Applied by processors calling remote models (LLM, API, Gradio)
+    image_prep: Optional[ImagePrepConfig] = None
 
     @validator("fields", pre=True)
     def convert_fields_to_fieldinfo(cls, v):
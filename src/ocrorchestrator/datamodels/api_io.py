@@ -1,17 +1,22 @@
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 from uuid import uuid4
 
 from fastapi import HTTPException
 from pydantic import (
     BaseModel,
     Field,
+    PrivateAttr,
     field_validator,
     model_validator,
 )
 from typing_extensions import Self
 
-from ..utils.constants import ErrorCode
+from ..utils.constants import BATCH_MAX_ITEMS, ErrorCode
+from ..utils.misc import RequestCache
+
+# Admission lane, interactive requests are served before queued bulk work
+Priority = Literal["interactive", "bulk"]
 
 
 class FieldInfo(BaseModel):
@@ -27,6 +32,26 @@ class ConfigUpdateRequest(BaseModel):
 class SaveOptions(BaseModel):
     path: str
     format: str = "json"
+    # Offline only: pack this many results per jsonl/parquet object
+    shard_size: Optional[int] = Field(default=None, gt=0)
+
+    @model_validator(mode="after")
+    def check_shard_format(self) -> Self:
+        sharded_formats = {"jsonl", "parquet"}
+        if self.shard_size and self.format not in sharded_formats:
+            raise ValueError(
+                f"save_options.shard_size requires format in {sorted(sharded_formats)}"
+            )
+        if self.format in sharded_formats and not self.shard_size:
+            raise ValueError(f"save_options.format={self.format} requires shard_size")
+        return self
+
+
+class PdfOptions(BaseModel):
+    pages: Optional[List[int]] = None  # zero-based, None means all pages
+    dpi: int = Field(default=150, gt=0, le=600)
+    colorspace: Literal["rgb", "gray"] = "rgb"
+    format: Literal["png", "jpeg"] = "png"
 
 
 class OCRRequest(BaseModel):
@@ -37,6 +62,10 @@ class OCRRequest(BaseModel):
     fields: Optional[List[FieldInfo]] = None
     save_options: Optional[SaveOptions] = None
     log_result: bool = True
+    debug: bool = False  # include per-stage timings in the response
+    priority: Priority = "interactive"
+    _cache: RequestCache = PrivateAttr(default_factory=RequestCache)
+    _offline: bool = PrivateAttr(default=False)
 
     @field_validator("fields", mode="before")
     @classmethod
@@ -47,11 +76,35 @@ class OCRRequest(BaseModel):
             FieldInfo(name=field) if isinstance(field, str) else field for field in v
         ]
 
+    @property
+    def cache(self) -> RequestCache:
+        return self._cache
+
+    @property
+    def offline(self) -> bool:
+        """Part of an offline job, so admission waits instead of rejecting."""
+        return self._offline
+
+    def derive(self, **update) -> "OCRRequest":
+        """
+        Copy for an internal stage of a composite processor. It shares this
+        request's cache and offline mode, and never logs or saves its own
+        result.
+        """
+        subreq = self.model_copy(
+            update={"save_options": None, "log_result": False, **update}
+        )
+        subreq._cache = self._cache
+        subreq._offline = self._offline
+        return subreq
+
     @staticmethod
     def from_offline_req(OCRRequestOffline, image):
         req_dict = OCRRequestOffline.dict()
         req_dict["image"] = image
-        return OCRRequest(**req_dict)
+        req = OCRRequest(**req_dict)
+        req._offline = True
+        return req
 
 
 class OCRRequestOffline(BaseModel):
@@ -61,7 +114,14 @@ class OCRRequestOffline(BaseModel):
     task: str
     fields: Optional[List[FieldInfo]] = None
     save_options: Optional[SaveOptions] = None
+    pdf_options: PdfOptions = Field(default_factory=PdfOptions)
+    patterns: Optional[List[str]] = None  # e.g. ["*.pdf", "*.png"]
+    recursive: bool = False
+    read_ahead: int = Field(default=4, ge=0, le=64)
+    resume: bool = True  # with save_options, skip files completed by earlier runs
     log_result: bool = True
+    debug: bool = False  # include per-stage timings in the response
+    priority: Priority = "bulk"  # inherited by every sub-request
 
     @field_validator("fields", mode="before")
     @classmethod
@@ -86,17 +146,82 @@ class OCRRequestOffline(BaseModel):
         return self
 
 
+class OCRBatchItem(BaseModel):
+    image: str  # base64 image as utf-8
+    guid: str = Field(default_factory=uuid4)
+    category: Optional[str] = None  # defaults to the batch's
+    task: Optional[str] = None
+    fields: Optional[List[FieldInfo]] = None
+
+    @field_validator("fields", mode="before")
+    @classmethod
+    def convert_fields_to_fieldinfo(cls, v: list) -> list:
+        if v is None:
+            return v
+        return [
+            FieldInfo(name=field) if isinstance(field, str) else field for field in v
+        ]
+
+
+class OCRBatchRequest(BaseModel):
+    items: List[OCRBatchItem] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    category: Optional[str] = None
+    task: Optional[str] = None
+    fields: Optional[List[FieldInfo]] = None
+    log_result: bool = True
+    debug: bool = False  # include per-stage timings in the response
+    priority: Priority = "interactive"
+
+    @field_validator("fields", mode="before")
+    @classmethod
+    def convert_fields_to_fieldinfo(cls, v: list) -> list:
+        if v is None:
+            return v
+        return [
+            FieldInfo(name=field) if isinstance(field, str) else field for field in v
+        ]
+
+    @model_validator(mode="after")
+    def check_item_tasks(self) -> Self:
+        for idx, item in enumerate(self.items):
+            if not (item.category or self.category) or not (item.task or self.task):
+                raise ValueError(f"items[{idx}] has no category/task and no batch default")
+        return self
+
+    def to_requests(self) -> List[OCRRequest]:
+        return [
+            OCRRequest(
+                image=item.image,
+                guid=item.guid,
+                category=item.category or self.category,
+                task=item.task or self.task,
+                fields=item.fields if item.fields is not None else self.fields,
+                log_result=self.log_result,
+                priority=self.priority,
+            )
+            for item in self.items
+        ]
+
+
 class AppResponse(BaseModel):
     status: str
     status_code: int
     message: Any
     execution_time_millis: float = 0.0
+    queue_time_millis: float = 0.0  # waiting for a processor slot, not in execution
+    stages: Optional[List[Dict[str, Any]]] = None
 
 
 class AppException(HTTPException):
-    def __init__(self, error_code: ErrorCode, detail: str = None):
+    def __init__(
+        self,
+        error_code: ErrorCode,
+        detail: str = None,
+        headers: Optional[Dict[str, str]] = None,
+    ):
         super().__init__(
             status_code=error_code.status_code,
             detail=f"{error_code.name}: {detail or error_code.message}",
+            headers=headers,
         )
         self.status = error_code.name
\ No newline at end of file
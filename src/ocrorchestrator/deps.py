@@ -1,5 +1,5 @@
 import os
-from typing import Union
+from typing import Optional, Union
 
 import structlog
 from fastapi import Request
@@ -7,8 +7,10 @@ from fastapi import Request
 from .config.app_config import AppConfig
 from .datamodels.api_io import (
     AppException,
+    OCRBatchRequest,
     OCRRequest,
     OCRRequestOffline,
+    Priority,
 )
 from .managers.processor import ProcessorManager
 from .managers.secrets import setup_google_credentials
@@ -43,4 +45,13 @@ def get_processor(
             ErrorCode.PROCESSOR_NOT_FOUND,
             f"No processor found for {key}",
         )
-    return processor
\ No newline at end of file
+    return processor
+
+
+def apply_priority(
+    req: Union[OCRRequest, OCRRequestOffline, OCRBatchRequest],
+    header: Optional[Priority],
+):
+    # An explicit priority field in the body wins over the X-Priority header
+    if header is not None and "priority" not in req.model_fields_set:
+        req.priority = header
@@ -1,18 +1,23 @@
 from contextlib import asynccontextmanager
 
+import anyio.to_thread
 import gradio as gr
 import gradio.route_utils
 import structlog
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from .datamodels.api_io import AppException, AppResponse
 from .deps import proc_manager
 from .routers import ocr_router
 from .ui import create_gradio_interface
-from .utils.constants import ErrorCode
+from .utils.constants import THREADPOOL_SIZE, ErrorCode
 from .utils.logging import LoggerMiddleware
+from .utils.metrics import ERRORS
+from .utils.misc import create_task_key
+from .utils.pdf import shutdown_pdf_pool
+from .utils.responses import AppJSONResponse
+from .utils.usage import usage_tracker
 
 APP_NAME = "ocrorchestrator"
 log = structlog.get_logger()
@@ -21,48 +26,65 @@ log = structlog.get_logger()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     log.info("**** Starting application ****")
+    # Requests for processors run on this pool, a slot is also held while a
+    # request waits in its task's admission queue
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = THREADPOOL_SIZE
     proc_manager._initialize()
     app.state.proc_manager = proc_manager
+    usage_tracker.start(proc_manager.repo)
     yield
     log.info("**** Shutting down application ****")
+    usage_tracker.stop()
     proc_manager.cleanup()
+    shutdown_pdf_pool()
     app.state.proc_manager = None
 
 
+def _current_task_key() -> str:
+    ctx = structlog.contextvars.get_contextvars()
+    if not ctx.get("category"):
+        return "-"
+    return create_task_key(ctx["category"], ctx.get("task", ""))
+
+
 async def ocr_exception_handler(request: Request, exc: Exception):
     if not isinstance(exc, AppException):
         exc = AppException(
             ErrorCode.INTERNAL_SERVER_ERROR,
             detail=str(exc),
         )
+    ERRORS.inc(task=_current_task_key(), error_code=exc.status)
     log.error(
         f"Exception occurred: {exc.detail}",
         status_code=exc.status_code,
         status=exc.status,
         exc_info=True,
     )
-    return JSONResponse(
+    return AppJSONResponse(
         status_code=exc.status_code,
         content=AppResponse(
             status=exc.status,
             status_code=exc.status_code,
             message=exc.detail,
-        ).dict(),
+        ),
+        headers=exc.headers,
     )
 
 
 async def rest_exception_handler(request: Request, exc: StarletteHTTPException):
-    return JSONResponse(
+    ERRORS.inc(task=_current_task_key(), error_code=f"HTTP_{exc.status_code}")
+    return AppJSONResponse(
         status_code=exc.status_code,
         content=AppResponse(
             status="Unknown HTTP error",
             status_code=exc.status_code,
             message=exc.detail,
-        ).dict(),
+        ),
     )
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=AppJSONResponse)
 app.add_middleware(LoggerMiddleware)
 app.include_router(ocr_router)
 app.add_exception_handler(Exception, ocr_exception_handler)
@@ -27,10 +27,13 @@ class ProcessorManager:
                 self.app_config.general,
                 self.repo,
             )
+            processor.task_key = key
             log.info("Setting up processor",
                      processor=type(processor).__name__)
             processor._setup()
             self.processors[key] = processor
+        for processor in self.processors.values():
+            processor.bind(self.processors)
         log.info("**** Processors initialized ****")
 
     def refresh(self, new_config: AppConfig = None):
@@ -1,5 +1,7 @@
 from .api import ApiProcessor
 from .base import BaseProcessor
+from .cascade import CascadeProcessor
 from .gradio import PaliGemmaGradioProcessor
 from .llm import LLMProcessor
+from .pipeline import PipelineProcessor
 from .pytorch import DocumentValidationProcessor
\ No newline at end of file
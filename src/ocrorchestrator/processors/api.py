@@ -8,6 +8,8 @@ from ..config.app_config import GeneralConfig, TaskConfig
 from ..datamodels.api_io import AppException, OCRRequest
 from ..repos import BaseRepo
 from ..utils.constants import ErrorCode
+from ..utils.img import request_prepared_image
+from ..utils.metrics import phase
 from .base import BaseProcessor
 
 log = structlog.get_logger()
@@ -17,10 +19,10 @@ class InputFormatter:
     def __init__(self, format_template: Dict[str, Any]):
         self.format_template = format_template
 
-    def format(self, data: Any) -> Dict[str, Any]:
+    def format(self, data: Any, **overrides: Any) -> Dict[str, Any]:
         def _format_value(value):
             if isinstance(value, str):
-                return Template(value).safe_substitute(data.__dict__)
+                return Template(value).safe_substitute(data.__dict__, **overrides)
             elif isinstance(value, dict):
                 return {k: _format_value(v) for k, v in value.items()}
             elif isinstance(value, list):
@@ -45,13 +47,20 @@ class ApiProcessor(BaseProcessor):
         self.client = requests.Session()
 
     def _process(self, req: OCRRequest) -> Dict[str, Any]:
-        formatted_input = self.input_format.format(req)
+        overrides = {}
+        if self.task_config.image_prep is not None:
+            overrides["image"], _ = request_prepared_image(
+                req, self.task_config.image_prep
+            )
+        with phase("preprocess"):
+            formatted_input = self.input_format.format(req, **overrides)
 
         try:
             log.info("Sending API request", api_endpoint=self.api)
-            response = self.client.post(self.api, json=formatted_input)
-            response.raise_for_status()
-            result = response.json()
+            with phase("model"):
+                response = self.client.post(self.api, json=formatted_input)
+                response.raise_for_status()
+                result = response.json()
             log.info(
                 "API request successful",
                 api_endpoint=self.api,
@@ -69,7 +78,8 @@ class ApiProcessor(BaseProcessor):
             raise AppException(error_code,
                                f"API call error: {str(e)}")
 
-        return self._result_parser(result)
+        with phase("parse"):
+            return self._result_parser(result)
 
     def _result_parser(self, raw: Any) -> Dict[str, Any]:
         return raw
@@ -1,22 +1,38 @@
 import functools
 import json
 import traceback
+from itertools import islice
 from pathlib import Path
-from typing import Any, Callable, Dict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 import structlog
 
 from ..config.app_config import GeneralConfig, TaskConfig
 from ..datamodels.api_io import (
     AppException,
+    FieldInfo,
     OCRRequest,
     OCRRequestOffline,
     SaveOptions,
 )
 from ..repos import BaseRepo
+from ..repos.cache import ObjectInfo
 from ..repos.factory import RepoFactory
-from ..utils.constants import ErrorCode
+from ..repos.manifest import Manifest
+from ..repos.sink import ResultSink
+from ..utils.admission import AdmissionGate, TaskBudget
+from ..utils.constants import (
+    PAGE_KEY,
+    RESUME_CHECK_DEPTH,
+    SOURCE_KEY,
+    ErrorCode,
+)
+from ..utils.logging import loggable_result, should_log_result
+from ..utils.metrics import phase, task_context
+from ..utils.misc import project_fields
+from ..utils.prefetch import prefetch
 from ..utils.timing import log_execution_time
+from ..utils.tracing import span
 
 log = structlog.get_logger()
 
@@ -55,6 +71,21 @@ class BaseProcessor:
         self.task_config = task_config
         self.general_config = general_config
         self.repo = repo
+        self.task_key = type(self).__name__  # replaced by the manager on setup
+        # Sub-requests of offline jobs go through process_batch in chunks of
+        # this size when above 1
+        self.offline_batch_size = 1
+        self.gate = AdmissionGate(
+            task_config.max_concurrency,
+            task_config.max_queue,
+            task_config.queue_timeout,
+            task_config.bulk_min_share,
+        )
+        self.budget = TaskBudget(
+            task_config.max_qps,
+            task_config.token_budget,
+            task_config.token_budget_window,
+        )
 
     def _setup(self) -> None:
         raise NotImplementedError
@@ -62,6 +93,46 @@ class BaseProcessor:
     def _process(self, req: OCRRequest) -> Dict[str, Any]:
         raise NotImplementedError
 
+    def _process_batch(
+        self,
+        reqs: List[OCRRequest],
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Run `_process` over a batch, returning a result or the raised
+        exception per request, in order. Processors whose model can run a
+        whole batch at once override this.
+        """
+        outcomes = []
+        for req in reqs:
+            try:
+                outcomes.append(self._process(req))
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+
+    def _process_stream(self, req: OCRRequest) -> Iterator[Tuple[str, Any]]:
+        """
+        Yield ("field", {"name", "value"}) for output fields as they become
+        available, then ("result", result). Processors whose model cannot
+        stream only yield the result.
+        """
+        yield "result", self._process(req)
+
+    def bind(self, processors: Dict[str, "BaseProcessor"]) -> None:
+        """Called by the manager once every configured processor is set up."""
+
+    def format_response(
+        self,
+        response: Union[Dict[str, Any], List[Dict[str, Any]]],
+        fields: List[FieldInfo],
+    ) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        # Keep the source and page of offline sub-results alongside the
+        # requested fields
+        fields = [*fields, FieldInfo(name=SOURCE_KEY), FieldInfo(name=PAGE_KEY)]
+        if isinstance(response, list):
+            return [project_fields(r, fields) for r in response]
+        return project_fields(response, fields)
+
     def _save_output(
         self,
         result: Dict[str, Any],
@@ -78,11 +149,53 @@ class BaseProcessor:
 
     @process_error_handler
     @log_execution_time
-    def process(self, req: OCRRequest) -> Dict[str, Any]:
+    def process(
+        self,
+        req: OCRRequest,
+        sink: Optional[ResultSink] = None,
+        offline: bool = False,
+    ) -> Dict[str, Any]:
+        # Stages of composite processors inherit it through the request
+        offline = offline or req.offline
+        with task_context(self.task_key), span("process", guid=str(req.guid)):
+            self.budget.acquire(self.task_key, req.priority, defer=offline)
+            with self.gate.admit(self.task_key, req.priority, wait_only=offline):
+                return self._process_online(req, sink)
+
+    def process_stream(self, req: OCRRequest) -> Iterator[Tuple[str, Any]]:
+        """
+        Events of _process_stream, preceded by ("start", None) once the
+        request is admitted. The result is logged and saved like in process.
+        """
+        with task_context(self.task_key), span("process_stream", guid=str(req.guid)):
+            self.budget.acquire(self.task_key, req.priority)
+            with self.gate.admit(self.task_key, req.priority):
+                log.info("--- Processing streaming request ---")
+                yield "start", None
+                for kind, payload in self._process_stream(req):
+                    if kind == "result":
+                        payload = self._handle_result(req, payload)
+                    yield kind, payload
+
+    def _process_online(
+        self,
+        req: OCRRequest,
+        sink: Optional[ResultSink],
+    ) -> Dict[str, Any]:
         log.info("--- Processing online request ---")
-        result = self._process(req)
-        if req.log_result:
-            log.info("Model output", output=result)
+        return self._handle_result(req, self._process(req), sink)
+
+    def _handle_result(
+        self,
+        req: OCRRequest,
+        result: Dict[str, Any],
+        sink: Optional[ResultSink] = None,
+    ) -> Dict[str, Any]:
+        if req.log_result and should_log_result():
+            with span("log_result"):
+                log.info("Model output", **loggable_result(result))
+        if sink is not None:
+            return {"saved_location": sink.write(req.guid, result)}
         if req.save_options:
             opts = req.save_options
             repo, prefix = RepoFactory.from_uri(
@@ -93,39 +206,225 @@ class BaseProcessor:
             if opts.path.endswith("/"):
                 opts.path += f"{req.guid}.{opts.format}"
 
-            saved_path = self._save_output(result, opts, repo)
+            with phase("save"):
+                saved_path = self._save_output(result, opts, repo)
             return {"saved_location": saved_path}
         return result
 
+    @log_execution_time
+    def process_batch(
+        self,
+        reqs: List[OCRRequest],
+        sink: Optional[ResultSink] = None,
+        offline: bool = False,
+    ) -> List[Union[Dict[str, Any], AppException]]:
+        """
+        Process several requests with one admission slot and, where the
+        processor supports it, one model call. A failing item yields its
+        AppException in place of a result instead of failing the batch.
+        """
+        offline = offline or reqs[0].offline
+        with task_context(self.task_key), span("process_batch", size=len(reqs)):
+            self.budget.acquire(
+                self.task_key,
+                reqs[0].priority,
+                n=len(reqs),
+                defer=offline,
+            )
+            with self.gate.admit(self.task_key, reqs[0].priority, wait_only=offline):
+                log.info("--- Processing batch request ---", size=len(reqs))
+                try:
+                    outcomes = self._process_batch(reqs)
+                except Exception as e:
+                    outcomes = [e] * len(reqs)
+                results = []
+                for req, outcome in zip(reqs, outcomes):
+                    if not isinstance(outcome, Exception):
+                        try:
+                            outcome = self._handle_result(req, outcome, sink)
+                        except Exception as e:
+                            outcome = e
+                    if isinstance(outcome, Exception):
+                        outcome = self._item_error(req, outcome)
+                    results.append(outcome)
+                return results
+
+    def _item_error(self, req: OCRRequest, exc: Exception) -> AppException:
+        if isinstance(exc, AppException):
+            return exc
+        error_code = ErrorCode.PROCESSING_ERROR
+        log.error(
+            "Batch item failed",
+            guid=str(req.guid),
+            status_code=error_code.status_code,
+            status=error_code.name,
+            exc_info=exc,
+        )
+        return ProcessorException(error_code, f"{type(exc).__name__}: {exc}")
+
+    def _iter_subrequests(
+        self,
+        req: OCRRequestOffline,
+        src_repo: BaseRepo,
+        file_: str,
+        guid: str,
+        info: Optional[ObjectInfo] = None,
+    ) -> Iterator[Tuple[Optional[int], OCRRequest]]:
+        if not file_.lower().endswith(".pdf"):
+            subreq = OCRRequest.from_offline_req(req, src_repo.get_obj(file_, info))
+            if subreq.save_options:
+                subreq.guid = guid
+            yield None, subreq
+            return
+
+        for page, data in src_repo.get_pdf_pages(file_, req.pdf_options):
+            subreq = OCRRequest.from_offline_req(req, data)
+            if subreq.save_options:
+                subreq.guid = f"{guid}_p{page}"
+            yield page, subreq
+
+    def _process_subrequests(
+        self,
+        subreqs: Iterator[Tuple[Any, OCRRequest]],
+        sink: Optional[ResultSink],
+    ) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        """Results of (key, sub-request) pairs, as (key, result)."""
+        if self.offline_batch_size <= 1:
+            for key, subreq in subreqs:
+                yield key, self.process(subreq, sink=sink, offline=True)
+            return
+        # Chunks span files, so single-page documents are batched too
+        while chunk := list(islice(subreqs, self.offline_batch_size)):
+            outcomes = self.process_batch(
+                [subreq for _, subreq in chunk],
+                sink=sink,
+                offline=True,
+            )
+            for (key, _), outcome in zip(chunk, outcomes):
+                if isinstance(outcome, Exception):
+                    raise outcome
+                yield key, outcome
+
     @process_error_handler
     @log_execution_time
     def process_offline(self, req: OCRRequestOffline) -> Dict[str, Any]:
-        log.info("--- Processing offline request ---")
-        src_repo, files_or_data = RepoFactory.from_uri(req.location)
-        if isinstance(files_or_data, list):
-            results = []
-            for file_ in files_or_data:
-                data = src_repo.get_obj(file_)
-                subreq = OCRRequest.from_offline_req(
-                    req,
-                    data,
-                )
-                if subreq.save_options:
-                    subreq.guid = Path(file_).stem
-
-                results.append(self.process(subreq))
-
-            if req.save_options:
-                return {"saved_count": len(results)}
-            else:
-                return results
+        with task_context(self.task_key):
+            return self._process_offline(req)
 
+    def _process_offline(self, req: OCRRequestOffline) -> Dict[str, Any]:
+        log.info("--- Processing offline request ---")
+        src_repo, prefix = RepoFactory.from_uri(req.location, read_prefix=False)
+        is_listing = prefix.endswith("/")
+        if is_listing:
+            # With the listed size and version, so large reads need no lookup
+            files = src_repo.iter_objects(
+                prefix,
+                patterns=req.patterns,
+                recursive=req.recursive,
+                with_info=True,
+            )
         else:
-            subreq = OCRRequest.from_offline_req(
-                req,
-                files_or_data,
+            files = [(prefix, None)]
+
+        def _guid(file_: str) -> str:
+            if not is_listing:
+                return req.guid
+            # Nested paths are flattened so recursive listings stay unique
+            rel = Path(file_[len(prefix) :]).with_suffix("")
+            return "__".join(rel.parts)
+
+        def _load(
+            item: Tuple[str, Optional[ObjectInfo]],
+        ) -> List[Tuple[Tuple[str, Optional[int]], OCRRequest]]:
+            file_, info = item
+            with span("load", file=file_):
+                subreqs = [
+                    ((file_, page), subreq)
+                    for page, subreq in self._iter_subrequests(
+                        req, src_repo, file_, _guid(file_), info
+                    )
+                ]
+            if manifest is not None:
+                manifest.expect(file_, [subreq.guid for _, subreq in subreqs])
+            return subreqs
+
+        sink, manifest = None, None
+        skipped_count = 0
+        if req.save_options:
+            dst_repo, dst_prefix = RepoFactory.from_uri(
+                req.save_options.path,
+                read_prefix=False,
+            )
+            if req.resume and is_listing:
+                manifest = Manifest(dst_repo, dst_prefix)
+                manifest.load()
+                check_outputs = not req.save_options.shard_size
+
+                def _is_done(item: Tuple[str, Optional[ObjectInfo]]) -> bool:
+                    file_, _ = item
+                    if file_ in manifest:
+                        return True
+                    # PDF outputs are per page, so only the manifest can
+                    # tell whether every page of a document was written
+                    if not check_outputs or file_.lower().endswith(".pdf"):
+                        return False
+                    return dst_repo.exists(
+                        f"{dst_prefix}{_guid(file_)}.{req.save_options.format}"
+                    )
+
+                def _pending(files):
+                    # Outputs are checked a few files ahead of processing,
+                    # so a huge listing is never held in memory
+                    nonlocal skipped_count
+                    for item, done in prefetch(files, _is_done, RESUME_CHECK_DEPTH):
+                        if done:
+                            skipped_count += 1
+                            continue
+                        yield item
+
+                files = _pending(files)
+
+            sink = ResultSink(
+                dst_repo,
+                dst_prefix,
+                req.save_options,
+                on_written=manifest.on_written if manifest else None,
             )
-            return self.process(subreq)
+
+        results = []
+        saved_count = 0
+        try:
+            subreqs = (
+                item
+                for _, file_subreqs in prefetch(files, _load, req.read_ahead)
+                for item in file_subreqs
+            )
+            for (file_, page), result in self._process_subrequests(subreqs, sink):
+                if sink is not None:
+                    saved_count += 1
+                    continue
+                if page is not None:
+                    result = {PAGE_KEY: page, **result}
+                if is_listing or page is not None:
+                    # Results of several files or pages come back as one list
+                    result = {SOURCE_KEY: file_, **result}
+                results.append(result)
+            if sink is not None:
+                sink.flush()
+        finally:
+            if sink is not None:
+                sink.close()
+            if manifest is not None:
+                # Checkpoint whatever completed, also when the run failed
+                manifest.flush()
+
+        if req.save_options:
+            if skipped_count:
+                log.info("Skipped already processed files", count=skipped_count)
+            return {"saved_count": saved_count, "skipped_count": skipped_count}
+        if not is_listing and not prefix.lower().endswith(".pdf"):
+            return results[0]
+        return results
 
 
 class ProcessorException(AppException):
@@ -0,0 +1,136 @@
+from typing import Any, Dict, List, Optional, Union
+
+import structlog
+
+from ..config.app_config import GeneralConfig, TaskConfig
+from ..datamodels.api_io import AppException, FieldInfo, OCRRequest
+from ..repos import BaseRepo
+from ..utils.constants import ErrorCode
+from ..utils.metrics import CASCADE_DECISIONS
+from ..utils.tracing import span
+from .base import BaseProcessor
+from .pipeline import PipelineProcessor
+
+log = structlog.get_logger()
+
+
+class CascadeProcessor(BaseProcessor):
+    """
+    Runs a cheap classifier task first and escalates to a second, usually
+    LLM, task only when needed: when the classifier's confidence is below
+    `threshold` or its prediction is in `escalate_classes`. Otherwise the
+    classifier's result is returned straight away.
+
+    The classifier result must carry `prediction` and `confidence`. The
+    response is the answering stage's result (the llm one projected onto
+    the requested fields) plus a `cascade` key saying which stage answered
+    and why. Decisions are counted in ocr_cascade_decisions_total, to tune
+    the threshold against.
+
+    categories:
+      default:
+        onboarding_fast:
+          processor: CascadeProcessor
+          params:
+            - classifier: default__validation
+              llm: default__extraction
+              threshold: 0.8
+              escalate_classes: [clean]
+    """
+
+    def __init__(
+        self,
+        task_config: TaskConfig,
+        general_config: GeneralConfig,
+        repo: BaseRepo,
+    ):
+        super().__init__(task_config, general_config, repo)
+        kwargs = task_config.kwargs
+        self.classifier_task: Optional[str] = kwargs.get("classifier")
+        self.llm_task: Optional[str] = kwargs.get("llm")
+        self.threshold: Optional[float] = kwargs.get("threshold")
+        escalate_classes = kwargs.get("escalate_classes")
+        self.escalate_classes = (
+            set(escalate_classes) if escalate_classes is not None else None
+        )
+        self.classifier: Optional[BaseProcessor] = None
+        self.llm: Optional[BaseProcessor] = None
+        if not self.classifier_task or not self.llm_task:
+            self._fail("both 'classifier' and 'llm' tasks must be configured")
+        if self.threshold is None and self.escalate_classes is None:
+            self._fail("configure 'threshold', 'escalate_classes' or both")
+
+    def _fail(self, detail: str):
+        raise AppException(ErrorCode.INITIALIZATION_ERROR, f"Cascade: {detail}")
+
+    def _setup(self):
+        pass
+
+    def _resolve(
+        self,
+        processors: Dict[str, BaseProcessor],
+        key: str,
+    ) -> BaseProcessor:
+        processor = processors.get(key)
+        if processor is None:
+            self._fail(f"unknown task '{key}'")
+        if isinstance(processor, (CascadeProcessor, PipelineProcessor)):
+            self._fail(f"task '{key}' is itself a cascade or pipeline")
+        return processor
+
+    def bind(self, processors: Dict[str, BaseProcessor]):
+        self.classifier = self._resolve(processors, self.classifier_task)
+        self.llm = self._resolve(processors, self.llm_task)
+        log.info(
+            "Cascade bound",
+            classifier=self.classifier_task,
+            llm=self.llm_task,
+            threshold=self.threshold,
+            escalate_classes=sorted(self.escalate_classes or []),
+        )
+
+    def format_response(
+        self,
+        response: Union[Dict[str, Any], List[Dict[str, Any]]],
+        fields: List[FieldInfo],
+    ) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        # _process projects the llm stage's result itself
+        return response
+
+    def _escalation_reason(self, result: Dict[str, Any]) -> Optional[str]:
+        confidence = result.get("confidence")
+        if self.threshold is not None and (
+            confidence is None or confidence < self.threshold
+        ):
+            return "low_confidence"
+        if (
+            self.escalate_classes is not None
+            and result.get("prediction") in self.escalate_classes
+        ):
+            return "escalate_class"
+        return None
+
+    def _process(self, req: OCRRequest) -> Dict[str, Any]:
+        # Both stages share the request cache, so the image is decoded once
+        with span("stage", stage="classifier"):
+            first = self.classifier.process(req.derive())
+        decision = {
+            "prediction": first.get("prediction"),
+            "confidence": first.get("confidence"),
+        }
+        reason = self._escalation_reason(first)
+        if reason is None:
+            CASCADE_DECISIONS.inc(
+                task=self.task_key, stage="classifier", reason="confident"
+            )
+            # Returned whole: the requested fields are meant for the llm stage
+            return {**first, "cascade": {"stage": "classifier", **decision}}
+
+        CASCADE_DECISIONS.inc(task=self.task_key, stage="llm", reason=reason)
+        log.info("Escalating to llm", reason=reason, **decision)
+        with span("stage", stage="llm"):
+            second = self.llm.process(req.derive())
+        result = second
+        if req.fields is not None:
+            result = self.llm.format_response(second, req.fields)
+        return {**result, "cascade": {"stage": "llm", "reason": reason, **decision}}
@@ -1,3 +1,5 @@
+from typing import Dict, Type
+
 from ..config.app_config import GeneralConfig, TaskConfig
 from ..datamodels.api_io import AppException
 from ..processors import *  # noqa: F403
@@ -7,17 +9,28 @@ from ..utils.constants import ErrorCode
 
 
 class ProcessorFactory:
-    @staticmethod
+    # Processors defined outside this package (e.g. benchmark stubs), looked
+    # up before the built-in ones
+    _registry: Dict[str, Type[BaseProcessor]] = {}
+
+    @classmethod
+    def register(cls, processor_cls: Type[BaseProcessor]) -> Type[BaseProcessor]:
+        cls._registry[processor_cls.__name__] = processor_cls
+        return processor_cls
+
+    @classmethod
     def create_processor(
+        cls,
         task_config: TaskConfig,
         general_config: GeneralConfig,
         repo: BaseRepo,
     ) -> BaseProcessor:
         class_name = task_config.processor
         try:
-            return globals()[class_name](task_config, general_config, repo)
+            processor_cls = cls._registry.get(class_name) or globals()[class_name]
+            return processor_cls(task_config, general_config, repo)
         except Exception as e:
             raise AppException(
                 ErrorCode.INITIALIZATION_ERROR,
                 f"Unknown processor: {class_name}. Exc: {e}",
-            ) from e
\ No newline at end of file
+            ) from e
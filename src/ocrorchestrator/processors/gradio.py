@@ -1,10 +1,12 @@
+from base64 import b64decode
 from tempfile import NamedTemporaryFile
 from typing import Any, Dict
 
 from ..config.app_config import GeneralConfig, TaskConfig
 from ..datamodels.api_io import OCRRequest
 from ..repos import BaseRepo
-from ..utils.img import base64_to_pil
+from ..utils.img import request_image, request_prepared_image
+from ..utils.metrics import phase
 from .base import BaseProcessor
 
 
@@ -32,18 +34,32 @@ class GradioProcessor(BaseProcessor):
     def _process(self, req: OCRRequest) -> Dict[str, Any]:
         from gradio_client import file
 
-        image = base64_to_pil(req.image)
+        prep = self.task_config.image_prep
+        prepared, suffix = None, ".jpg"
+        if prep is not None:
+            prepared, mime_type = request_prepared_image(req, prep)
+            if mime_type.startswith("image/"):
+                suffix = "." + mime_type.split("/")[1]
+        else:
+            with phase("decode"):
+                image = request_image(req)
 
-        with NamedTemporaryFile(delete=True, suffix=".jpg") as fp:
-            image.save(fp.name)
-            result = self.client.predict(
-                file(fp.name),
-                *self.task_config.args,
-                api_name=self.api,
-                **self.task_config.kwargs,
-            )
+        with NamedTemporaryFile(delete=True, suffix=suffix) as fp:
+            if prepared is not None:
+                fp.write(b64decode(prepared))
+                fp.flush()
+            else:
+                image.save(fp.name)
+            with phase("model"):
+                result = self.client.predict(
+                    file(fp.name),
+                    *self.task_config.args,
+                    api_name=self.api,
+                    **self.task_config.kwargs,
+                )
 
-            return self._result_parser(result)
+            with phase("parse"):
+                return self._result_parser(result)
 
 
 class PaliGemmaGradioProcessor(GradioProcessor):
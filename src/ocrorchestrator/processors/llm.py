@@ -1,18 +1,30 @@
-from typing import Any, Dict
+import functools
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import structlog
+from langchain_core.output_parsers import PydanticOutputParser
 
 from ..config.app_config import GeneralConfig, TaskConfig
-from ..datamodels.api_io import OCRRequest
+from ..datamodels.api_io import FieldInfo, OCRRequest
 from ..repos import BaseRepo
-from ..utils.img import get_image_mime_type
+from ..utils.img import request_mime_type, request_prepared_image
+from ..utils.metrics import LLM_BATCH_ITEMS, phase
+from ..utils.misc import fields_key
 from ..utils.mixins import VertexAILangchainMixin
+from ..utils.tracing import span
 from .base import BaseProcessor
 
 log = structlog.get_logger()
 
 
 class LLMProcessor(BaseProcessor, VertexAILangchainMixin):
+    """
+    With `batch_size` above 1 (params: [{batch_size: 8}]), batch and
+    offline requests are packed up to that many images per model call.
+    Images whose output cannot be parsed from a packed answer are retried
+    one call each.
+    """
+
     def __init__(
         self,
         task_config: TaskConfig,
@@ -32,19 +44,126 @@ class LLMProcessor(BaseProcessor, VertexAILangchainMixin):
                 "max_output_tokens",
                 2048,
             ),
+            "json_mode": task_config.kwargs.get("json_mode", False),
         }
+        self.parse_retries = task_config.kwargs.get("parse_retries", 1)
+        self.format_style = task_config.kwargs.get("format_instructions", "compact")
+        # Parser and prompt per request field set, for tasks without fields
+        self._compiled_prompt = functools.lru_cache(maxsize=256)(self._compile_prompt)
+        self.batch_size = task_config.kwargs.get("batch_size", 1)
+        self.offline_batch_size = self.batch_size
 
     def _setup(self):
         self.template = self.repo.get_obj(
             f"{self.prompts_dir}/{self.prompt_file}")
-        self.load_llm(model_name=self.model_name, **self.model_config)
+        self.load_llm(
+            model_name=self.model_name,
+            endpoints=self.task_config.endpoints,
+            **self.model_config,
+        )
         if self.fields:
             self.load_output_parser(self.fields)
             self.load_prompt(self.template)
 
-    def _process(self, req: OCRRequest) -> Dict[str, Any]:
-        image_data = f"data:{get_image_mime_type(req.image)};base64,{req.image}"
+    def _image_data(self, req: OCRRequest) -> str:
+        if self.task_config.image_prep is not None:
+            image, mime_type = request_prepared_image(req, self.task_config.image_prep)
+            return f"data:{mime_type};base64,{image}"
+        with phase("decode"):
+            mime_type = request_mime_type(req)
+        return f"data:{mime_type};base64,{req.image}"
+
+    def _compile_prompt(
+        self,
+        key: Tuple[Tuple[str, str], ...],
+    ) -> Tuple[PydanticOutputParser, str]:
+        fields = [FieldInfo(name=name, description=desc) for name, desc in key]
+        with span("build_parser"):
+            output_parser = self.build_output_parser(fields)
+            return output_parser, self.build_prompt(self.template, output_parser)
+
+    def _request_prompt(
+        self,
+        fields: Optional[List[FieldInfo]],
+    ) -> Optional[Tuple[PydanticOutputParser, str]]:
+        # Returned rather than set on self, requests run concurrently
         if self.fields is None:
-            self.load_output_parser(req.fields)
-            self.load_prompt(self.template)
-        return self.predict(image_data)
+            return self._compiled_prompt(fields_key(fields))
+        return None
+
+    def _process(self, req: OCRRequest) -> Dict[str, Any]:
+        image_data = self._image_data(req)
+        return self.predict(image_data, self._request_prompt(req.fields))
+
+    def _process_stream(self, req: OCRRequest) -> Iterator[Tuple[str, Any]]:
+        image_data = self._image_data(req)
+        return self.predict_stream(image_data, self._request_prompt(req.fields))
+
+    def _process_batch(
+        self,
+        reqs: List[OCRRequest],
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        if self.batch_size <= 1:
+            return super()._process_batch(reqs)
+        # A packed call shares one prompt, so only requests asking for the
+        # same fields go together
+        groups: Dict[Tuple[Tuple[str, str], ...], List[int]] = {}
+        for idx, req in enumerate(reqs):
+            key = fields_key(self.fields or req.fields)
+            groups.setdefault(key, []).append(idx)
+
+        outcomes: List[Union[Dict[str, Any], Exception]] = [None] * len(reqs)
+        for idxs in groups.values():
+            for start in range(0, len(idxs), self.batch_size):
+                chunk = idxs[start : start + self.batch_size]
+                chunk_outcomes = self._process_packed([reqs[i] for i in chunk])
+                for idx, outcome in zip(chunk, chunk_outcomes):
+                    outcomes[idx] = outcome
+        return outcomes
+
+    def _process_packed(
+        self,
+        reqs: List[OCRRequest],
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        outcomes: List[Union[Dict[str, Any], Exception, None]] = [None] * len(reqs)
+        packed: List[int] = []
+        images_data: List[str] = []
+        for idx, req in enumerate(reqs):
+            try:
+                images_data.append(self._image_data(req))
+                packed.append(idx)
+            except Exception as e:
+                outcomes[idx] = e
+        if len(packed) < 2:
+            return super()._process_batch(reqs)
+
+        compiled = self._request_prompt(reqs[packed[0]].fields)
+        with span("packed_call", size=len(packed)):
+            try:
+                results = self.predict_many(images_data, compiled)
+            except Exception as e:
+                # The call itself failed: retrying each image would only
+                # multiply the load on the model
+                for idx in packed:
+                    outcomes[idx] = e
+                return outcomes
+
+        retry = []
+        for idx, result in zip(packed, results):
+            if isinstance(result, Exception):
+                retry.append(idx)
+            else:
+                outcomes[idx] = result
+        task = self.task_key
+        LLM_BATCH_ITEMS.inc(len(packed) - len(retry), task=task, outcome="ok")
+        if retry:
+            LLM_BATCH_ITEMS.inc(len(retry), task=task, outcome="fallback")
+            log.warning(
+                "Unparsable outputs in packed LLM call, retrying one by one",
+                failed=len(retry),
+                size=len(packed),
+            )
+            retried = super()._process_batch([reqs[i] for i in retry])
+            for idx, outcome in zip(retry, retried):
+                outcomes[idx] = outcome
+        return outcomes
@@ -0,0 +1,153 @@
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Union
+
+import structlog
+
+from ..config.app_config import GeneralConfig, PipelineStep, TaskConfig
+from ..datamodels.api_io import AppException, FieldInfo, OCRRequest
+from ..repos import BaseRepo
+from ..utils.constants import PIPELINE_MAX_WORKERS, ErrorCode
+from ..utils.tracing import span
+from .base import BaseProcessor
+
+log = structlog.get_logger()
+
+# Shared by all pipelines. Steps never submit work of their own, so a full
+# pool only delays steps and cannot deadlock.
+_step_pool = ThreadPoolExecutor(
+    max_workers=PIPELINE_MAX_WORKERS,
+    thread_name_prefix="pipeline-step",
+)
+
+
+class PipelineProcessor(BaseProcessor):
+    """
+    Runs several configured tasks on one request and combines their results
+    as {step name: result}, with None for skipped steps.
+
+    Steps start as soon as the steps they need have finished, so
+    independent steps run concurrently. A step with `when` runs only if
+    the referenced field of an earlier step's result is truthy (or falsy
+    with "not "); steps needing a skipped step are skipped too. All steps
+    share the request, so the image is decoded once.
+
+    categories:
+      default:
+        onboarding:
+          processor: PipelineProcessor
+          steps:
+            - {name: classify, task: default__doc_type}
+            - {name: validate, task: default__validation}
+            - {name: extract, task: default__extraction, when: validate.is_valid}
+    """
+
+    def __init__(
+        self,
+        task_config: TaskConfig,
+        general_config: GeneralConfig,
+        repo: BaseRepo,
+    ):
+        super().__init__(task_config, general_config, repo)
+        self.steps: List[PipelineStep] = task_config.steps or []
+        self.step_processors: Dict[str, BaseProcessor] = {}
+        self._check_steps()
+
+    def _fail(self, detail: str):
+        raise AppException(ErrorCode.INITIALIZATION_ERROR, f"Pipeline: {detail}")
+
+    def _check_steps(self):
+        if not self.steps:
+            self._fail("no steps configured")
+        seen = set()
+        for step in self.steps:
+            if step.name in seen:
+                self._fail(f"duplicate step '{step.name}'")
+            condition = step.condition
+            if condition is not None and condition[1] not in step.needs:
+                # A condition implies waiting for the step it reads
+                step.needs.append(condition[1])
+            for dep in step.needs:
+                # Only earlier steps may be referenced, so there are no cycles
+                if dep not in seen:
+                    self._fail(f"step '{step.name}' needs unknown or later step '{dep}'")
+            seen.add(step.name)
+
+    def _setup(self):
+        pass
+
+    def bind(self, processors: Dict[str, BaseProcessor]):
+        for step in self.steps:
+            processor = processors.get(step.task)
+            if processor is None:
+                self._fail(f"step '{step.name}' references unknown task '{step.task}'")
+            if isinstance(processor, PipelineProcessor):
+                self._fail(f"step '{step.name}' references another pipeline")
+            self.step_processors[step.name] = processor
+        log.info(
+            "Pipeline bound",
+            steps={s.name: s.task for s in self.steps},
+        )
+
+    def format_response(
+        self,
+        response: Union[Dict[str, Any], List[Dict[str, Any]]],
+        fields: List[FieldInfo],
+    ) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        # _run_step projects each step's result; projecting the combined
+        # result would drop the step keys
+        return response
+
+    def _should_run(
+        self,
+        step: PipelineStep,
+        results: Dict[str, Optional[Dict[str, Any]]],
+    ) -> bool:
+        if any(results[dep] is None for dep in step.needs):
+            return False
+        if step.condition is None:
+            return True
+        negated, ref, field = step.condition
+        return bool(results[ref].get(field)) != negated
+
+    def _run_step(self, step: PipelineStep, req: OCRRequest) -> Dict[str, Any]:
+        subreq = req.derive(
+            fields=step.fields if step.fields is not None else req.fields
+        )
+        processor = self.step_processors[step.name]
+        with span("step", step=step.name):
+            result = processor.process(subreq)
+        if subreq.fields is None:
+            return result
+        return processor.format_response(result, subreq.fields)
+
+    def _process(self, req: OCRRequest) -> Dict[str, Any]:
+        results: Dict[str, Optional[Dict[str, Any]]] = {}  # None when skipped
+        waiting = list(self.steps)
+        running: Dict[Future, PipelineStep] = {}
+        try:
+            while waiting or running:
+                # Steps only need earlier steps, so a single ordered pass
+                # also settles skips that cascade
+                blocked = []
+                for step in waiting:
+                    if any(dep not in results for dep in step.needs):
+                        blocked.append(step)
+                    elif self._should_run(step, results):
+                        ctx = contextvars.copy_context()
+                        future = _step_pool.submit(ctx.run, self._run_step, step, req)
+                        running[future] = step
+                    else:
+                        log.info("Skipping pipeline step", step=step.name)
+                        results[step.name] = None
+                waiting = blocked
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    results[step.name] = future.result()
+        finally:
+            for future in running:
+                future.cancel()
+        return {step.name: results.get(step.name) for step in self.steps}
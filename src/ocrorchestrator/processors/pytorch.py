@@ -1,13 +1,15 @@
-from typing import Any, Dict
+from typing import Any, Dict, List, Union
 
 from ..config.app_config import (
+    ClassifierOutput,
     GeneralConfig,
     TaskConfig,
 )
 from ..datamodels.api_io import OCRRequest
 from ..repos import BaseRepo
 from ..utils.constants import IMG_SIZE
-from ..utils.img import base64_to_pil
+from ..utils.img import request_image
+from ..utils.metrics import phase
 from ..utils.mixins import FastaiLearnerMixin
 from .base import BaseProcessor
 
@@ -40,12 +42,38 @@ class DocumentValidationProcessor(BaseProcessor, FastaiLearnerMixin):
         )
 
     def _process(self, req: OCRRequest) -> Dict[str, Any]:
-        image = base64_to_pil(req.image)
-        op = self.predict(image, self.task_config.classes)
+        with phase("decode"):
+            image = request_image(req)
+        with phase("model"):
+            op = self.predict(image, self.task_config.classes)
+        return self._to_result(op)
+
+    def _process_batch(
+        self,
+        reqs: List[OCRRequest],
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        outcomes: List[Union[Dict[str, Any], Exception]] = [None] * len(reqs)
+        images, idxs = [], []
+        with phase("decode"):
+            for i, req in enumerate(reqs):
+                try:
+                    images.append(request_image(req))
+                    idxs.append(i)
+                except Exception as e:
+                    outcomes[i] = e
+        if images:
+            with phase("model"):
+                ops = self.predict_batch(images, self.task_config.classes)
+            for i, op in zip(idxs, ops):
+                outcomes[i] = self._to_result(op)
+        return outcomes
+
+    def _to_result(self, op: ClassifierOutput) -> Dict[str, Any]:
         target = self.task_config.kwargs.get("target", self.classes[0])
         is_valid = op.prediction == target
         return {
             "is_valid": is_valid,
             "reason": op.prediction if not is_valid else None,
+            "prediction": op.prediction,
             "confidence": op.conf,
         }
\ No newline at end of file
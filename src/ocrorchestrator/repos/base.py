@@ -1,15 +1,35 @@
 import base64
+import fnmatch
 import functools
+import shutil
+import tempfile
 import traceback
 from abc import ABC, abstractmethod
-from pathlib import Path
-from typing import Any, Callable, Dict, List
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
-import fitz
 import structlog
 
-from ..datamodels.api_io import AppException
-from ..utils.constants import ErrorCode
+from ..datamodels.api_io import AppException, PdfOptions
+from ..utils.constants import (
+    ARTIFACT_CACHE_MAX_BYTES,
+    LISTING_PAGE_SIZE,
+    STREAM_CHUNK_SIZE,
+    ErrorCode,
+)
+from ..utils.pdf import render_pdf_page, render_pdf_pages
+from .cache import ArtifactCache, ObjectInfo
 
 log = structlog.get_logger()
 
@@ -38,11 +58,24 @@ def repo_error_handler(func: Callable):
     return wrapper
 
 
+def _matches(rel_path: str, patterns: List[str]) -> bool:
+    name = PurePosixPath(rel_path).name
+    return any(
+        fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel_path, pattern)
+        for pattern in patterns
+    )
+
+
 class BaseRepo(ABC):
     def __init__(self, remote_path: str, local_dir: str):
         self.remote_path = remote_path
         self.local_dir = Path(local_dir).resolve()
         self.local_dir.mkdir(parents=True, exist_ok=True)
+        self.cache = ArtifactCache(
+            self.local_dir / ".cache",
+            max_bytes=ARTIFACT_CACHE_MAX_BYTES,
+            namespace=f"{type(self).__name__}:{remote_path}",
+        )
 
     @abstractmethod
     def _get_yaml(self, path: str) -> Dict[str, Any]:
@@ -57,41 +90,121 @@ class BaseRepo(ABC):
         pass
 
     @abstractmethod
-    def _get_binary(self, path: str) -> bytes:
+    def _get_binary(self, path: str, info: Optional[ObjectInfo] = None) -> bytes:
+        """`info` is the object's version and size from a listing, if known."""
+
+    @abstractmethod
+    def _open(self, path: str) -> BinaryIO:
         pass
 
-    def _get_image(self, path: str, encode=True) -> str:
-        image_data = self._get_binary(path)
+    @contextmanager
+    def _spool(self, path: str) -> Iterator[str]:
+        # Stream the object to a local temp file and yield its name, for
+        # consumers that need a real file without buffering it in memory.
+        suffix = Path(path).suffix
+        with self._open(path) as src, tempfile.NamedTemporaryFile(
+            suffix=suffix
+        ) as tmp:
+            shutil.copyfileobj(src, tmp, STREAM_CHUNK_SIZE)
+            tmp.flush()
+            yield tmp.name
+
+    def _get_image(
+        self,
+        path: str,
+        encode=True,
+        info: Optional[ObjectInfo] = None,
+    ) -> str:
+        image_data = self._get_binary(path, info)
         if encode:
             return base64.b64encode(image_data).decode("utf-8")
         return image_data
 
-    def _get_pdf(self, path: str, page=0, encode=True) -> str:
-        pdf_data = self._get_binary(path)
-        pdf_document = fitz.open(stream=pdf_data, filetype="pdf")
-        if len(pdf_document) > 0:
-            first_page = pdf_document[page]
-            pix = first_page.get_pixmap()
-            img_data = pix.tobytes("png")
-            if encode:
-                return base64.b64encode(img_data).decode("utf-8")
-            return img_data
-        return ""
+    def _get_pdf(
+        self,
+        path: str,
+        page=0,
+        encode=True,
+        info: Optional[ObjectInfo] = None,
+    ) -> str:
+        # A single page is cheaper to render here than in the process pool
+        img_data = render_pdf_page(self._get_binary(path, info), page)
+        if img_data is None:
+            return ""
+        if encode:
+            return base64.b64encode(img_data).decode("utf-8")
+        return img_data
+
+    def _get_pdf_pages(
+        self,
+        path: str,
+        options: Optional[PdfOptions] = None,
+        encode=True,
+    ) -> List[Tuple[int, str]]:
+        options = options or PdfOptions()
+        with self._spool(path) as local_path:
+            rendered = render_pdf_pages(
+                local_path,
+                pages=options.pages,
+                dpi=options.dpi,
+                colorspace=options.colorspace,
+                fmt=options.format,
+            )
+        if encode:
+            return [
+                (page, base64.b64encode(img_data).decode("utf-8"))
+                for page, img_data in rendered
+            ]
+        return rendered
 
     @abstractmethod
-    def _download_obj(self, path: str, overwrite=False) -> str:
+    def _object_info(self, path: str) -> ObjectInfo:
         pass
 
     @abstractmethod
+    def _download_to(self, path: str, info: ObjectInfo, dest: str) -> None:
+        pass
+
+    def _download_obj(self, path: str, overwrite=False) -> str:
+        info = self._object_info(path)
+        return self.cache.fetch(
+            path,
+            info,
+            lambda dest: self._download_to(path, info, dest),
+            overwrite=overwrite,
+        )
+
+    @abstractmethod
+    def _iter_directory(
+        self,
+        path: str,
+        recursive=False,
+        page_size=LISTING_PAGE_SIZE,
+    ) -> Iterator[str]:
+        pass
+
+    def _iter_directory_info(
+        self,
+        path: str,
+        recursive=False,
+    ) -> Iterator[Tuple[str, Optional[ObjectInfo]]]:
+        # Repos whose listing carries versions and sizes override this
+        for obj in self._iter_directory(path, recursive=recursive):
+            yield obj, None
+
     def _list_directory(self, path: str) -> List[str]:
+        return list(self._iter_directory(path))
+
+    @abstractmethod
+    def _save_file(self, path: str, content: Union[str, bytes]) -> str:
         pass
 
     @abstractmethod
-    def _save_file(self, path: str, content: str) -> str:
+    def location(self, path: str) -> str:
         pass
 
     @repo_error_handler
-    def get_obj(self, path: str) -> str:
+    def get_obj(self, path: str, info: Optional[ObjectInfo] = None) -> str:
         if path.endswith("/"):
             return self._list_directory(path)
         elif path.endswith((".yaml", ".yml")):
@@ -99,20 +212,78 @@ class BaseRepo(ABC):
         elif path.endswith(".json"):
             return self._get_json(path)
         elif path.lower().endswith((".png", ".jpg", ".jpeg")):
-            return self._get_image(path)
+            return self._get_image(path, info=info)
         elif path.lower().endswith(".pdf"):
-            return self._get_pdf(path)
+            return self._get_pdf(path, info=info)
         elif path.lower().endswith(".txt"):
             return self._get_text(path)
         else:
-            return self._get_binary(path)
+            return self._get_binary(path, info)
+
+    def iter_objects(
+        self,
+        path: str,
+        patterns: Optional[List[str]] = None,
+        recursive=False,
+        with_info=False,
+    ) -> Iterator[Union[str, Tuple[str, Optional[ObjectInfo]]]]:
+        """
+        Lazily yield object paths under a prefix without materializing
+        the listing.
+
+        Args:
+        path (str): Directory prefix to list.
+        patterns (list[str] | None): Glob patterns matched against the
+            file name or the path relative to `path`; None keeps all.
+        recursive (bool): Descend into nested prefixes.
+        with_info (bool): Yield (path, info) with the ObjectInfo from the
+            listing, None when the repo's listing has none. Passing it to
+            get_obj saves large reads a metadata lookup.
+        """
+        prefix = path.rstrip("/") + "/" if path else ""
+        try:
+            for obj, info in self._iter_directory_info(path, recursive=recursive):
+                if patterns and not _matches(obj[len(prefix) :], patterns):
+                    continue
+                yield (obj, info) if with_info else obj
+        except Exception as e:
+            if isinstance(e, AppException):
+                raise e
+            error_code = ErrorCode.REPO_GET_ERROR
+            log.error(
+                "Repo operation error in iter_objects",
+                status_code=error_code.status_code,
+                status=error_code.name,
+                exc_info=True,
+            )
+            raise RepoException(error_code, traceback.format_exc()) from e
+
+    @repo_error_handler
+    def open_obj(self, path: str) -> BinaryIO:
+        return self._open(path)
+
+    @repo_error_handler
+    def get_pdf_pages(
+        self,
+        path: str,
+        options: Optional[PdfOptions] = None,
+    ) -> List[Tuple[int, str]]:
+        return self._get_pdf_pages(path, options)
+
+    @repo_error_handler
+    def exists(self, path: str) -> bool:
+        try:
+            self._object_info(path)
+        except FileNotFoundError:
+            return False
+        return True
 
     @repo_error_handler
     def download_obj(self, path: str, overwrite=False) -> str:
         return self._download_obj(path, overwrite=overwrite)
 
     @repo_error_handler
-    def save_file(self, path: str, content:str) -> str:
+    def save_file(self, path: str, content: Union[str, bytes]) -> str:
         return self._save_file(path, content)
 
 
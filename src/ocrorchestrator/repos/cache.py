@@ -0,0 +1,191 @@
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, NamedTuple, Optional
+
+import structlog
+
+from ..utils.metrics import ARTIFACT_CACHE
+
+try:
+    import fcntl
+except ImportError:  # windows: fall back to in-process locking only
+    fcntl = None
+
+log = structlog.get_logger()
+
+LOCK_FILE = ".lock"
+TMP_SUFFIX = ".tmp"
+
+
+class ObjectInfo(NamedTuple):
+    version: str  # generation/etag/mtime, anything that changes with content
+    size: int
+
+
+class ArtifactCache:
+    """
+    Content-addressed on-disk cache for downloaded repo objects.
+
+    Entries live in `<root>/<kk>/<key>/<basename>` where key hashes the
+    cache's namespace (the repo it serves), the object path and its
+    version, so a changed remote object maps to a new entry and repos
+    sharing a root never share entries. Writes go to a temp file and are renamed into
+    place under an exclusive file lock, which also serializes concurrent
+    downloads of the same entry across worker processes. When the cache
+    grows past `max_bytes` the least recently used entries are evicted.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, namespace: str = ""):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self._thread_lock = threading.Lock()
+        self._fallback_lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "bytes_downloaded": 0,
+            "bytes_evicted": 0,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self._thread_lock:
+            return dict(self._stats)
+
+    def _incr(self, key: str, value: int = 1):
+        with self._thread_lock:
+            self._stats[key] += value
+        ARTIFACT_CACHE.inc(value, event=key)
+
+    def _entry_dir(self, path: str, version: str) -> Path:
+        key = hashlib.sha256(
+            f"{self.namespace}:{path}@{version}".encode()
+        ).hexdigest()
+        return self.root / key[:2] / key
+
+    @staticmethod
+    def _is_valid(target: Path, size: int) -> bool:
+        try:
+            return target.stat().st_size == size
+        except FileNotFoundError:
+            return False
+
+    @contextmanager
+    def _locked(self, entry: Path, blocking=True):
+        entry.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            acquired = self._fallback_lock.acquire(blocking)
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    self._fallback_lock.release()
+            return
+
+        with open(entry / LOCK_FILE, "a") as fd:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(fd, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def fetch(
+        self,
+        path: str,
+        info: ObjectInfo,
+        download: Callable[[str], None],
+        overwrite=False,
+    ) -> str:
+        entry = self._entry_dir(path, info.version)
+        target = entry / Path(path).name
+
+        if not overwrite and self._is_valid(target, info.size):
+            self._incr("hits")
+            os.utime(target)
+            return str(target)
+
+        with self._locked(entry):
+            # Another worker may have completed the download while we waited
+            if not overwrite and self._is_valid(target, info.size):
+                self._incr("hits")
+                os.utime(target)
+                return str(target)
+
+            self._incr("misses")
+            log.info(
+                "Artifact cache miss, downloading",
+                path=path,
+                version=info.version,
+                size=info.size,
+            )
+            tmp = entry / f"{target.name}.{uuid.uuid4().hex}{TMP_SUFFIX}"
+            try:
+                download(str(tmp))
+                actual = tmp.stat().st_size
+                if actual != info.size:
+                    raise IOError(
+                        f"Size mismatch for {path}: expected {info.size}, got {actual}"
+                    )
+                os.replace(tmp, target)
+                # Downloads may keep the source mtime, the LRU needs fetch time
+                os.utime(target)
+            finally:
+                tmp.unlink(missing_ok=True)
+            self._incr("bytes_downloaded", info.size)
+
+        self._evict(keep=entry)
+        return str(target)
+
+    def _entries(self):
+        for shard in self.root.iterdir():
+            if not shard.is_dir():
+                continue
+            for entry in shard.iterdir():
+                if not entry.is_dir():
+                    continue
+                size, last_used = 0, 0.0
+                try:
+                    for f in entry.iterdir():
+                        if f.name == LOCK_FILE or f.name.endswith(TMP_SUFFIX):
+                            continue
+                        st = f.stat()
+                        size += st.st_size
+                        last_used = max(last_used, st.st_mtime)
+                except FileNotFoundError:  # evicted by another worker
+                    continue
+                yield entry, size, last_used
+
+    def _evict(self, keep: Optional[Path] = None):
+        entries = list(self._entries())
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+
+        for entry, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            with self._locked(entry, blocking=False) as acquired:
+                # Skip entries another worker is currently filling
+                if not acquired:
+                    continue
+                for f in entry.iterdir():
+                    if f.name != LOCK_FILE:
+                        f.unlink(missing_ok=True)
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            self._incr("evictions")
+            self._incr("bytes_evicted", size)
+            log.info("Evicted artifact cache entry", entry=entry.name, size=size)
@@ -1,5 +1,6 @@
 import os
-from typing import Any
+import threading
+from typing import Any, Dict, Tuple
 from urllib.parse import urlparse
 
 import structlog
@@ -7,12 +8,51 @@ import structlog
 from ..datamodels.api_io import AppException
 from ..repos import BaseRepo, GCSRepo, LocalRepo
 from ..utils.constants import LOCAL_DIR, LOCAL_REPO, ErrorCode
+from .gcs import get_storage_client
 
 log = structlog.get_logger()
 
 
 class RepoFactory:
+    # Repos are shared per (scheme, bucket) so clients and their
+    # connection pools are built once per process, not once per request.
+    _registry: Dict[Tuple[str, str], BaseRepo] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _create_repo(scheme: str, base: str) -> BaseRepo:
+        if scheme == "gs":
+            return GCSRepo(base, LOCAL_DIR, client=get_storage_client())
+        elif scheme in {"file"}:
+            homedir = os.path.join(LOCAL_REPO, base)
+            return LocalRepo(homedir, homedir)
+        raise AppException(
+            ErrorCode.REPO_INITIALIZATION_ERROR,
+            f"Unknown scheme: {scheme}",
+        )
+
+    @classmethod
+    def get_repo(cls, scheme: str, base: str) -> BaseRepo:
+        key = (scheme, base)
+        repo = cls._registry.get(key)
+        if repo is not None:
+            return repo
+        with cls._lock:
+            repo = cls._registry.get(key)
+            if repo is None:
+                log.info("Creating repository", scheme=scheme, base=base)
+                repo = cls._create_repo(scheme, base)
+                cls._registry[key] = repo
+            return repo
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._registry.clear()
+
+    @classmethod
     def from_uri(
+        cls,
         uri: str,
         download=False,
         read_prefix=True,
@@ -23,16 +63,7 @@ class RepoFactory:
             base = parsed_uri.netloc
             prefix = parsed_uri.path.lstrip("/")
 
-            if scheme == "gs":
-                repo = GCSRepo(base, LOCAL_DIR)
-            elif scheme in {"file"}:
-                homedir = os.path.join(LOCAL_REPO, base)
-                repo = LocalRepo(homedir, homedir)
-            else:
-                raise AppException(
-                    ErrorCode.REPO_INITIALIZATION_ERROR,
-                    f"Unknown scheme: {scheme}",
-                )
+            repo = cls.get_repo(scheme, base)
             if not read_prefix:
                 return repo, prefix
             if download:
@@ -52,4 +83,4 @@ class RepoFactory:
             raise AppException(
                 error_code,
                 f"Failed to initialize repo: {str(e)}",
-            ) from e
\ No newline at end of file
+            ) from e
@@ -1,17 +1,62 @@
 import json
-from typing import Any, Dict, List
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple, Union
 
+import structlog
 import yaml
 
+from ..utils.constants import (
+    GCS_CHUNK_SIZE,
+    GCS_DOWNLOAD_WORKERS,
+    GCS_PARALLEL_THRESHOLD,
+    GCS_POOL_SIZE,
+    LISTING_PAGE_SIZE,
+)
 from .base import BaseRepo
+from .cache import ObjectInfo
 
+log = structlog.get_logger()
 
-class GCSRepo(BaseRepo):
-    def __init__(self, remote_path: str, local_dir: str):
-        from google.cloud import storage
+_client = None
+_client_lock = threading.Lock()
+_download_pool = ThreadPoolExecutor(
+    max_workers=GCS_DOWNLOAD_WORKERS,
+    thread_name_prefix="gcs-download",
+)
+
+
+def get_storage_client():
+    """
+    Process-wide storage client with an enlarged HTTP connection pool.
+
+    Building a client performs credential discovery and opens a new
+    session, so it is done once and shared by all GCS repos.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google.cloud import storage
+            from requests.adapters import HTTPAdapter
+
+            client = storage.Client()
+            adapter = HTTPAdapter(
+                pool_connections=GCS_POOL_SIZE,
+                pool_maxsize=GCS_POOL_SIZE,
+            )
+            client._http.mount("https://", adapter)
+            client._http.mount("http://", adapter)
+            log.info("Created shared storage client", pool_size=GCS_POOL_SIZE)
+            _client = client
+        return _client
 
+
+class GCSRepo(BaseRepo):
+    def __init__(self, remote_path: str, local_dir: str, client=None):
         super().__init__(remote_path, local_dir)
-        self.client = storage.Client()
+        # An explicit client allows pointing at a local fake (e.g. fake-gcs-server)
+        self.client = client or get_storage_client()
         self.bucket = self.client.bucket(self.remote_path)
 
     def _get_yaml(self, path: str) -> Dict[str, Any]:
@@ -28,33 +73,126 @@ class GCSRepo(BaseRepo):
         blob = self.bucket.blob(path)
         return blob.download_as_text()
 
-    def _get_binary(self, path: str) -> bytes:
+    def _get_binary(self, path: str, info: Optional[ObjectInfo] = None) -> bytes:
         blob = self.bucket.blob(path)
-        return blob.download_as_bytes()
-
-    def _list_directory(self, path: str) -> List[str]:
-        prefix = path.rstrip("/") + "/"
-        blobs = self.bucket.list_blobs(prefix=prefix, delimiter="/")
-        files = []
-        for blob in blobs:
-            if blob.name != prefix:  # Exclude the directory itself
-                file_path = blob.name[len(prefix) :]
-                if (
-                    "/" not in file_path
-                ):  # Only include files in the immediate directory
-                    files.append(blob.name)
-        return files
-
-    def _download_obj(self, path: str, overwrite=False) -> str:
+        if info is None or info.size < GCS_PARALLEL_THRESHOLD:
+            # Most objects are small images: one GET, no metadata lookup
+            return blob.download_as_bytes()
+
+        buffer = bytearray(info.size)
+
+        def _write(start: int, data: bytes):
+            buffer[start : start + len(data)] = data
+
+        try:
+            # Ranges of the listed generation only, so an object overwritten
+            # since the listing is never stitched from two versions
+            received = self._download_ranges(
+                blob,
+                info.size,
+                _write,
+                if_generation_match=int(info.version),
+            )
+        except Exception as e:
+            if getattr(e, "code", None) != 412:
+                raise
+            received = None
+        if received != info.size:
+            log.warning(
+                "Object changed since listing, downloading it whole",
+                blob=path,
+                listed_size=info.size,
+            )
+            return blob.download_as_bytes()
+        return bytes(buffer)
+
+    def _download_ranges(self, blob, size: int, write, **kwargs) -> int:
+        # Ranged GETs of GCS_CHUNK_SIZE fetched concurrently; `write` is
+        # called with (offset, data) and must be safe for disjoint ranges.
+        # Returns the number of bytes received.
+        def _fetch(start: int) -> int:
+            end = min(start + GCS_CHUNK_SIZE, size) - 1
+            data = blob.download_as_bytes(start=start, end=end, checksum=None, **kwargs)
+            write(start, data[: end - start + 1])
+            return len(data)
+
+        futures = [
+            _download_pool.submit(_fetch, start)
+            for start in range(0, size, GCS_CHUNK_SIZE)
+        ]
+        received = sum(future.result() for future in futures)
+        log.info(
+            "Chunked download completed",
+            blob=blob.name,
+            size=size,
+            chunks=len(futures),
+        )
+        return received
+
+    def _open(self, path: str) -> BinaryIO:
         blob = self.bucket.blob(path)
-        local_file_path = self.local_dir / path
-        if local_file_path.exists() and not overwrite:
-            return str(local_file_path)
-        local_file_path.parent.mkdir(parents=True, exist_ok=True)
-        blob.download_to_filename(str(local_file_path))
-        return str(local_file_path)
-
-    def _save_file(self, path: str, content: str) -> None:
+        return blob.open("rb", chunk_size=GCS_CHUNK_SIZE)
+
+    def _iter_directory(
+        self,
+        path: str,
+        recursive=False,
+        page_size=LISTING_PAGE_SIZE,
+    ) -> Iterator[str]:
+        for name, _ in self._iter_directory_info(path, recursive, page_size):
+            yield name
+
+    def _iter_directory_info(
+        self,
+        path: str,
+        recursive=False,
+        page_size=LISTING_PAGE_SIZE,
+    ) -> Iterator[Tuple[str, Optional[ObjectInfo]]]:
+        prefix = path.rstrip("/") + "/" if path else ""
+        blobs = self.bucket.list_blobs(
+            prefix=prefix,
+            delimiter=None if recursive else "/",
+            page_size=page_size,
+        )
+        # Pages are fetched lazily, so names stream out as the listing arrives
+        for page in blobs.pages:
+            for blob in page:
+                if blob.name.endswith("/"):  # Exclude directory placeholders
+                    continue
+                info = None
+                if blob.size is not None and blob.generation is not None:
+                    info = ObjectInfo(version=str(blob.generation), size=blob.size)
+                yield blob.name, info
+
+    def _object_info(self, path: str) -> ObjectInfo:
+        blob = self.bucket.get_blob(path)
+        if blob is None:
+            raise FileNotFoundError(f"gs://{self.remote_path}/{path}")
+        return ObjectInfo(version=str(blob.generation), size=blob.size)
+
+    def _download_to(self, path: str, info: ObjectInfo, dest: str) -> None:
+        # Pin the generation so the bytes match the cache key
+        blob = self.bucket.blob(path, generation=int(info.version))
+        if info.size < GCS_PARALLEL_THRESHOLD:
+            blob.download_to_filename(dest)
+            return
+
+        with open(dest, "wb") as f:
+            f.truncate(info.size)
+        fd = os.open(dest, os.O_WRONLY)
+        try:
+            self._download_ranges(
+                blob,
+                info.size,
+                lambda start, data: os.pwrite(fd, data, start),
+            )
+        finally:
+            os.close(fd)
+
+    def _save_file(self, path: str, content: Union[str, bytes]) -> str:
         blob = self.bucket.blob(path)
         blob.upload_from_string(content)
+        return self.location(path)
+
+    def location(self, path: str) -> str:
         return f"gs://{self.remote_path}/{path}"
\ No newline at end of file
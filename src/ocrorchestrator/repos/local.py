@@ -1,11 +1,15 @@
 import json
+import os
 import shutil
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Union
 
 import yaml
 
+from ..utils.constants import LISTING_PAGE_SIZE
 from .base import BaseRepo
+from .cache import ObjectInfo
 
 
 class LocalRepo(BaseRepo):
@@ -24,27 +28,62 @@ class LocalRepo(BaseRepo):
         with open(full_path, "r") as file:
             return file.read()
 
-    def _get_binary(self, path: str) -> bytes:
+    def _get_binary(self, path: str, info: Optional[ObjectInfo] = None) -> bytes:
         full_path = Path(self.remote_path) / path
         with open(full_path, "rb") as file:
             return file.read()
 
-    def _list_directory(self, path: str) -> List[str]:
+    def _open(self, path: str) -> BinaryIO:
+        return open(Path(self.remote_path) / path, "rb")
+
+    @contextmanager
+    def _spool(self, path: str) -> Iterator[str]:
+        yield str(Path(self.remote_path) / path)
+
+    def _iter_directory(
+        self,
+        path: str,
+        recursive=False,
+        page_size=LISTING_PAGE_SIZE,
+    ) -> Iterator[str]:
         full_path = Path(self.remote_path) / path
-        return [str(Path(path) / f.name) for f in full_path.iterdir() if f.is_file()]
+        if not full_path.is_dir():  # Match GCS: an unknown prefix lists nothing
+            return
+        if not recursive:
+            with os.scandir(full_path) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        yield str(Path(path) / entry.name)
+            return
+
+        for dirpath, _, filenames in os.walk(full_path):
+            rel_dir = Path(path) / Path(dirpath).relative_to(full_path)
+            for name in filenames:
+                yield str(rel_dir / name)
+
+    def _object_info(self, path: str) -> ObjectInfo:
+        st = (Path(self.remote_path) / path).stat()
+        return ObjectInfo(version=f"{st.st_mtime_ns}-{st.st_size}", size=st.st_size)
+
+    def _download_to(self, path: str, info: ObjectInfo, dest: str) -> None:
+        shutil.copyfile(Path(self.remote_path) / path, dest)
 
     def _download_obj(self, path: str, overwrite=False) -> str:
         src_path = Path(self.remote_path) / path
-        local_file_path = self.local_dir / path
-        local_file_path.parent.mkdir(parents=True, exist_ok=True)
-        if local_file_path.exists() and not overwrite:
-            return str(local_file_path)
-        shutil.copy2(src_path, local_file_path)
-        return str(local_file_path)
-
-    def _save_file(self, path: str, content: str) -> str:
+        if Path(self.remote_path).resolve() == self.local_dir:
+            # The repo is its own local dir, the source is already on disk
+            if not src_path.is_file():
+                raise FileNotFoundError(str(src_path))
+            return str(src_path.resolve())
+        return super()._download_obj(path, overwrite=overwrite)
+
+    def _save_file(self, path: str, content: Union[str, bytes]) -> str:
         full_path = Path(self.remote_path) / path
         full_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(full_path, "w") as file:
+        mode = "wb" if isinstance(content, bytes) else "w"
+        with open(full_path, mode) as file:
             file.write(content)
-        return str(full_path)
\ No newline at end of file
+        return self.location(path)
+
+    def location(self, path: str) -> str:
+        return str(Path(self.remote_path) / path)
\ No newline at end of file
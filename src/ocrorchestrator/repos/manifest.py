@@ -0,0 +1,89 @@
+import json
+import threading
+import uuid
+from typing import Dict, List, Set
+
+import structlog
+
+from ..utils.constants import MANIFEST_DIR, MANIFEST_FLUSH_EVERY
+from .base import BaseRepo
+
+log = structlog.get_logger()
+
+
+class Manifest:
+    """
+    Checkpoint of source files whose results are fully written.
+
+    Stored as append-only segments under `<prefix>_manifest/`, each a JSON
+    list of source paths, so checkpointing never rewrites earlier entries.
+    A file is marked only once every sub-result it produced (one per PDF
+    page) has been acknowledged by the result sink.
+    """
+
+    def __init__(
+        self,
+        repo: BaseRepo,
+        prefix: str,
+        flush_every: int = MANIFEST_FLUSH_EVERY,
+    ):
+        self.repo = repo
+        self.prefix = f"{prefix}{MANIFEST_DIR}/"
+        self.flush_every = flush_every
+        self._completed: Set[str] = set()
+        self._unsaved: List[str] = []
+        self._remaining: Dict[str, int] = {}
+        self._owner: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._run_id = uuid.uuid4().hex[:8]
+        self._seq = 0
+
+    def load(self) -> int:
+        for segment in self.repo.iter_objects(self.prefix, patterns=["*.json"]):
+            self._completed.update(self.repo.get_obj(segment))
+        log.info(
+            "Loaded offline manifest",
+            location=self.repo.location(self.prefix),
+            completed=len(self._completed),
+        )
+        return len(self._completed)
+
+    def __contains__(self, source: str) -> bool:
+        return source in self._completed
+
+    def expect(self, source: str, guids: List[str]):
+        with self._lock:
+            if not guids:  # e.g. an empty PDF, nothing left to wait for
+                self._completed.add(source)
+                self._unsaved.append(source)
+                return
+            self._remaining[source] = len(guids)
+            for guid in guids:
+                self._owner[guid] = source
+
+    def on_written(self, guids: List[str]):
+        done = []
+        with self._lock:
+            for guid in guids:
+                source = self._owner.pop(guid, None)
+                if source is None:
+                    continue
+                self._remaining[source] -= 1
+                if self._remaining[source] == 0:
+                    del self._remaining[source]
+                    done.append(source)
+            self._completed.update(done)
+            self._unsaved.extend(done)
+            if len(self._unsaved) < self.flush_every:
+                return
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._unsaved = self._unsaved, []
+            seq = self._seq
+            self._seq += 1
+        if not batch:
+            return
+        path = f"{self.prefix}{self._run_id}-{seq:05d}.json"
+        self.repo.save_file(path, json.dumps(batch))
@@ -0,0 +1,179 @@
+import contextvars
+import io
+import json
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import structlog
+
+from ..datamodels.api_io import AppException, SaveOptions
+from ..utils.constants import RESULT_SINK_MAX_PENDING, RESULT_SINK_WORKERS, ErrorCode
+from ..utils.metrics import QUEUE_DEPTH, phase
+from .base import BaseRepo
+
+log = structlog.get_logger()
+
+
+def _encode_jsonl(rows: List[Tuple[str, Dict[str, Any]]]) -> str:
+    return "".join(
+        json.dumps({"guid": guid, "result": result}) + "\n" for guid, result in rows
+    )
+
+
+def _encode_parquet(rows: List[Tuple[str, Dict[str, Any]]]) -> bytes:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Results are schemaless, keep them as JSON strings in a single column
+    table = pa.Table.from_pylist(
+        [{"guid": guid, "result": json.dumps(result)} for guid, result in rows]
+    )
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    return buffer.getvalue()
+
+
+ENCODERS = {
+    "jsonl": _encode_jsonl,
+    "parquet": _encode_parquet,
+}
+
+
+class ResultSink:
+    """
+    Background writer for offline results.
+
+    Uploads run on a thread pool so inference does not wait on the repo.
+    At most `max_pending` writes are in flight; beyond that `write` blocks,
+    which bounds memory when the repo is slower than inference. With
+    `save_options.shard_size` set, results are packed into jsonl/parquet
+    shards instead of one object per result. `flush` must be called
+    before the results are reported as saved.
+    """
+
+    def __init__(
+        self,
+        repo: BaseRepo,
+        prefix: str,
+        save_options: SaveOptions,
+        on_written: Optional[Callable[[List[str]], None]] = None,
+        max_workers: int = RESULT_SINK_WORKERS,
+        max_pending: int = RESULT_SINK_MAX_PENDING,
+    ):
+        self.repo = repo
+        self.prefix = prefix
+        self.format = save_options.format
+        self.shard_size = save_options.shard_size
+        self.on_written = on_written
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="result-sink",
+        )
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._futures: List[Future] = []
+        self._error: Optional[BaseException] = None
+        self._submitted = 0
+        self._buffer: List[Tuple[str, Dict[str, Any]]] = []
+        self._run_id = uuid.uuid4().hex[:8]
+        self._shard_idx = 0
+
+        if self.format == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError as e:
+                raise AppException(
+                    ErrorCode.BAD_REQUEST,
+                    "Parquet output requires the optional 'pyarrow' dependency",
+                ) from e
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(not f.done() for f in self._futures)
+
+    def write(self, guid: str, result: Dict[str, Any]) -> str:
+        if self._error is not None:
+            # Stop the offline run early instead of inferring into a broken sink
+            raise self._error
+        if not self.shard_size:
+            path = f"{self.prefix}{guid}.{self.format}"
+            self._submit(path, lambda: json.dumps(result), [guid])
+            return self.repo.location(path)
+
+        with self._lock:
+            self._buffer.append((guid, result))
+            path = self._shard_path(self._shard_idx)
+            if len(self._buffer) < self.shard_size:
+                return self.repo.location(path)
+            rows, self._buffer = self._buffer, []
+            self._shard_idx += 1
+        self._submit_shard(path, rows)
+        return self.repo.location(path)
+
+    def flush(self) -> int:
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            path = self._shard_path(self._shard_idx)
+            if rows:
+                self._shard_idx += 1
+        if rows:
+            self._submit_shard(path, rows)
+
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+        if self._error is not None:
+            raise self._error
+        log.info("Result sink flushed", writes=self._submitted)
+        return self._submitted
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _shard_path(self, idx: int) -> str:
+        return f"{self.prefix}part-{self._run_id}-{idx:05d}.{self.format}"
+
+    def _submit_shard(self, path: str, rows: List[Tuple[str, Dict[str, Any]]]):
+        encoder = ENCODERS[self.format]
+        self._submit(path, lambda: encoder(rows), [guid for guid, _ in rows])
+
+    def _submit(
+        self,
+        path: str,
+        encode: Callable[[], Union[str, bytes]],
+        guids: List[str],
+    ):
+        self._slots.acquire()
+        QUEUE_DEPTH.inc(queue="result_sink")
+        ctx = contextvars.copy_context()
+        try:
+            future = self._executor.submit(ctx.run, self._upload, path, encode, guids)
+        except Exception:
+            QUEUE_DEPTH.dec(queue="result_sink")
+            self._slots.release()
+            raise
+        with self._lock:
+            self._futures = [f for f in self._futures if not f.done()]
+            self._futures.append(future)
+            self._submitted += 1
+
+    def _upload(
+        self,
+        path: str,
+        encode: Callable[[], Union[str, bytes]],
+        guids: List[str],
+    ):
+        try:
+            with phase("save"):
+                self.repo.save_file(path, encode())
+            if self.on_written:
+                self.on_written(guids)
+        except BaseException as e:
+            self._error = self._error or e
+            raise
+        finally:
+            QUEUE_DEPTH.dec(queue="result_sink")
+            self._slots.release()
@@ -1,9 +1,13 @@
+import contextvars
 import time
 import traceback
-from typing import Callable, List, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
 
 import structlog
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
 from .config.app_config import AppConfig
@@ -11,37 +15,65 @@ from .datamodels.api_io import (
     AppException,
     AppResponse,
     ConfigUpdateRequest,
+    OCRBatchRequest,
     OCRRequest,
     OCRRequestOffline,
+    Priority,
 )
-from .deps import get_processor, proc_manager
+from .deps import apply_priority, get_processor, proc_manager
 from .processors import BaseProcessor
+from .utils.admission import measure_queue_wait
 from .utils.constants import ErrorCode
-from .utils.misc import create_dynamic_message
+from .utils.metrics import render_metrics, track_request
+from .utils.misc import create_task_key, iterate_in_context
+from .utils.responses import AppJSONResponse, EventStreamResponse
+from .utils.routing import ModelRouter
 from .utils.timing import log_execution_time
+from .utils.tracing import span, start_trace
+from .utils.usage import usage_tracker
 
 ocr_router = APIRouter()
 log = structlog.get_logger()
 APP_NAME = "ocrorchestrator"
 
 
-def process_request(req: BaseModel, func: Callable) -> AppResponse:
+def process_request(
+    req: BaseModel,
+    func: Callable,
+    formatter: Optional[Callable] = None,
+) -> AppResponse:
+    task = (
+        create_task_key(req.category, req.task)
+        if getattr(req, "category", None)
+        else "-"
+    )
     try:
-        start_time = time.time()
-        response = func(req)
+        start_time = time.perf_counter()
+        with start_trace(func.__name__, task=task) as trace:
+            with measure_queue_wait() as queue_wait:
+                with track_request(task, func.__name__):
+                    response = func(req)
 
-        if "fields" in req.model_fields and (
-            req.fields is not None and req.save_options is None
-        ):
-            response = _format_response(response, req.fields)
+            if formatter is not None and (
+                req.fields is not None and req.save_options is None
+            ):
+                with span("format_response"):
+                    response = formatter(response, req.fields)
 
-        elapsed = (time.time() - start_time) * 1000
-        log.info(f"Request processed successfully. Elapsed: {elapsed}")
+        elapsed = max(
+            0.0, (time.perf_counter() - start_time) * 1000 - queue_wait.millis
+        )
+        log.info(
+            f"Request processed successfully. Elapsed: {elapsed}",
+            queue_time_millis=queue_wait.millis,
+        )
         return AppResponse(
             status="OK",
             status_code=200,
             execution_time_millis=elapsed,
+            queue_time_millis=queue_wait.millis,
             message=response,
+            stages=trace.stages() if getattr(req, "debug", False) else None,
         )
 
     except AppException as ae:
@@ -61,13 +93,143 @@ def process_request(req: BaseModel, func: Callable) -> AppResponse:
         raise AppException(error_code, traceback.format_exc())
 
 
-def _format_response(
-    response: Union[dict, List[dict]],
-    fields: List[str],
-) -> Union[dict, List[dict]]:
-    if isinstance(response, list):
-        return [create_dynamic_message(r, fields) for r in response]
-    return create_dynamic_message(response, fields)
+def stream_request(
+    req: OCRRequest,
+    processor: BaseProcessor,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Events of a streaming request: "start" once admitted, "field" for each
+    requested output field as soon as it is complete, then "result" with
+    the /predict response body, or "error". Errors before "start" are
+    raised instead, so they still get a plain HTTP error response.
+    """
+    task = create_task_key(req.category, req.task)
+    wanted = {field.name for field in req.fields} if req.fields is not None else None
+    started = False
+    try:
+        start_time = time.perf_counter()
+        with start_trace("process_stream", task=task) as trace:
+            with measure_queue_wait() as queue_wait:
+                with track_request(task, "process_stream"):
+                    for kind, payload in processor.process_stream(req):
+                        if kind == "start":
+                            started = True
+                            yield {"event": "start", "guid": str(req.guid)}
+                        elif kind == "field":
+                            if wanted is None or payload["name"] in wanted:
+                                yield {"event": "field", **payload}
+                        else:
+                            response = payload
+
+            if req.fields is not None and req.save_options is None:
+                with span("format_response"):
+                    response = processor.format_response(response, req.fields)
+
+        elapsed = max(
+            0.0, (time.perf_counter() - start_time) * 1000 - queue_wait.millis
+        )
+        log.info(
+            f"Streaming request processed successfully. Elapsed: {elapsed}",
+            queue_time_millis=queue_wait.millis,
+        )
+        result = AppResponse(
+            status="OK",
+            status_code=200,
+            execution_time_millis=elapsed,
+            queue_time_millis=queue_wait.millis,
+            message=response,
+            stages=trace.stages() if req.debug else None,
+        )
+        yield {"event": "result", **result.model_dump(mode="json")}
+
+    except Exception as e:
+        if isinstance(e, AppException):
+            error = e
+            log.error("Application-specific exception occurred", exc_info=True)
+        else:
+            error = AppException(
+                ErrorCode.INTERNAL_SERVER_ERROR,
+                traceback.format_exc(),
+            )
+            log.error(
+                "Unexpected error occurred",
+                error=str(e),
+                function="process_stream",
+                status_code=error.status_code,
+                status=error.status,
+                exc_info=True,
+            )
+        if not started:
+            raise error
+        # The 200 status line is already sent, so the error becomes an event
+        yield {
+            "event": "error",
+            "status": error.status,
+            "status_code": error.status_code,
+            "detail": error.detail,
+        }
+
+
+def _batch_item(
+    req: OCRRequest,
+    outcome: Union[Dict[str, Any], AppException],
+    processor: Optional[BaseProcessor],
+) -> Dict[str, Any]:
+    if isinstance(outcome, AppException):
+        return {
+            "guid": req.guid,
+            "status": outcome.status,
+            "status_code": outcome.status_code,
+            "error": outcome.detail,
+        }
+    if req.fields is not None:
+        outcome = processor.format_response(outcome, req.fields)
+    return {"guid": req.guid, "status": "OK", "status_code": 200, "result": outcome}
+
+
+def process_batch(batch: OCRBatchRequest) -> List[Dict[str, Any]]:
+    """
+    Fan the items of a batch out per category__task, one process_batch
+    call per processor, with the groups running concurrently. Results
+    come back in item order; failed items carry their error instead.
+    """
+    reqs = batch.to_requests()
+    groups: Dict[str, List[int]] = {}
+    for idx, req in enumerate(reqs):
+        groups.setdefault(create_task_key(req.category, req.task), []).append(idx)
+
+    items: List[Optional[Dict[str, Any]]] = [None] * len(reqs)
+
+    def _run_group(key: str, idxs: List[int]):
+        group = [reqs[i] for i in idxs]
+        processor = proc_manager.processors.get(key)
+        try:
+            if processor is None:
+                raise AppException(
+                    ErrorCode.PROCESSOR_NOT_FOUND,
+                    f"No processor found for {key}",
+                )
+            outcomes = processor.process_batch(group)
+        except AppException as e:
+            outcomes = [e] * len(group)
+        for i, req, outcome in zip(idxs, group, outcomes):
+            items[i] = _batch_item(req, outcome, processor)
+
+    if len(groups) == 1:
+        _run_group(*next(iter(groups.items())))
+        return items
+
+    with ThreadPoolExecutor(
+        max_workers=len(groups),
+        thread_name_prefix="predict-batch",
+    ) as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, _run_group, key, idxs)
+            for key, idxs in groups.items()
+        ]
+        for future in futures:
+            future.result()
+    return items
 
 
 @ocr_router.post(f"/{APP_NAME}/predict")
@@ -75,8 +237,19 @@ def _format_response(
 async def predict(
     req: OCRRequest,
     processor: BaseProcessor = Depends(get_processor),
+    x_priority: Optional[Priority] = Header(default=None),
 ):
-    return process_request(req, processor.process)
+    apply_priority(req, x_priority)
+    # Processors block, run them off the event loop so requests for other
+    # tasks (and admission rejections) are not held up behind them
+    return AppJSONResponse(
+        await run_in_threadpool(
+            process_request,
+            req,
+            processor.process,
+            processor.format_response,
+        )
+    )
 
 
 @ocr_router.post(f"/{APP_NAME}/predict_offline")
@@ -84,8 +257,82 @@ async def predict(
 async def predict_offline(
     req: OCRRequestOffline,
     processor: BaseProcessor = Depends(get_processor),
+    x_priority: Optional[Priority] = Header(default=None),
+):
+    apply_priority(req, x_priority)
+    return AppJSONResponse(
+        await run_in_threadpool(
+            process_request,
+            req,
+            processor.process_offline,
+            processor.format_response,
+        )
+    )
+
+
+@ocr_router.post(f"/{APP_NAME}/predict_stream")
+async def predict_stream(
+    req: OCRRequest,
+    processor: BaseProcessor = Depends(get_processor),
+    x_priority: Optional[Priority] = Header(default=None),
+    accept: Optional[str] = Header(default=None),
 ):
-    return process_request(req, processor.process_offline)
+    apply_priority(req, x_priority)
+    events = iterate_in_context(
+        contextvars.copy_context(),
+        stream_request(req, processor),
+    )
+    # Run up to admission here, so rejections are still plain HTTP errors
+    first = await run_in_threadpool(next, events)
+
+    def _body():
+        try:
+            yield first
+            yield from events
+        finally:
+            events.close()
+
+    return EventStreamResponse(
+        _body(),
+        sse=accept is not None and "text/event-stream" in accept,
+    )
+
+
+@ocr_router.post(f"/{APP_NAME}/predict_batch")
+@log_execution_time
+async def predict_batch(
+    req: OCRBatchRequest,
+    x_priority: Optional[Priority] = Header(default=None),
+):
+    apply_priority(req, x_priority)
+    return AppJSONResponse(await run_in_threadpool(process_request, req, process_batch))
+
+
+@ocr_router.get(f"/{APP_NAME}/usage")
+async def usage():
+    return AppJSONResponse(
+        {
+            **usage_tracker.snapshot(),
+            "budgets": {
+                key: processor.budget.state()
+                for key, processor in proc_manager.processors.items()
+                if processor.budget.max_qps or processor.budget.token_budget
+            },
+            "endpoints": {
+                key: processor.model.stats()
+                for key, processor in proc_manager.processors.items()
+                if isinstance(getattr(processor, "model", None), ModelRouter)
+            },
+        }
+    )
+
+
+@ocr_router.get(f"/{APP_NAME}/metrics")
+async def metrics():
+    return PlainTextResponse(
+        render_metrics(),
+        media_type="text/plain; version=0.0.4",
+    )
 
 
 @ocr_router.post(f"/{APP_NAME}/update_config")
@@ -95,13 +342,13 @@ async def update_config(
 ):
     if config_update.config:
         new_config = AppConfig(**config_update.config)
-        return process_request(new_config, proc_manager.refresh)
+        return AppJSONResponse(process_request(new_config, proc_manager.refresh))
     elif config_update.config_file:
         new_config = AppConfig(
             **proc_manager.repo.get_obj(
                 config_update.config_file,
             )
         )
-        return process_request(new_config, proc_manager.refresh)
+        return AppJSONResponse(process_request(new_config, proc_manager.refresh))
     else:
         raise AppException(ErrorCode.BAD_REQUEST, "No valid config provided")
\ No newline at end of file
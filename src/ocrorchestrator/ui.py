@@ -3,12 +3,13 @@ import json
 from typing import Any, Dict, List
 
 import gradio as gr
+from fastapi.concurrency import run_in_threadpool
 
 from .config.app_config import AppConfig
 from .datamodels.api_io import OCRRequest
 from .deps import get_processor
 from .managers.processor import ProcessorManager
-from .routers import predict
+from .routers import process_request
 from .utils.img import pil_to_base64
 
 
@@ -106,8 +107,10 @@ def create_gradio_interface(manager: ProcessorManager):
             }
             req = OCRRequest(**req_dict)
             processor = get_processor(req)
-            result = await predict(req, processor)
-            return result.dict()
+            result = await run_in_threadpool(
+                process_request, req, processor.process, processor.format_response
+            )
+            return result.model_dump(mode="json")
 
         async def process_multiple_inputs(
             files: List[Any],
@@ -129,8 +132,10 @@ def create_gradio_interface(manager: ProcessorManager):
                 }
                 req = OCRRequest(**req_dict)
                 processor = get_processor(req)
-                result = await predict(req, processor)
-                results.append(result.dict())
+                result = await run_in_threadpool(
+                    process_request, req, processor.process, processor.format_response
+                )
+                results.append(result.model_dump(mode="json"))
             return {"results": results}
 
         async def process_input(
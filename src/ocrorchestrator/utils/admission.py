@@ -0,0 +1,337 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import structlog
+
+from ..datamodels.api_io import AppException, Priority
+from .constants import ErrorCode
+from .metrics import ADMISSION_REJECTED, BUDGET_DEFERRED, QUEUE_DEPTH, QUEUE_WAIT
+from .tracing import span
+
+log = structlog.get_logger()
+
+
+class QueueWait:
+    """
+    Wall time a request spent waiting for processor slots, over all its
+    sub-requests. Sub-requests can wait concurrently (pipeline steps, batch
+    groups), so time during which any of them waits counts once.
+    """
+
+    __slots__ = ("ns", "_lock", "_waiting", "_since")
+
+    def __init__(self):
+        self.ns = 0
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._since = 0
+
+    @contextmanager
+    def waiting(self):
+        with self._lock:
+            if not self._waiting:
+                self._since = time.perf_counter_ns()
+            self._waiting += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                if not self._waiting:
+                    self.ns += time.perf_counter_ns() - self._since
+
+    @property
+    def millis(self) -> float:
+        return self.ns / 1e6
+
+
+_queue_wait: ContextVar[Optional[QueueWait]] = ContextVar("queue_wait", default=None)
+
+
+@contextmanager
+def measure_queue_wait():
+    wait = QueueWait()
+    token = _queue_wait.set(wait)
+    try:
+        yield wait
+    finally:
+        _queue_wait.reset(token)
+
+
+class _Waiter:
+    __slots__ = ("event",)
+
+    def __init__(self):
+        self.event = threading.Event()
+
+
+class AdmissionGate:
+    """
+    Per-task concurrency limit with bounded, prioritized queues.
+
+    At most `max_concurrency` callers run at once. Others wait in one FIFO
+    lane per priority class, each holding up to `max_queue` callers. A
+    freed slot goes to the interactive lane first, except that bulk gets
+    at least `bulk_min_share` of the slots handed out while both lanes
+    are waiting, so a stream of interactive calls cannot starve it.
+
+    A caller arriving at a full lane is rejected straight away with 429,
+    one that waited longer than `queue_timeout` with 503, both with a
+    Retry-After estimated from recent service times. `wait_only` callers
+    wait as long as needed and are never rejected: these are the
+    sub-requests of offline jobs, which are not gated as a whole and are
+    only throttled one sub-request at a time. Without `max_concurrency`
+    the gate is a no-op.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        bulk_min_share: float = 0.1,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.bulk_min_share = bulk_min_share
+        self._lock = threading.Lock()
+        self._active = 0
+        self._lanes: Dict[Priority, Deque[_Waiter]] = {
+            "interactive": deque(),
+            "bulk": deque(),
+        }
+        self._bulk_credit = 0.0
+        self._avg_service_s = 1.0
+
+    def _waiting(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def retry_after(self, lane: Priority) -> int:
+        # Rough time for the queue ahead of this lane to drain through all slots
+        ahead = len(self._lanes["interactive"])
+        if lane == "bulk":
+            ahead += len(self._lanes["bulk"])
+        slots = self.max_concurrency or 1
+        return max(1, math.ceil(self._avg_service_s * (ahead + 1) / slots))
+
+    def _reject(
+        self,
+        task: str,
+        lane: Priority,
+        error_code: ErrorCode,
+        reason: str,
+        detail: str,
+    ):
+        ADMISSION_REJECTED.inc(task=task, lane=lane, reason=reason)
+        log.warning("Request rejected by admission control", reason=reason, lane=lane)
+        raise AppException(
+            error_code,
+            detail,
+            headers={"Retry-After": str(self.retry_after(lane))},
+        )
+
+    def _acquire(
+        self,
+        task: str,
+        lane: Priority,
+        wait_only: bool,
+        request_wait: Optional[QueueWait] = None,
+    ) -> int:
+        start = time.perf_counter_ns()
+        queue = self._lanes[lane]
+        with self._lock:
+            if self._active < self.max_concurrency and not self._waiting():
+                self._active += 1
+                return 0
+            if (
+                not wait_only
+                and self.max_queue is not None
+                and len(queue) >= self.max_queue
+            ):
+                self._reject(
+                    task,
+                    lane,
+                    ErrorCode.TOO_MANY_REQUESTS,
+                    "queue_full",
+                    f"{lane} queue for {task} is full ({self.max_queue} waiting)",
+                )
+            waiter = _Waiter()
+            queue.append(waiter)
+
+        depth_label = f"admission:{task}:{lane}"
+        QUEUE_DEPTH.inc(queue=depth_label)
+        counted = request_wait.waiting() if request_wait is not None else nullcontext()
+        try:
+            with span("queue_wait", lane=lane), counted:
+                waiter.event.wait(None if wait_only else self.queue_timeout)
+        finally:
+            QUEUE_DEPTH.dec(queue=depth_label)
+        with self._lock:
+            # The slot is handed over under the lock, so this is final
+            if not waiter.event.is_set():
+                queue.remove(waiter)
+                self._reject(
+                    task,
+                    lane,
+                    ErrorCode.SERVICE_UNAVAILABLE,
+                    "queue_timeout",
+                    f"Timed out after {self.queue_timeout}s waiting for {task}",
+                )
+        return time.perf_counter_ns() - start
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        interactive, bulk = self._lanes["interactive"], self._lanes["bulk"]
+        if interactive and bulk:
+            self._bulk_credit += self.bulk_min_share
+            if self._bulk_credit >= 1.0:
+                self._bulk_credit -= 1.0
+                return bulk.popleft()
+            return interactive.popleft()
+        self._bulk_credit = 0.0
+        if interactive:
+            return interactive.popleft()
+        if bulk:
+            return bulk.popleft()
+        return None
+
+    def _release(self, service_s: float):
+        with self._lock:
+            self._avg_service_s = 0.8 * self._avg_service_s + 0.2 * service_s
+            waiter = self._next_waiter()
+            if waiter is not None:
+                # Hand the slot straight to the next waiter, _active is unchanged
+                waiter.event.set()
+            else:
+                self._active -= 1
+
+    @contextmanager
+    def admit(
+        self,
+        task: str,
+        lane: Priority = "interactive",
+        wait_only: bool = False,
+    ):
+        if self.max_concurrency is None:
+            yield
+            return
+        waited_ns = self._acquire(task, lane, wait_only, _queue_wait.get())
+        QUEUE_WAIT.observe(waited_ns / 1e9, task=task, lane=lane)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(time.perf_counter() - start)
+
+
+class TaskBudget:
+    """
+    Per-task request rate and LLM token budget.
+
+    `max_qps` is a token bucket holding up to one second of requests.
+    `token_budget` caps the tokens reported by the model per fixed window
+    of `window` seconds; usage is checked before a call and counted after
+    it, so a window can overshoot by the calls already running. Online
+    requests over budget are rejected with 429 and a Retry-After; deferred
+    callers (offline sub-requests) wait instead. Without limits it is a
+    no-op.
+    """
+
+    def __init__(
+        self,
+        max_qps: Optional[float] = None,
+        token_budget: Optional[int] = None,
+        window: float = 3600.0,
+    ):
+        self.max_qps = max_qps
+        self.token_budget = token_budget
+        self.window = window
+        self._lock = threading.Lock()
+        self._capacity = max(1.0, max_qps or 0.0)
+        self._permits = self._capacity
+        self._refilled = time.monotonic()
+        self._window_start = time.monotonic()
+        self._tokens_used = 0
+
+    def _roll_window(self, now: float):
+        elapsed = now - self._window_start
+        if elapsed >= self.window:
+            self._window_start += (elapsed // self.window) * self.window
+            self._tokens_used = 0
+
+    def _try_acquire(self, n: int) -> Optional[Tuple[float, str]]:
+        """None when admitted, else (seconds to wait, reason)."""
+        now = time.monotonic()
+        if self.token_budget is not None:
+            self._roll_window(now)
+            if self._tokens_used >= self.token_budget:
+                return self._window_start + self.window - now, "token_budget"
+        if self.max_qps is not None:
+            self._permits = min(
+                self._capacity,
+                self._permits + (now - self._refilled) * self.max_qps,
+            )
+            self._refilled = now
+            # A batch larger than the bucket goes once it is full and
+            # leaves it in debt
+            needed = min(n, self._capacity)
+            if self._permits < needed:
+                return (needed - self._permits) / self.max_qps, "qps_limit"
+            self._permits -= n
+        return None
+
+    def acquire(
+        self,
+        task: str,
+        lane: Priority = "interactive",
+        n: int = 1,
+        defer: bool = False,
+    ):
+        if self.max_qps is None and self.token_budget is None:
+            return
+        while True:
+            with self._lock:
+                blocked = self._try_acquire(n)
+            if blocked is None:
+                return
+            wait, reason = blocked
+            if not defer:
+                ADMISSION_REJECTED.inc(task=task, lane=lane, reason=reason)
+                log.warning("Request rejected by task budget", reason=reason, lane=lane)
+                raise AppException(
+                    ErrorCode.TOO_MANY_REQUESTS,
+                    f"{task} is over its {reason.replace('_', ' ')}",
+                    headers={"Retry-After": str(max(1, math.ceil(wait)))},
+                )
+            log.info(
+                "Deferring work over task budget",
+                reason=reason,
+                wait_s=round(wait, 3),
+            )
+            BUDGET_DEFERRED.inc(wait, task=task, reason=reason)
+            time.sleep(wait)
+
+    def consume(self, tokens: int):
+        if self.token_budget is None:
+            return
+        with self._lock:
+            self._roll_window(time.monotonic())
+            self._tokens_used += tokens
+
+    def state(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            if self.token_budget is not None:
+                self._roll_window(now)
+            return {
+                "max_qps": self.max_qps,
+                "token_budget": self.token_budget,
+                "window_seconds": self.window,
+                "window_tokens_used": self._tokens_used,
+                "window_resets_in": round(self._window_start + self.window - now, 3),
+            }
@@ -1,21 +1,52 @@
+import os
 from enum import Enum
 from pathlib import Path
 
-import torchvision.models as models
-from langchain_google_vertexai import HarmBlockThreshold as HT
-from vertexai.generative_models import HarmCategory as HC
-
 IMG_SIZE = (224, 224)
 PKG_ROOT = Path(__file__).parent.parent
 PROJ_ROOT = PKG_ROOT.parent.parent
 LOCAL_DIR = PROJ_ROOT.joinpath("data/local").as_posix()
 LOCAL_REPO = PROJ_ROOT.joinpath("local/fs").as_posix()
 GCP_ENV_VAR = "GOOGLE_APPLICATION_CREDENTIALS"
-
-PRETRAINED_MODELS = {
-    "resnet50": models.resnet50,
-    "resnet18": models.resnet18,
-}
+ARTIFACT_CACHE_MAX_BYTES = int(
+    os.environ.get("ARTIFACT_CACHE_MAX_BYTES", 20 * 1024**3)
+)
+GCS_POOL_SIZE = int(os.environ.get("GCS_POOL_SIZE", 32))
+GCS_CHUNK_SIZE = int(os.environ.get("GCS_CHUNK_SIZE", 8 * 1024**2))
+GCS_PARALLEL_THRESHOLD = int(os.environ.get("GCS_PARALLEL_THRESHOLD", 32 * 1024**2))
+GCS_DOWNLOAD_WORKERS = int(os.environ.get("GCS_DOWNLOAD_WORKERS", 8))
+STREAM_CHUNK_SIZE = 1024**2
+LISTING_PAGE_SIZE = 1000
+MANIFEST_DIR = "_manifest"
+MANIFEST_FLUSH_EVERY = 100
+RESUME_CHECK_DEPTH = int(os.environ.get("RESUME_CHECK_DEPTH", 16))  # outputs checked ahead
+TRACE_EXPORT = os.environ.get("TRACE_EXPORT", "")  # "", "otlp" or "file"
+TRACE_EXPORT_ENDPOINT = os.environ.get(
+    "TRACE_EXPORT_ENDPOINT", "http://localhost:4318/v1/traces"
+)
+TRACE_EXPORT_FILE = os.environ.get("TRACE_EXPORT_FILE", "traces.jsonl")
+TRACE_MAX_SPANS = int(os.environ.get("TRACE_MAX_SPANS", 1000))
+TRACE_SERVICE_NAME = "ocrorchestrator"
+RESULT_SINK_WORKERS = int(os.environ.get("RESULT_SINK_WORKERS", 8))
+RESULT_SINK_MAX_PENDING = int(os.environ.get("RESULT_SINK_MAX_PENDING", 64))
+PAGE_KEY = "page"
+SOURCE_KEY = "source"  # file of an offline result, in listings and PDFs
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 256))
+PIPELINE_MAX_WORKERS = int(os.environ.get("PIPELINE_MAX_WORKERS", 32))
+USAGE_DIR = os.environ.get("USAGE_DIR", "usage")
+USAGE_FLUSH_SECONDS = float(os.environ.get("USAGE_FLUSH_SECONDS", 60))  # 0 disables
+ROUTER_COOLDOWN_SECONDS = float(os.environ.get("ROUTER_COOLDOWN_SECONDS", 30))
+ROUTER_EWMA_ALPHA = 0.2
+THREADPOOL_SIZE = int(os.environ.get("THREADPOOL_SIZE", 100))
+LOG_ASYNC = os.environ.get("LOG_ASYNC", "1") == "1"
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+LOG_QUEUE_POLICY = os.environ.get("LOG_QUEUE_POLICY", "drop")  # "drop" or "block"
+LOG_INFO_SAMPLE_RATE = float(os.environ.get("LOG_INFO_SAMPLE_RATE", 1.0))
+LOG_RESULT_MAX_BYTES = int(os.environ.get("LOG_RESULT_MAX_BYTES", 4096))
+LOG_RESULT_SAMPLE_RATE = float(os.environ.get("LOG_RESULT_SAMPLE_RATE", 1.0))
+PDF_DEFAULT_DPI = 150  # offline pages
+PDF_ONLINE_DPI = 72  # single page of an online request
+PDF_MAX_WORKERS = int(os.environ.get("PDF_MAX_WORKERS", min(4, os.cpu_count() or 1)))
 
 
 class ErrorCode(Enum):
@@ -27,6 +58,8 @@ class ErrorCode(Enum):
     INTERNAL_SERVER_ERROR = (500, "Internal Server Error")
     PROCESSING_ERROR = (502, "Processing Error")
     INITIALIZATION_ERROR = (503, "Initialization Error")
+    TOO_MANY_REQUESTS = (429, "Too Many Requests")
+    SERVICE_UNAVAILABLE = (503, "Service Unavailable")
     PROCESS_CLEANUP_ERROR = (504, "Cleanup Error")
     API_CALL_ERROR = (511, "Api Call Error")
     REPO_GET_ERROR = (521, "Error reading file")
@@ -36,12 +69,3 @@ class ErrorCode(Enum):
     def __init__(self, status_code: int, message: str):
         self.status_code = status_code
         self.message = message
-
-
-SAFETY_SETTINGS = {
-    HC.HARM_CATEGORY_UNSPECIFIED: HT.BLOCK_NONE,
-    HC.HARM_CATEGORY_DANGEROUS_CONTENT: HT.BLOCK_NONE,
-    HC.HARM_CATEGORY_HATE_SPEECH: HT.BLOCK_NONE,
-    HC.HARM_CATEGORY_HARASSMENT: HT.BLOCK_NONE,
-    HC.HARM_CATEGORY_SEXUALLY_EXPLICIT: HT.BLOCK_NONE,
-}
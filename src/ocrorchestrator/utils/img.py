@@ -1,10 +1,19 @@
 import base64
 import imghdr
+import time
 from base64 import b64decode
 from io import BytesIO
+from typing import Tuple
 
+import numpy as np
+import structlog
 from PIL import Image
 
+from ..config.app_config import ImagePrepConfig
+from .metrics import IMAGE_PREP_BYTES, current_task, phase
+
+log = structlog.get_logger()
+
 
 def pil_to_base64(image):
     buffered = BytesIO()
@@ -42,4 +51,82 @@ def get_image_mime_type(base64_image: str) -> str:
 
     mime_type = mime_type_map.get(image_type, "application/octet-stream")
 
-    return mime_type
\ No newline at end of file
+    return mime_type
+
+
+def request_image(req) -> Image.Image:
+    """Decoded RGB image of a request, decoded once per request."""
+    return req.cache.get("image", lambda: base64_to_pil(req.image))
+
+
+def request_mime_type(req) -> str:
+    return req.cache.get("mime_type", lambda: get_image_mime_type(req.image))
+
+
+def crop_to_document(image: Image.Image) -> Image.Image:
+    """
+    Crop to the bright region of a photo of a page on a darker background.
+    The image is returned as is when no plausible page is found.
+    """
+    gray = np.asarray(image.convert("L"))
+    bright = gray > gray.mean()
+    rows = np.flatnonzero(bright.mean(axis=1) > 0.2)
+    cols = np.flatnonzero(bright.mean(axis=0) > 0.2)
+    if not len(rows) or not len(cols):
+        return image
+    box = (cols[0], rows[0], cols[-1] + 1, rows[-1] + 1)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    if area < 0.25 * gray.size:
+        return image
+    return image.crop(box)
+
+
+def prepare_image(image: Image.Image, opts: ImagePrepConfig) -> bytes:
+    if opts.crop_to_document:
+        image = crop_to_document(image)
+    if opts.max_edge and max(image.size) > opts.max_edge:
+        image = image.copy()
+        image.thumbnail((opts.max_edge, opts.max_edge), Image.LANCZOS)
+    if opts.grayscale:
+        image = image.convert("L")
+    buffered = BytesIO()
+    save_kwargs = {} if opts.format == "png" else {"quality": opts.quality}
+    image.save(buffered, format=opts.format.upper(), **save_kwargs)
+    return buffered.getvalue()
+
+
+def request_prepared_image(req, opts: ImagePrepConfig) -> Tuple[str, str]:
+    """
+    (base64, mime type) of the request's image after `opts`, prepared once
+    per request and options. The original is kept when preparing does not
+    make it smaller.
+    """
+
+    def _prepare():
+        with phase("decode"):
+            image = request_image(req)
+        start = time.perf_counter()
+        with phase("preprocess"):
+            prepared = base64.b64encode(prepare_image(image, opts)).decode()
+        prep_millis = round((time.perf_counter() - start) * 1000, 2)
+        original_bytes, prepared_bytes = len(req.image), len(prepared)
+        task = current_task.get()
+        IMAGE_PREP_BYTES.inc(original_bytes, task=task, stage="original")
+        kept = prepared_bytes >= original_bytes
+        if kept:
+            prepared, prepared_bytes = req.image, original_bytes
+            mime_type = request_mime_type(req)
+        else:
+            mime_type = f"image/{opts.format}"
+        IMAGE_PREP_BYTES.inc(prepared_bytes, task=task, stage="prepared")
+        log.info(
+            "Prepared image",
+            original_bytes=original_bytes,
+            prepared_bytes=prepared_bytes,
+            saved_bytes=original_bytes - prepared_bytes,
+            kept_original=kept,
+            prep_millis=prep_millis,
+        )
+        return prepared, mime_type
+
+    return req.cache.get(opts.cache_key, _prepare)
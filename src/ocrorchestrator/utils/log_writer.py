@@ -0,0 +1,157 @@
+import os
+import queue
+import threading
+import zlib
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Optional
+
+import orjson
+import structlog
+
+from .metrics import LOG_LINES_DROPPED, QUEUE_DEPTH
+
+_STOP = object()
+_KEEP_LEVELS = {"warning", "warn", "error", "critical", "exception", "fatal"}
+_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def render(event: Dict[str, Any]) -> bytes:
+    return orjson.dumps(event, default=repr, option=_JSON_OPTIONS) + b"\n"
+
+
+class LogWriter:
+    """
+    Renders and writes log events on a daemon thread so request threads
+    (and the event loop) never block on stdout.
+
+    Events wait in a bounded queue. When it is full, info/debug events are
+    dropped under the "drop" policy and counted, while warnings and errors
+    always wait for space. Under the "block" policy every event waits.
+    """
+
+    def __init__(
+        self,
+        stream: BinaryIO,
+        maxsize: int = 10000,
+        policy: str = "drop",
+        batch_size: int = 512,
+    ):
+        if policy not in {"drop", "block"}:
+            raise ValueError(f"Unknown log queue policy: {policy}")
+        self.stream = stream
+        self.maxsize = maxsize
+        self.policy = policy
+        self.batch_size = batch_size
+        self._dropped = 0
+        self._start()
+        # A forked child (e.g. the PDF render pool) inherits the queue but not
+        # the thread, start a fresh one there
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue: queue.Queue = queue.Queue(maxsize=self.maxsize)
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()  # producers drop concurrently
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, event: Dict[str, Any]):
+        QUEUE_DEPTH.inc(queue="log_writer")
+        if self.policy == "block" or event.get("level") in _KEEP_LEVELS:
+            self._queue.put(event)
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            QUEUE_DEPTH.dec(queue="log_writer")
+            with self._dropped_lock:
+                self._dropped += 1
+            LOG_LINES_DROPPED.inc()
+
+    def _drain(self, first: Any) -> list:
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = self._drain(self._queue.get())
+            lines = []
+            for event in batch:
+                if event is _STOP:
+                    stop = True
+                    continue
+                QUEUE_DEPTH.dec(queue="log_writer")
+                lines.append(render(event))
+            with self._dropped_lock:
+                dropped, self._dropped = self._dropped, 0
+            if dropped:
+                lines.append(
+                    render(
+                        {
+                            "event": "Dropped log lines",
+                            "dropped": dropped,
+                            "level": "warning",
+                            "timestamp": datetime.now(timezone.utc).isoformat(),
+                        }
+                    )
+                )
+            try:
+                self.stream.write(b"".join(lines))
+                self.stream.flush()
+            except (OSError, ValueError):
+                pass  # stdout closed, nothing sensible left to do
+
+    def shutdown(self, timeout: float = 5.0):
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+class QueueLogger:
+    """structlog logger that hands unrendered event dicts to a LogWriter."""
+
+    def __init__(self, writer: LogWriter):
+        self._writer = writer
+
+    def msg(self, **event: Any):
+        self._writer.put(event)
+
+    log = debug = info = warn = warning = msg
+    fatal = failure = err = error = critical = exception = msg
+
+
+class QueueLoggerFactory:
+    def __init__(self, writer: LogWriter):
+        self._writer = writer
+
+    def __call__(self, *args: Any) -> QueueLogger:
+        return QueueLogger(self._writer)
+
+
+class InfoSampler:
+    """
+    structlog processor keeping a `rate` fraction of requests' info/debug
+    logs. Sampling is keyed on the request's trans_id, so a request keeps
+    either all of its info lines or none; warnings and errors always pass.
+    """
+
+    def __init__(self, rate: float):
+        self.threshold = int(max(0.0, min(rate, 1.0)) * 2**32)
+
+    def __call__(self, logger, method_name: str, event_dict: Dict) -> Dict:
+        if self.threshold >= 2**32 or method_name in _KEEP_LEVELS:
+            return event_dict
+        trans_id: Optional[str] = event_dict.get("trans_id")
+        if trans_id is None:
+            return event_dict  # startup and background logs are not sampled
+        if zlib.crc32(trans_id.encode()) >= self.threshold:
+            raise structlog.DropEvent
+        return event_dict
@@ -1,9 +1,14 @@
+import random
 import uuid
+from typing import Any, Dict
 
+import orjson
 import structlog
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 
+from .constants import LOG_RESULT_MAX_BYTES, LOG_RESULT_SAMPLE_RATE
+
 logger = structlog.get_logger()
 
 healthcheck_routes = [
@@ -14,6 +19,8 @@ healthcheck_routes = [
 api_routes = [
     "/ocrorchestrator/predict",
     "/ocrorchestrator/predict_offline",
+    "/ocrorchestrator/predict_batch",
+    "/ocrorchestrator/predict_stream",
 ]
 
 
@@ -30,6 +37,7 @@ class LoggerMiddleware(BaseHTTPMiddleware):
             client_host=request.client.host,
             trans_id=str(uuid.uuid4()),
             api_name=path,
+            client_id=request.headers.get("x-client-id", "-"),
         )
 
         if request.method == "POST" and path in api_routes:
@@ -54,4 +62,24 @@ class LoggerMiddleware(BaseHTTPMiddleware):
             else:
                 logger.info("OK")
 
-        return response
\ No newline at end of file
+        return response
+
+
+def should_log_result() -> bool:
+    return LOG_RESULT_SAMPLE_RATE >= 1.0 or random.random() < LOG_RESULT_SAMPLE_RATE
+
+
+def loggable_result(result: Any) -> Dict[str, Any]:
+    """
+    Log fields for a model output. Small outputs are serialized once and
+    embedded as-is; larger ones are cut to a preview of
+    LOG_RESULT_MAX_BYTES, so big offline results don't dominate logging.
+    """
+    raw = orjson.dumps(result, default=str, option=orjson.OPT_NON_STR_KEYS)
+    if len(raw) <= LOG_RESULT_MAX_BYTES:
+        return {"output": orjson.Fragment(raw)}
+    return {
+        "output_preview": raw[:LOG_RESULT_MAX_BYTES].decode(errors="ignore"),
+        "output_bytes": len(raw),
+        "truncated": True,
+    }
@@ -0,0 +1,259 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Sequence, Tuple
+
+from .tracing import span
+
+# Task key ("category__task") of the request being processed, so code deep
+# in mixins can label phase timings without having it passed down.
+current_task: ContextVar[str] = ContextVar("current_task", default="unknown")
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)  # fmt: skip
+
+REGISTRY: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra="") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._values[key] = state
+            state[0][idx] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._values.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip((*self.buckets, "+Inf"), counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render_metrics() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+REQUESTS = Counter(
+    "ocr_requests_total",
+    "Requests handled per task and endpoint.",
+    ["task", "endpoint"],
+)
+ERRORS = Counter(
+    "ocr_errors_total",
+    "Failed requests per task and error code.",
+    ["task", "error_code"],
+)
+REQUEST_LATENCY = Histogram(
+    "ocr_request_latency_seconds",
+    "End to end request processing time.",
+    ["task", "endpoint"],
+)
+PHASE_LATENCY = Histogram(
+    "ocr_phase_latency_seconds",
+    "Time spent per processing phase (decode, preprocess, model, parse, save).",
+    ["task", "phase"],
+)
+IN_FLIGHT = Gauge(
+    "ocr_in_flight_requests",
+    "Requests currently being processed per task.",
+    ["task"],
+)
+QUEUE_DEPTH = Gauge(
+    "ocr_queue_depth",
+    "Items waiting in internal queues.",
+    ["queue"],
+)
+LOG_LINES_DROPPED = Counter(
+    "ocr_log_lines_dropped_total",
+    "Info/debug log lines dropped because the log queue was full.",
+)
+QUEUE_WAIT = Histogram(
+    "ocr_queue_wait_seconds",
+    "Time requests waited for a processor slot, per priority lane.",
+    ["task", "lane"],
+)
+ADMISSION_REJECTED = Counter(
+    "ocr_admission_rejected_total",
+    "Requests rejected by admission control (queue_full, queue_timeout).",
+    ["task", "lane", "reason"],
+)
+CASCADE_DECISIONS = Counter(
+    "ocr_cascade_decisions_total",
+    "Cascade outcomes per task: answered by the first stage or escalated, and why.",
+    ["task", "stage", "reason"],
+)
+LLM_BATCH_ITEMS = Counter(
+    "ocr_llm_batch_items_total",
+    "Images in packed LLM calls, parsed from the answer (ok) or retried alone (fallback).",
+    ["task", "outcome"],
+)
+IMAGE_PREP_BYTES = Counter(
+    "ocr_image_prep_bytes_total",
+    "Base64 image bytes before (original) and after (prepared) image prep.",
+    ["task", "stage"],
+)
+LLM_PARSE = Counter(
+    "ocr_llm_parse_total",
+    "LLM answers parsed as is (direct), after repair, after a fix call, or failed.",
+    ["task", "outcome"],
+)
+LLM_TOKENS = Counter(
+    "ocr_llm_tokens_total",
+    "LLM tokens reported by the model per task, input or output.",
+    ["task", "kind"],
+)
+BUDGET_DEFERRED = Counter(
+    "ocr_budget_deferred_seconds_total",
+    "Time offline work was held back by a task's qps limit or token budget.",
+    ["task", "reason"],
+)
+PROMPT_TOKENS = Gauge(
+    "ocr_prompt_tokens",
+    "Tokens in the last compiled prompt per task, whole prompt or format instructions.",
+    ["task", "part"],
+)
+ROUTER_CALLS = Counter(
+    "ocr_model_endpoint_calls_total",
+    "Calls per model endpoint of a routed task: ok, error or failover.",
+    ["task", "endpoint", "outcome"],
+)
+ROUTER_LATENCY = Gauge(
+    "ocr_model_endpoint_latency_seconds",
+    "EWMA latency of successful calls per model endpoint of a routed task.",
+    ["task", "endpoint"],
+)
+ARTIFACT_CACHE = Counter(
+    "ocr_artifact_cache_events_total",
+    "Artifact cache hits, misses and evictions.",
+    ["event"],
+)
+
+
+@contextmanager
+def task_context(task: str):
+    token = current_task.set(task)
+    try:
+        yield
+    finally:
+        current_task.reset(token)
+
+
+@contextmanager
+def phase(name: str):
+    with span(name), PHASE_LATENCY.time(task=current_task.get(), phase=name):
+        yield
+
+
+@contextmanager
+def track_request(task: str, endpoint: str):
+    IN_FLIGHT.inc(task=task)
+    REQUESTS.inc(task=task, endpoint=endpoint)
+    try:
+        with REQUEST_LATENCY.time(task=task, endpoint=endpoint):
+            yield
+    finally:
+        IN_FLIGHT.dec(task=task)
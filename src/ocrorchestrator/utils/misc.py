@@ -1,6 +1,19 @@
+import contextvars
+import functools
 import pathlib
+import threading
 from contextlib import contextmanager
-from typing import Any, Dict, List
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
 from pydantic import BaseModel, Field, create_model
 
@@ -52,21 +65,136 @@ def generate_dynamic_model(
     return create_model(name, **field_definitions)
 
 
+def fields_key(fields: List[FieldInfo]) -> Tuple[Tuple[str, str], ...]:
+    return tuple((field.name, field.description) for field in fields)
+
+
+@functools.lru_cache(maxsize=256)
+def _output_model(key: Tuple[Tuple[str, str], ...]) -> Type[BaseModel]:
+    return generate_dynamic_model(
+        [FieldInfo(name=name, description=description) for name, description in key]
+    )
+
+
+def output_model(fields: List[FieldInfo]) -> Type[BaseModel]:
+    """generate_dynamic_model, built once per field set."""
+    return _output_model(fields_key(fields))
+
+
+_JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    dict: "object",
+}
+
+
+@functools.lru_cache(maxsize=256)
+def compact_format_instructions(model: Type[BaseModel]) -> str:
+    """
+    Format instructions listing only each key's JSON type and description,
+    a fraction of the size of PydanticOutputParser's full JSON schema.
+    Defaults are left out: the model omits what it cannot find and the
+    parser fills in the defaults.
+    """
+    items = list(model.model_fields.items())
+    lines = []
+    for i, (name, field) in enumerate(items):
+        line = f'  "{name}": {_JSON_TYPES.get(field.annotation, "any")}'
+        if i < len(items) - 1:
+            line += ","
+        if field.description:
+            line += f"  // {field.description}"
+        lines.append(line)
+    return (
+        "Return only a JSON object with these keys. Leave out any key whose "
+        "value is not in the document, never use null.\n{\n"
+        + "\n".join(lines)
+        + "\n}"
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _dynamic_message_model(signature: Tuple[Tuple[str, type], ...]) -> Type[BaseModel]:
+    return create_model(
+        "DynamicMessage",
+        **{field: (field_type, ...) for field, field_type in signature},
+    )
+
+
 def create_dynamic_message(
     resp: Dict[str, Any], fields: List[FieldInfo] = None
 ) -> BaseModel:
     if fields is None:
-        field_definitions = {field: (type(value), ...)
-                             for field, value in resp.items()}
+        signature = tuple((field, type(value)) for field, value in resp.items())
     else:
-        field_definitions = {
-            field.name: (type(resp[field.name]), ...)
+        signature = tuple(
+            (field.name, type(resp[field.name]))
             for field in fields
             if field.name in resp
-        }
-    DynamicMessage = create_model("DynamicMessage", **field_definitions)
+        )
+    # Model classes are reused per field/type signature instead of being
+    # created (and leaked) for every message
+    DynamicMessage = _dynamic_message_model(signature)
     return DynamicMessage(**resp)
 
 
+def project_fields(resp: Dict[str, Any], fields: List[FieldInfo]) -> Dict[str, Any]:
+    """
+    Select the requested fields of a result, in request order.
+
+    Same output as create_dynamic_message(resp, fields).model_dump(), without
+    building a pydantic model. Fields missing from the result are skipped.
+    """
+    return {field.name: resp[field.name] for field in fields if field.name in resp}
+
+
 def create_task_key(category, task):
-    return f"{category}__{task}"
\ No newline at end of file
+    return f"{category}__{task}"
+
+
+class RequestCache:
+    """
+    Values derived from one request (decoded image, MIME type, ...), shared
+    by every processor that handles it, e.g. the steps of a pipeline.
+    """
+
+    def __init__(self):
+        self._values: Dict[Hashable, Any] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        if key in self._values:
+            return self._values[key]
+        # One lock per key: the factory may look up other keys (preparing
+        # an image decodes it first), and concurrent callers of the same
+        # key still compute it once
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._values:
+                self._values[key] = factory()
+            return self._values[key]
+
+
+T = TypeVar("T")
+
+
+def iterate_in_context(ctx: contextvars.Context, iterator: Iterator[T]) -> Iterator[T]:
+    """
+    Step `iterator` inside `ctx`. Starlette runs each step of a sync
+    streaming body in a fresh copy of the context, which would break
+    context managers (traces, metrics labels) held open across steps.
+    """
+    try:
+        while True:
+            try:
+                item = ctx.run(next, iterator)
+            except StopIteration:
+                return
+            yield item
+    finally:
+        ctx.run(getattr(iterator, "close", lambda: None))
@@ -1,5 +1,5 @@
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 import structlog
@@ -11,19 +11,48 @@ from langchain_core.messages import HumanMessage
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain_google_vertexai import ChatVertexAI
+from langchain_google_vertexai import HarmBlockThreshold as HT
 from PIL import Image
+from vertexai.generative_models import HarmCategory as HC
 
-from ..config.app_config import ClassifierOutput, FieldInfo
-from .misc import generate_dynamic_model, set_posix_windows
+from ..config.app_config import ClassifierOutput, FieldInfo, ModelEndpoint
+from .metrics import LLM_PARSE, PROMPT_TOKENS, current_task, phase
+from .misc import compact_format_instructions, output_model, set_posix_windows
+from .parsing import JSONFieldStream, parse_partial_json
+from .routing import ModelRouter
+from .usage import usage_from_message, usage_tracker
 from .ml import get_device, load_pretrained_classifier
 
 log = structlog.get_logger()
 
+SAFETY_SETTINGS = {
+    HC.HARM_CATEGORY_UNSPECIFIED: HT.BLOCK_NONE,
+    HC.HARM_CATEGORY_DANGEROUS_CONTENT: HT.BLOCK_NONE,
+    HC.HARM_CATEGORY_HATE_SPEECH: HT.BLOCK_NONE,
+    HC.HARM_CATEGORY_HARASSMENT: HT.BLOCK_NONE,
+    HC.HARM_CATEGORY_SEXUALLY_EXPLICIT: HT.BLOCK_NONE,
+}
+
+BATCH_PROMPT = (
+    "The {count} images above are separate documents, each preceded by its "
+    "label ({first} to {last}). Follow the instructions below for each "
+    "document on its own, and answer with a single JSON object that maps "
+    "every label to that document's output object.\n\n"
+)
+FIX_PROMPT = (
+    "The text below should be JSON following these instructions, but it "
+    "could not be parsed ({error}).\n\n{format}\n\nText:\n{text}\n\n"
+    "Answer with the corrected JSON only."
+)
+
 
 class VertexAILangchainMixin:
     model: Any
     prompt_temp: Any
     output_parser: Any
+    parse_retries: int = 1  # text-only calls asking the model to fix its output
+    budget: Any = None  # TaskBudget charged with the tokens of every call
+    format_style: str = "compact"  # or "schema", the full JSON schema
 
     def load_llm(
         self,
@@ -32,52 +61,299 @@ class VertexAILangchainMixin:
         top_p: float,
         top_k: int,
         max_output_tokens: int,
+        json_mode: bool = False,
+        endpoints: Optional[List[ModelEndpoint]] = None,
     ):
-        log.info("Loading Vertex AI LLM", model_name=model_name)
-        self.model = ChatVertexAI(
+        model_config = {
+            "temperature": temperature,
+            "top_p": top_p,
+            "top_k": top_k,
+            "max_output_tokens": max_output_tokens,
+            "json_mode": json_mode,
+        }
+        if not endpoints:
+            log.info(
+                "Loading Vertex AI LLM", model_name=model_name, json_mode=json_mode
+            )
+            self.model = self.create_chat_model(model_name, **model_config)
+            return
+        log.info(
+            "Loading Vertex AI LLM router",
+            endpoints=[endpoint.name for endpoint in endpoints],
+            json_mode=json_mode,
+        )
+        self.model = ModelRouter(
+            [
+                (
+                    endpoint,
+                    self.create_chat_model(
+                        endpoint.model,
+                        endpoint.location,
+                        **{**model_config, **endpoint.params},
+                    ),
+                )
+                for endpoint in endpoints
+            ],
+            task=getattr(self, "task_key", None) or current_task.get(),
+        )
+
+    def create_chat_model(
+        self,
+        model_name: str,
+        location: Optional[str] = None,
+        json_mode: bool = False,
+        **model_config,
+    ) -> Any:
+        extra = {"response_mime_type": "application/json"} if json_mode else {}
+        if location:
+            extra["location"] = location
+        return ChatVertexAI(
             model_name=model_name,
-            temperature=temperature,
-            top_p=top_p,
-            top_k=top_k,
-            max_output_tokens=max_output_tokens,
+            **model_config,
             # safety_settings=SAFETY_SETTINGS,
+            **extra,
         )
 
-    def load_output_parser(self, fields: list[FieldInfo]):
+    def build_output_parser(self, fields: list[FieldInfo]) -> PydanticOutputParser:
         log.info("Loading output parser", fields=fields)
-        ExtractedOutputModel = generate_dynamic_model(fields)
-        self.output_parser = PydanticOutputParser(
-            pydantic_object=ExtractedOutputModel,
-        )
+        return PydanticOutputParser(pydantic_object=output_model(fields))
 
-    def load_prompt(self, template: str):
+    def load_output_parser(self, fields: list[FieldInfo]):
+        self.output_parser = self.build_output_parser(fields)
+
+    def format_instructions(self, output_parser: PydanticOutputParser) -> str:
+        if self.format_style == "schema":
+            return output_parser.get_format_instructions()
+        return compact_format_instructions(output_parser.pydantic_object)
+
+    def count_tokens(self, text: str, exact: bool = True) -> int:
+        if exact:
+            try:
+                return self.model.get_num_tokens(text)
+            except Exception:
+                pass  # no API access, fakes
+        # Rough estimate, about 4 characters per token
+        return len(text) // 4
+
+    def build_prompt(
+        self,
+        template: str,
+        output_parser: PydanticOutputParser,
+        exact_tokens: bool = False,
+    ) -> str:
+        """
+        Prompt with the parser's format instructions. Token counts are
+        estimated unless `exact_tokens`, which can mean a remote call, so
+        it is only set at setup.
+        """
         log.info("Loading prompt template")
-        self.prompt_temp = PromptTemplate(
+        instructions = self.format_instructions(output_parser)
+        prompt = PromptTemplate(
             template=template,
             input_variables=[],
-            partial_variables={
-                "format": self.output_parser.get_format_instructions(),
-            },
+            partial_variables={"format": instructions},
         ).format()
-        log.info("Prompt template loaded", template=self.prompt_temp)
+        task = getattr(self, "task_key", None) or current_task.get()
+        prompt_tokens = self.count_tokens(prompt, exact_tokens)
+        format_tokens = self.count_tokens(instructions, exact_tokens)
+        PROMPT_TOKENS.set(prompt_tokens, task=task, part="prompt")
+        PROMPT_TOKENS.set(format_tokens, task=task, part="format")
+        log.info(
+            "Prompt template loaded",
+            template=prompt,
+            format_style=self.format_style,
+            prompt_tokens=prompt_tokens,
+            format_tokens=format_tokens,
+        )
+        return prompt
 
-    def predict(self, image_data: str) -> Dict[str, Any]:
-        image_message = {
-            "type": "image_url",
-            "image_url": {"url": image_data},
-        }
+    def load_prompt(self, template: str):
+        self.prompt_temp = self.build_prompt(
+            template, self.output_parser, exact_tokens=True
+        )
+
+    def _compiled(
+        self,
+        compiled: Optional[Tuple[PydanticOutputParser, str]],
+    ) -> Tuple[PydanticOutputParser, str]:
+        # A request's own (parser, prompt), else the task's
+        return compiled or (self.output_parser, self.prompt_temp)
+
+    @staticmethod
+    def _image_message(image_data: str) -> Dict[str, Any]:
+        return {"type": "image_url", "image_url": {"url": image_data}}
+
+    def _message(self, image_data: str, prompt: str) -> HumanMessage:
+        image_message = self._image_message(image_data)
         text_message = {
             "type": "text",
-            "text": self.prompt_temp,
+            "text": prompt,
         }
-        message = HumanMessage(content=[image_message, text_message])
-        result = self.model.invoke([message])
+        return HumanMessage(content=[image_message, text_message])
+
+    def _record_usage(self, result: Any):
+        usage = usage_from_message(result)
+        if usage is None:
+            return
+        usage_tracker.record(usage)
+        if self.budget is not None:
+            self.budget.consume(usage["total_tokens"])
+
+    def _invoke(self, message: HumanMessage) -> Any:
+        with phase("model"):
+            result = self.model.invoke([message])
+        self._record_usage(result)
+        return result
+
+    def predict(
+        self,
+        image_data: str,
+        compiled: Optional[Tuple[PydanticOutputParser, str]] = None,
+    ) -> Dict[str, Any]:
+        """`compiled` is the (parser, prompt) to use instead of the task's."""
+        output_parser, prompt = self._compiled(compiled)
+        result = self._invoke(self._message(image_data, prompt))
         log.info(
             "Raw LLM prediction completed successfully",
             result_preview=result.content[:100] + "...",
         )
-        parsed = self.output_parser.parse(result.content)
-        return parsed.dict()
+        return self._parse_answer(result.content, output_parser)
+
+    def predict_stream(
+        self,
+        image_data: str,
+        compiled: Optional[Tuple[PydanticOutputParser, str]] = None,
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Like predict, but streams the answer: yields ("field", {"name",
+        "value"}) for each output field as soon as the model has finished
+        writing it, then ("result", output) with the validated output.
+        """
+        output_parser, prompt = self._compiled(compiled)
+        message = self._message(image_data, prompt)
+        fields = output_parser.pydantic_object.model_fields
+        stream = JSONFieldStream()
+        result = None
+        with phase("model"):
+            for chunk in self.model.stream([message]):
+                # Adding chunks also sums their usage metadata
+                result = chunk if result is None else result + chunk
+                for name, value in stream.feed(chunk.content):
+                    if name in fields:
+                        yield "field", {"name": name, "value": value}
+        if result is not None:
+            self._record_usage(result)
+        log.info(
+            "Raw streamed LLM prediction completed successfully",
+            result_preview=stream.buffer[:100] + "...",
+        )
+        yield "result", self._parse_answer(stream.buffer, output_parser)
+
+    def _parse_answer(
+        self,
+        text: str,
+        output_parser: PydanticOutputParser,
+    ) -> Dict[str, Any]:
+        with phase("parse"):
+            try:
+                parsed, repaired = self._parse_output(text, output_parser)
+                LLM_PARSE.inc(
+                    task=current_task.get(),
+                    outcome="repaired" if repaired else "direct",
+                )
+                return parsed
+            except ValueError as e:
+                error = e
+        return self._reparse(text, error, output_parser)
+
+    def _parse_output(
+        self,
+        text: str,
+        output_parser: PydanticOutputParser,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """(output, repaired) of a model answer for the parser."""
+        model = output_parser.pydantic_object
+        try:
+            # JSON mode answers are plain JSON and validate without repair
+            return model.model_validate_json(text).model_dump(), False
+        except ValueError:
+            pass
+        data, repaired = parse_partial_json(text)
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected a JSON object, got {type(data).__name__}")
+        return model(**data).model_dump(), repaired
+
+    def _reparse(
+        self,
+        text: str,
+        error: ValueError,
+        output_parser: PydanticOutputParser,
+    ) -> Dict[str, Any]:
+        """Retry only the parse step: a text-only call to fix the answer."""
+        task = current_task.get()
+        for attempt in range(1, self.parse_retries + 1):
+            log.warning(
+                "LLM output did not parse, asking the model to fix it",
+                attempt=attempt,
+                error=str(error)[:200],
+            )
+            prompt = FIX_PROMPT.format(
+                error=error,
+                format=self.format_instructions(output_parser),
+                text=text,
+            )
+            text = self._invoke(HumanMessage(content=prompt)).content
+            with phase("parse"):
+                try:
+                    parsed, _ = self._parse_output(text, output_parser)
+                    LLM_PARSE.inc(task=task, outcome="fixed")
+                    return parsed
+                except ValueError as e:
+                    error = e
+        LLM_PARSE.inc(task=task, outcome="failed")
+        raise error
+
+    def predict_many(
+        self,
+        images_data: List[str],
+        compiled: Optional[Tuple[PydanticOutputParser, str]] = None,
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Extract from several images with one model call. The outputs come
+        back keyed by label and are split per image; an image whose output
+        is missing or does not parse gets the exception instead.
+        """
+        output_parser, prompt_temp = self._compiled(compiled)
+        labels = [f"doc_{i}" for i in range(len(images_data))]
+        content = []
+        for label, image_data in zip(labels, images_data):
+            content.append({"type": "text", "text": f"{label}:"})
+            content.append(self._image_message(image_data))
+        prompt = BATCH_PROMPT.format(
+            count=len(labels),
+            first=labels[0],
+            last=labels[-1],
+        )
+        content.append({"type": "text", "text": prompt + prompt_temp})
+        result = self._invoke(HumanMessage(content=content))
+        log.info(
+            "Raw batched LLM prediction completed successfully",
+            size=len(labels),
+            result_preview=result.content[:100] + "...",
+        )
+        with phase("parse"):
+            try:
+                outputs, _ = parse_partial_json(result.content)
+            except ValueError as e:
+                return [e] * len(labels)
+            model = output_parser.pydantic_object
+            parsed = []
+            for label in labels:
+                try:
+                    parsed.append(model(**outputs[label]).model_dump())
+                except Exception as e:
+                    parsed.append(e)
+        return parsed
 
 
 class FastaiLearnerMixin:
@@ -135,6 +411,27 @@ class FastaiLearnerMixin:
         )
         return result
 
+    def predict_batch(
+        self,
+        images: List[Image.Image],
+        class_names: list,
+    ) -> List[ClassifierOutput]:
+        dl = self.model.dls.test_dl(images, num_workers=0)
+        probs, _ = self.model.get_preds(dl=dl)
+        vocab = self.model.dls.vocab
+        results = []
+        for p in probs:
+            idx = p.argmax().item()
+            results.append(
+                ClassifierOutput(
+                    prediction=str(vocab[idx]),
+                    conf=p[idx].item(),
+                    probs={class_names[i]: prob.item() for i, prob in enumerate(p)},
+                )
+            )
+        log.info("Classifier batch prediction completed", size=len(results))
+        return results
+
 
 class TorchClassifierMixin:
     model: Any
@@ -193,4 +490,25 @@ class TorchClassifierMixin:
             prediction=result.prediction,
             confidence=result.conf,
         )
-        return result
\ No newline at end of file
+        return result
+
+    def predict_batch(
+        self,
+        images: List[Image.Image],
+        class_names: list,
+    ) -> List[ClassifierOutput]:
+        with torch.no_grad():
+            batch = torch.stack([self.tfms(image) for image in images]).to(self.device)
+            probabilities = F.softmax(self.model(batch).detach().cpu(), dim=1)
+        results = []
+        for probs in probabilities:
+            confidence, predicted = torch.max(probs, 0)
+            results.append(
+                ClassifierOutput(
+                    prediction=class_names[predicted.item()],
+                    conf=confidence.item(),
+                    probs={class_names[i]: p.item() for i, p in enumerate(probs)},
+                )
+            )
+        log.info("PyTorch classifier batch prediction completed", size=len(results))
+        return results
\ No newline at end of file
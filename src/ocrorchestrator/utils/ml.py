@@ -2,11 +2,15 @@ from typing import Optional
 
 import structlog
 import torch
-
-from .constants import PRETRAINED_MODELS
+import torchvision.models as models
 
 log = structlog.get_logger()
 
+PRETRAINED_MODELS = {
+    "resnet50": models.resnet50,
+    "resnet18": models.resnet18,
+}
+
 
 def get_device():
     return torch.device("cuda" if torch.cuda.is_available() else "cpu")
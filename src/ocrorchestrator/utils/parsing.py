@@ -0,0 +1,162 @@
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+_FENCE = re.compile(r"```[a-zA-Z]*[ \t]*\n?")
+_DECODER = json.JSONDecoder(strict=False)
+
+
+def strip_fences(text: str) -> str:
+    """
+    Text after the opening markdown code fence, when one opens before any
+    JSON bracket. Fences elsewhere (a stray closing fence, or one inside a
+    string value) are left alone, and the closing fence is left to the
+    parser, which ignores anything after the JSON value.
+    """
+    match = _FENCE.search(text)
+    if match is None:
+        return text
+    brackets = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if brackets and min(brackets) < match.start():
+        return text
+    return text[match.end() :]
+
+
+def _candidates(text: str) -> List[str]:
+    """
+    Repaired versions of `text`, which starts with `{` or `[`, longest first:
+    the whole top-level value with trailing commas removed, then the value
+    cut back after each complete top-level member. A member is complete
+    once the comma after it is seen, so a truncated trailing member, such as
+    a string or literal cut off mid-way, is dropped, never closed up.
+    """
+    closer = "}" if text[0] == "{" else "]"
+    chars: List[str] = []
+    cuts: List[int] = []  # positions in `chars` of commas after complete members
+    pending_comma: Optional[int] = None  # comma followed only by whitespace
+    depth = 0
+    in_string = escaped = False
+    for ch in text:
+        if in_string:
+            chars.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch.isspace():
+            chars.append(ch)
+            continue
+        if ch in "}]" and pending_comma is not None:
+            del chars[pending_comma]  # trailing comma
+            if cuts and cuts[-1] == pending_comma:
+                cuts.pop()
+        pending_comma = None
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                chars.append(ch)
+                break
+        elif ch == ",":
+            pending_comma = len(chars)
+            if depth == 1:
+                cuts.append(len(chars))
+        chars.append(ch)
+
+    head = "".join(chars)
+    candidates = [head] if depth == 0 else []
+    candidates.extend(head[:end] + closer for end in reversed(cuts))
+    return candidates
+
+
+def parse_partial_json(text: str) -> Tuple[Any, bool]:
+    """
+    Parse the JSON object or array in model output, tolerating code fences,
+    text around the value, raw newlines in strings, trailing commas and
+    truncation. Returns (value, repaired), where `repaired` means commas or
+    truncated members had to be dropped. Raises ValueError when no complete
+    member can be recovered.
+    """
+    text = strip_fences(text)
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        raise ValueError("No JSON object or array in output")
+    text = text[min(starts) :]
+    try:
+        # Anything after the value (a closing fence, prose) is ignored
+        return _DECODER.raw_decode(text)[0], False
+    except ValueError:
+        pass
+    for candidate in _candidates(text):
+        try:
+            return json.loads(candidate, strict=False), True
+        except ValueError:
+            continue
+    raise ValueError("Could not repair JSON in output")
+
+
+class JSONFieldStream:
+    """
+    Incremental parser for a streamed JSON object: `feed` returns the
+    top-level (key, value) members completed by each chunk. Text before
+    the opening brace (such as a code fence) and after the closing one is
+    ignored; a member that does not parse is skipped, leaving it to the
+    parse of the full answer.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0  # next character to scan
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member_start: Optional[int] = None
+        self.done = False
+
+    def _member(self, end: int) -> List[Tuple[str, Any]]:
+        text = self.buffer[self._member_start : end].strip()
+        self._member_start = end + 1
+        if not text:
+            return []
+        try:
+            return list(json.loads("{" + text + "}", strict=False).items())
+        except ValueError:
+            return []
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self.buffer += chunk
+        completed: List[Tuple[str, Any]] = []
+        buffer = self.buffer
+        while self._pos < len(buffer) and not self.done:
+            i, ch = self._pos, buffer[self._pos]
+            self._pos += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                if self._depth > 0:
+                    self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    if ch == "[":
+                        self.done = True  # only objects have fields
+                    self._member_start = i + 1
+            elif ch in "}]" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.extend(self._member(i))
+                    self.done = True
+            elif ch == "," and self._depth == 1:
+                completed.extend(self._member(i))
+        return completed
@@ -0,0 +1,154 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import fitz
+import structlog
+
+from .constants import PDF_DEFAULT_DPI, PDF_MAX_WORKERS, PDF_ONLINE_DPI
+
+log = structlog.get_logger()
+
+COLORSPACES = {
+    "rgb": fitz.csRGB,
+    "gray": fitz.csGRAY,
+}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: forking a threaded server with torch
+            # loaded can hang the children
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            log.info("Started PDF render pool", max_workers=PDF_MAX_WORKERS)
+        return _pool
+
+
+def shutdown_pdf_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown_pdf_pool)
+
+
+def _open(source) -> fitz.Document:
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def _render_pages(
+    source,
+    pages: List[int],
+    dpi: int,
+    colorspace: str,
+    fmt: str,
+) -> List[Tuple[int, bytes]]:
+    # Runs inside a pool worker: open the document once per chunk of pages.
+    rendered = []
+    with _open(source) as doc:
+        for page in pages:
+            pix = doc[page].get_pixmap(
+                dpi=dpi,
+                colorspace=COLORSPACES[colorspace],
+            )
+            rendered.append((page, pix.tobytes(fmt)))
+    return rendered
+
+
+def render_pdf_page(
+    source,
+    page: int = 0,
+    dpi: int = PDF_ONLINE_DPI,
+    colorspace: str = "rgb",
+    fmt: str = "png",
+) -> Optional[bytes]:
+    """Rasterize a single page in-process, None for an empty document."""
+    with _open(source) as doc:
+        if len(doc) == 0:
+            return None
+        pix = doc[page].get_pixmap(dpi=dpi, colorspace=COLORSPACES[colorspace])
+        return pix.tobytes(fmt)
+
+
+def count_pages(source) -> int:
+    with _open(source) as doc:
+        return len(doc)
+
+
+def render_pdf_pages(
+    source,
+    pages: Optional[List[int]] = None,
+    dpi: int = PDF_DEFAULT_DPI,
+    colorspace: str = "rgb",
+    fmt: str = "png",
+) -> List[Tuple[int, bytes]]:
+    """
+    Rasterize pages of a PDF, fanning out across worker processes.
+
+    Args:
+    source: PDF bytes or a local file path. Paths are cheaper to hand
+        to the workers since only the name is pickled.
+    pages (list[int] | None): Zero-based page indices; None renders all.
+    dpi (int): Render resolution.
+    colorspace (str): One of "rgb" or "gray".
+    fmt (str): Output image format understood by `Pixmap.tobytes`.
+
+    Returns:
+    list[tuple[int, bytes]]: (page index, encoded image) in page order.
+    """
+    if colorspace not in COLORSPACES:
+        raise ValueError(f"Unsupported colorspace: {colorspace}")
+    if isinstance(source, os.PathLike):
+        source = os.fspath(source)
+
+    num_pages = count_pages(source)
+    if num_pages == 0:
+        return []
+    if pages is None:
+        pages = list(range(num_pages))
+    else:
+        invalid = [p for p in pages if not 0 <= p < num_pages]
+        if invalid:
+            raise ValueError(
+                f"Pages {invalid} out of range for document with {num_pages} pages"
+            )
+    if not pages:
+        return []
+
+    n_chunks = min(PDF_MAX_WORKERS, len(pages))
+    if n_chunks <= 1:
+        rendered = _render_pages(source, pages, dpi, colorspace, fmt)
+        rendered.sort(key=lambda item: item[0])
+        return rendered
+
+    chunks = [pages[i::n_chunks] for i in range(n_chunks)]
+    pool = _get_pool()
+    futures = [
+        pool.submit(_render_pages, source, chunk, dpi, colorspace, fmt)
+        for chunk in chunks
+    ]
+    rendered = [item for future in futures for item in future.result()]
+    rendered.sort(key=lambda item: item[0])
+    log.info(
+        "Rendered PDF pages",
+        num_pages=len(rendered),
+        workers=n_chunks,
+        dpi=dpi,
+    )
+    return rendered
@@ -0,0 +1,57 @@
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Tuple, TypeVar
+
+from .metrics import QUEUE_DEPTH
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def prefetch(
+    items: Iterable[T],
+    loader: Callable[[T], R],
+    depth: int,
+) -> Iterator[Tuple[T, R]]:
+    """
+    Yield (item, loader(item)) in order while up to `depth` upcoming items
+    are loaded on background threads.
+
+    Only `depth` results are buffered at a time, so `items` can be an
+    arbitrarily long lazy iterator. A depth of 0 loads synchronously.
+    """
+    if depth <= 0:
+        for item in items:
+            yield item, loader(item)
+        return
+
+    it = iter(items)
+    window = deque()
+    pool = ThreadPoolExecutor(max_workers=depth, thread_name_prefix="prefetch")
+
+    def _submit_next() -> bool:
+        item = next(it, _DONE)
+        if item is _DONE:
+            return False
+        ctx = contextvars.copy_context()
+        window.append((item, pool.submit(ctx.run, loader, item)))
+        QUEUE_DEPTH.inc(queue="prefetch")
+        return True
+
+    try:
+        for _ in range(depth):
+            if not _submit_next():
+                break
+        while window:
+            item, future = window.popleft()
+            QUEUE_DEPTH.dec(queue="prefetch")
+            # Top up the buffer before handing the current item to the consumer
+            _submit_next()
+            yield item, future.result()
+    finally:
+        QUEUE_DEPTH.dec(len(window), queue="prefetch")
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+_DONE = object()
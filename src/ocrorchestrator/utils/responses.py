@@ -0,0 +1,55 @@
+from typing import Any, Dict, Iterator
+
+import orjson
+import pydantic_core
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+
+class AppJSONResponse(JSONResponse):
+    """
+    JSON response that skips FastAPI's jsonable_encoder: pydantic models are
+    serialized straight to bytes by pydantic-core, anything else by orjson.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return pydantic_core.to_json(content)
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+
+
+class EventStreamResponse(StreamingResponse):
+    """
+    Streams event dicts as NDJSON, or as server-sent events named after
+    their "event" key when `sse` is set.
+    """
+
+    def __init__(
+        self,
+        events: Iterator[Dict[str, Any]],
+        sse: bool = False,
+        **kwargs,
+    ):
+        super().__init__(
+            self._encode(events, sse),
+            media_type="text/event-stream" if sse else "application/x-ndjson",
+            **kwargs,
+        )
+
+    @staticmethod
+    def _encode(events: Iterator[Dict[str, Any]], sse: bool) -> Iterator[bytes]:
+        for event in events:
+            data = orjson.dumps(
+                event,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+            )
+            if sse:
+                name = event["event"].encode()
+                yield b"event: " + name + b"\ndata: " + data + b"\n\n"
+            else:
+                yield data + b"\n"
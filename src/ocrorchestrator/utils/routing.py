@@ -0,0 +1,170 @@
+import math
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import structlog
+
+from ..config.app_config import ModelEndpoint
+from .constants import ROUTER_COOLDOWN_SECONDS, ROUTER_EWMA_ALPHA
+from .metrics import ROUTER_CALLS, ROUTER_LATENCY
+
+log = structlog.get_logger()
+
+# Errors worth trying another endpoint for: quota, overload and timeouts
+_FAILOVER_CODES = {429, 503, 504}
+_FAILOVER_NAMES = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+}
+
+
+def is_failover_error(exc: Exception) -> bool:
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and code in _FAILOVER_CODES:
+        return True
+    return any(cls.__name__ in _FAILOVER_NAMES for cls in type(exc).__mro__)
+
+
+class _Endpoint:
+    def __init__(self, config: ModelEndpoint, model: Any):
+        self.name = config.name
+        self.weight = config.weight
+        self.model = model
+        self.latency: Optional[float] = None  # EWMA seconds of successful calls
+        self.error_rate = 0.0  # EWMA of failed calls
+        self.calls = 0
+        self.errors = 0
+        self.cooldown_until = 0.0
+
+    def score(self) -> float:
+        # Untried endpoints go first, so every endpoint gets measured
+        if self.calls == 0:
+            return 0.0
+        # One that has only failed so far goes after any that succeeded
+        latency = self.latency if self.latency is not None else math.inf
+        return latency * (1 + 10 * self.error_rate) / self.weight
+
+
+class ModelRouter:
+    """
+    Chat model spread over several endpoints (models or regions).
+
+    Each call goes to the better of two endpoints drawn by weight, scored
+    by their EWMA latency and error rate. A quota, overload or timeout
+    error puts the endpoint in cooldown for ROUTER_COOLDOWN_SECONDS and
+    the call fails over to the next best one; other errors are raised.
+    Streams fail over only before their first chunk. Offers invoke, stream
+    and get_num_tokens, so it stands in for a single chat model.
+    """
+
+    def __init__(
+        self, endpoints: Sequence[Tuple[ModelEndpoint, Any]], task: str = "-"
+    ):
+        self.endpoints = [_Endpoint(config, model) for config, model in endpoints]
+        self.task = task
+        self._lock = threading.Lock()
+
+    def _ranked(self) -> List[_Endpoint]:
+        """Endpoints to try, in order: a two-choice pick, then the rest by score."""
+        now = time.monotonic()
+        with self._lock:
+            ready = [ep for ep in self.endpoints if ep.cooldown_until <= now]
+            cooling = sorted(
+                (ep for ep in self.endpoints if ep.cooldown_until > now),
+                key=lambda ep: ep.cooldown_until,
+            )
+            if not ready:
+                # Everything is cooling down, try whichever recovers first
+                return cooling
+            pair = random.choices(ready, weights=[ep.weight for ep in ready], k=2)
+            first = min(pair, key=_Endpoint.score)
+            rest = sorted((ep for ep in ready if ep is not first), key=_Endpoint.score)
+        return [first, *rest, *cooling]
+
+    def _observe(self, ep: _Endpoint, elapsed: float, outcome: str):
+        alpha = ROUTER_EWMA_ALPHA
+        with self._lock:
+            ep.calls += 1
+            failed = outcome != "ok"
+            ep.errors += failed
+            ep.error_rate = (1 - alpha) * ep.error_rate + alpha * failed
+            if not failed:
+                ep.latency = (
+                    elapsed
+                    if ep.latency is None
+                    else (1 - alpha) * ep.latency + alpha * elapsed
+                )
+                ROUTER_LATENCY.set(ep.latency, task=self.task, endpoint=ep.name)
+            if outcome == "failover":
+                ep.cooldown_until = time.monotonic() + ROUTER_COOLDOWN_SECONDS
+        ROUTER_CALLS.inc(task=self.task, endpoint=ep.name, outcome=outcome)
+
+    def _failed(
+        self, ep: _Endpoint, elapsed: float, exc: Exception, last: bool
+    ) -> bool:
+        """Record a failed call, True when the next endpoint should be tried."""
+        failover = is_failover_error(exc)
+        self._observe(ep, elapsed, "failover" if failover else "error")
+        if failover and not last:
+            log.warning(
+                "Model endpoint unavailable, failing over",
+                endpoint=ep.name,
+                error=type(exc).__name__,
+            )
+        return failover and not last
+
+    def invoke(self, messages, **kwargs) -> Any:
+        ranked = self._ranked()
+        for i, ep in enumerate(ranked):
+            start = time.perf_counter()
+            try:
+                result = ep.model.invoke(messages, **kwargs)
+            except Exception as e:
+                last = i == len(ranked) - 1
+                if self._failed(ep, time.perf_counter() - start, e, last):
+                    continue
+                raise
+            self._observe(ep, time.perf_counter() - start, "ok")
+            return result
+
+    def stream(self, messages, **kwargs) -> Iterator[Any]:
+        ranked = self._ranked()
+        for i, ep in enumerate(ranked):
+            start = time.perf_counter()
+            started = False
+            try:
+                for chunk in ep.model.stream(messages, **kwargs):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                last = started or i == len(ranked) - 1
+                if self._failed(ep, time.perf_counter() - start, e, last):
+                    continue
+                raise
+            self._observe(ep, time.perf_counter() - start, "ok")
+            return
+
+    def get_num_tokens(self, text: str) -> int:
+        return self.endpoints[0].model.get_num_tokens(text)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "endpoint": ep.name,
+                    "weight": ep.weight,
+                    "calls": ep.calls,
+                    "errors": ep.errors,
+                    "error_rate": round(ep.error_rate, 4),
+                    "latency_ms": (
+                        round(ep.latency * 1000, 3) if ep.latency is not None else None
+                    ),
+                    "cooldown_s": round(max(0.0, ep.cooldown_until - now), 3),
+                }
+                for ep in self.endpoints
+            ]
@@ -11,17 +11,17 @@ logger = structlog.get_logger()
 def log_execution_time(func: Callable[..., Any]) -> Callable[..., Any]:
     @wraps(func)
     async def async_wrapper(*args, **kwargs):
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
         result = await func(*args, **kwargs)
-        end_time = time.time()
+        end_time = time.perf_counter_ns()
         log_time(func, start_time, end_time, args)
         return result
 
     @wraps(func)
     def sync_wrapper(*args, **kwargs):
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
         result = func(*args, **kwargs)
-        end_time = time.time()
+        end_time = time.perf_counter_ns()
         log_time(func, start_time, end_time, args)
         return result
 
@@ -41,7 +41,7 @@ def log_time(func, start_time, end_time, args):
 
     log_data = {
         "function": func.__name__,
-        "execution_time_millis": execution_time * 1000,
+        "execution_time_millis": execution_time / 1e6,
         "module": func.__module__,
     }
     if class_name:
@@ -0,0 +1,254 @@
+import atexit
+import json
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from .constants import (
+    TRACE_EXPORT,
+    TRACE_EXPORT_ENDPOINT,
+    TRACE_EXPORT_FILE,
+    TRACE_MAX_SPANS,
+    TRACE_SERVICE_NAME,
+)
+
+log = structlog.get_logger()
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "wall_start_ns",
+        "attributes",
+    )
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.wall_start_ns = time.time_ns()
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end - self.start_ns) / 1e6
+
+
+class Trace:
+    """Spans recorded for one request, shared by every thread working on it."""
+
+    def __init__(self, name: str):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self.root = self.add(name, None, {})
+
+    def add(self, name: str, parent_id: Optional[str], attributes: Dict) -> Span:
+        span = Span(name, parent_id, attributes)
+        with self._lock:
+            if len(self.spans) < TRACE_MAX_SPANS:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+        return span
+
+    def stages(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            spans = list(self.spans)
+        depth = {self.root.span_id: 0}
+        stages = []
+        for span in spans:
+            depth[span.span_id] = depth.get(span.parent_id, -1) + 1
+            stages.append(
+                {
+                    "name": span.name,
+                    "depth": depth[span.span_id],
+                    "offset_ms": round((span.start_ns - self.root.start_ns) / 1e6, 3),
+                    "duration_ms": round(span.duration_ms, 3),
+                    **span.attributes,
+                }
+            )
+        return stages
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a nested stage of the current request; a no-op outside a trace."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = trace.add(name, parent.span_id if parent else None, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        current.end_ns = time.perf_counter_ns()
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    trace = Trace(name)
+    trace.root.attributes.update(attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    structlog.contextvars.bind_contextvars(trace_id=trace.trace_id)
+    try:
+        yield trace
+    finally:
+        trace.root.end_ns = time.perf_counter_ns()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        totals: Dict[str, float] = {}
+        for stage in trace.stages():
+            totals[stage["name"]] = totals.get(stage["name"], 0.0) + stage["duration_ms"]
+        log.info(
+            "Request stages",
+            stages={name: round(ms, 3) for name, ms in totals.items()},
+            dropped_spans=trace.dropped,
+        )
+        if _exporter is not None:
+            _exporter.submit(trace)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(traces: List[Trace]) -> Dict[str, Any]:
+    """Encode traces as an OTLP/JSON ExportTraceServiceRequest."""
+    spans = []
+    for trace in traces:
+        for s in trace.spans:
+            end_ns = s.end_ns if s.end_ns is not None else s.start_ns
+            spans.append(
+                {
+                    "traceId": trace.trace_id,
+                    "spanId": s.span_id,
+                    "parentSpanId": s.parent_id or "",
+                    "name": s.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(s.wall_start_ns),
+                    "endTimeUnixNano": str(s.wall_start_ns + end_ns - s.start_ns),
+                    "attributes": [
+                        {"key": k, "value": _otlp_value(v)}
+                        for k, v in s.attributes.items()
+                    ],
+                }
+            )
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {
+                            "key": "service.name",
+                            "value": {"stringValue": TRACE_SERVICE_NAME},
+                        }
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "ocrorchestrator"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+class TraceExporter:
+    """
+    Ships finished traces off the request path on a daemon thread, either
+    to an OTLP/HTTP collector or as OTLP/JSON lines in a file. Traces are
+    dropped when the bounded queue is full.
+    """
+
+    def __init__(self, mode: str, endpoint: str, path: str, maxsize=1000):
+        self.mode = mode
+        self.endpoint = endpoint
+        self.path = path
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(
+            target=self._run,
+            name="trace-exporter",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def submit(self, trace: Trace):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            pass
+
+    def _drain(self, first: Trace) -> List[Trace]:
+        batch = [first]
+        while len(batch) < 100:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                return
+            batch = self._drain(trace)
+            stop = None in batch
+            batch = [t for t in batch if t is not None]
+            try:
+                self._export(batch)
+            except Exception:
+                log.warning("Trace export failed", mode=self.mode, exc_info=True)
+            if stop:
+                return
+
+    def _export(self, batch: List[Trace]):
+        payload = to_otlp(batch)
+        if self.mode == "file":
+            with open(self.path, "a") as f:
+                f.write(json.dumps(payload) + "\n")
+        elif self.mode == "otlp":
+            import requests
+
+            requests.post(self.endpoint, json=payload, timeout=5)
+
+    def shutdown(self, timeout: float = 5.0):
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+_exporter: Optional[TraceExporter] = None
+if TRACE_EXPORT in {"otlp", "file"}:
+    _exporter = TraceExporter(TRACE_EXPORT, TRACE_EXPORT_ENDPOINT, TRACE_EXPORT_FILE)
+    atexit.register(_exporter.shutdown)
+elif TRACE_EXPORT:
+    log.warning("Unknown TRACE_EXPORT, tracing export disabled", value=TRACE_EXPORT)
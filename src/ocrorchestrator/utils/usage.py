@@ -0,0 +1,130 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+import structlog
+
+from .constants import USAGE_DIR, USAGE_FLUSH_SECONDS
+from .metrics import LLM_TOKENS, current_task
+
+log = structlog.get_logger()
+
+USAGE_KEYS = ("calls", "input_tokens", "output_tokens", "total_tokens")
+
+
+def usage_from_message(message: Any) -> Optional[Dict[str, int]]:
+    """Token counts of a chat model response, None when it reports none."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return {
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+        }
+    # Older langchain-google-vertexai versions only fill response_metadata
+    usage = (getattr(message, "response_metadata", None) or {}).get("usage_metadata")
+    if usage:
+        return {
+            "input_tokens": usage.get("prompt_token_count", 0),
+            "output_tokens": usage.get("candidates_token_count", 0),
+            "total_tokens": usage.get("total_token_count", 0),
+        }
+    return None
+
+
+def current_client() -> str:
+    """Client of the current request, from the X-Client-Id header."""
+    return structlog.contextvars.get_contextvars().get("client_id") or "-"
+
+
+class UsageTracker:
+    """
+    LLM calls and tokens per task and client since the worker started,
+    kept in memory and written to the config repo every
+    USAGE_FLUSH_SECONDS as `<USAGE_DIR>/<host>-<pid>-<run>.json`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._since = time.time()
+        self._dirty = False
+        self._name = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._repo = None
+
+    def record(self, usage: Dict[str, int], task: str = None, client: str = None):
+        task = task or current_task.get()
+        client = client or current_client()
+        LLM_TOKENS.inc(usage["input_tokens"], task=task, kind="input")
+        LLM_TOKENS.inc(usage["output_tokens"], task=task, kind="output")
+        with self._lock:
+            totals = self._totals.setdefault(
+                (task, client), dict.fromkeys(USAGE_KEYS, 0)
+            )
+            totals["calls"] += 1
+            for key in USAGE_KEYS[1:]:
+                totals[key] += usage[key]
+            self._dirty = True
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            items = [(key, dict(totals)) for key, totals in self._totals.items()]
+        by_task: Dict[str, Dict[str, int]] = {}
+        by_client: Dict[str, Dict[str, int]] = {}
+        for (task, client), totals in items:
+            for group, key in ((by_task, task), (by_client, client)):
+                agg = group.setdefault(key, dict.fromkeys(USAGE_KEYS, 0))
+                for name in USAGE_KEYS:
+                    agg[name] += totals[name]
+        return {
+            "worker": self._name,
+            "since": self._since,
+            "tasks": by_task,
+            "clients": by_client,
+            "by_task_client": [
+                {"task": task, "client": client, **totals}
+                for (task, client), totals in items
+            ],
+        }
+
+    def flush(self):
+        if self._repo is None or not self._dirty:
+            return
+        self._dirty = False
+        path = f"{USAGE_DIR}/{self._name}.json"
+        try:
+            self._repo.save_file(path, orjson.dumps(self.snapshot()))
+        except Exception:
+            self._dirty = True
+            log.warning("Failed to flush usage", path=path, exc_info=True)
+
+    def _run(self):
+        while not self._stop.wait(USAGE_FLUSH_SECONDS):
+            self.flush()
+
+    def start(self, repo):
+        self._repo = repo
+        if self._thread is None and USAGE_FLUSH_SECONDS > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="usage-flush",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+usage_tracker = UsageTracker()
@@ -0,0 +1,63 @@
+import base64
+import io
+import os
+from typing import List
+
+import pytest
+from PIL import Image
+
+# Read when the routers are imported, tests add their processors themselves
+os.environ.setdefault("CONFIG_PATH", "file://my-bucket/configs/tests.yaml")
+
+from ocrorchestrator.config.app_config import GeneralConfig, TaskConfig  # noqa: E402
+from ocrorchestrator.repos import factory  # noqa: E402
+from ocrorchestrator.repos.factory import RepoFactory  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def repo():
+    repo, _ = RepoFactory.from_uri("file://my-bucket/", read_prefix=False)
+    return repo
+
+
+@pytest.fixture
+def local_fs(tmp_path, monkeypatch):
+    """Root of file:// repos for one test, in place of local/fs."""
+    monkeypatch.setattr(factory, "LOCAL_REPO", str(tmp_path))
+    RepoFactory.clear()
+    yield tmp_path
+    RepoFactory.clear()
+
+
+@pytest.fixture(scope="session")
+def images() -> List[str]:
+    """Small distinct base64 PNGs."""
+    encoded = []
+    for idx in range(6):
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 48), (40 * idx, 255 - 40 * idx, 128)).save(
+            buffer, format="PNG"
+        )
+        encoded.append(base64.b64encode(buffer.getvalue()).decode())
+    return encoded
+
+
+@pytest.fixture
+def make_llm(repo):
+    """FakeLLMProcessor set up from the local repo's general.txt prompt."""
+    from benchmarks.stubs import FakeLLMProcessor
+
+    def _make(fields=("invoice_no", "total"), **params):
+        config = TaskConfig(
+            processor="FakeLLMProcessor",
+            prompt_template="general.txt",
+            model="fake",
+            fields=list(fields) if fields else None,
+            params=[{"latency_ms": 0, **params}],
+        )
+        processor = FakeLLMProcessor(config, GeneralConfig(), repo)
+        processor.task_key = "test__llm"
+        processor._setup()
+        return processor
+
+    return _make
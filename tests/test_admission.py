@@ -0,0 +1,159 @@
+import contextvars
+import threading
+import time
+
+import pytest
+
+from ocrorchestrator.datamodels.api_io import AppException
+from ocrorchestrator.utils.admission import AdmissionGate, measure_queue_wait
+
+
+def _start(func, *args, **kwargs) -> threading.Thread:
+    # In a copy of the caller's context, like pipeline steps and batch groups
+    ctx = contextvars.copy_context()
+    thread = threading.Thread(
+        target=ctx.run, args=(func, *args), kwargs=kwargs, daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def _hold(gate: AdmissionGate, seconds: float, lane="interactive", **kwargs):
+    with gate.admit("test", lane, **kwargs):
+        time.sleep(seconds)
+
+
+def _until(condition):
+    # Callers start in threads, poll until they got where the test needs them
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def _hold_until(gate: AdmissionGate, release: threading.Event):
+    with gate.admit("test"):
+        release.wait(5)
+
+
+def _occupied(gate: AdmissionGate) -> threading.Event:
+    """Takes the gate's only slot until the returned event is set."""
+    release = threading.Event()
+    _start(_hold_until, gate, release)
+    _until(lambda: gate._active == 1)
+    return release
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    gate = AdmissionGate(max_concurrency=1, max_queue=1)
+    release = _occupied(gate)
+    waiter = _start(_hold, gate, 0.0)
+    _until(lambda: gate._waiting() == 1)
+
+    with pytest.raises(AppException) as exc_info:
+        with gate.admit("test"):
+            pass
+    release.set()
+    waiter.join(5)
+
+    assert exc_info.value.status_code == 429
+    assert int(exc_info.value.headers["Retry-After"]) >= 1
+
+
+def test_queue_timeout_is_rejected_with_retry_after():
+    gate = AdmissionGate(max_concurrency=1, queue_timeout=0.05)
+    release = _occupied(gate)
+
+    with pytest.raises(AppException) as exc_info:
+        with gate.admit("test"):
+            pass
+    release.set()
+
+    assert exc_info.value.status_code == 503
+    assert "Retry-After" in exc_info.value.headers
+    assert gate._waiting() == 0
+
+
+def test_wait_only_callers_are_never_rejected():
+    gate = AdmissionGate(max_concurrency=1, max_queue=1, queue_timeout=0.01)
+    release = _occupied(gate)
+    waiters = [_start(_hold, gate, 0.0, "bulk", wait_only=True) for _ in range(3)]
+    _until(lambda: gate._waiting() == 3)
+    time.sleep(0.05)
+
+    release.set()
+    for waiter in waiters:
+        waiter.join(5)
+
+    assert not any(waiter.is_alive() for waiter in waiters)
+    assert gate._active == gate._waiting() == 0
+
+
+def _served_order(gate: AdmissionGate, lanes) -> list:
+    # Queues one caller per lane entry behind a held slot, in that order
+    release, order = _occupied(gate), []
+
+    def record(name: str, lane: str):
+        with gate.admit("test", lane):
+            order.append(name)
+
+    waiters = []
+    for i, lane in enumerate(lanes):
+        waiters.append(_start(record, f"{lane[0]}{i}", lane))
+        _until(lambda: gate._waiting() == i + 1)
+    release.set()
+    for waiter in waiters:
+        waiter.join(5)
+    return order
+
+
+def test_interactive_lane_is_served_first():
+    gate = AdmissionGate(max_concurrency=1, bulk_min_share=0.0)
+
+    order = _served_order(gate, ["bulk", "interactive", "bulk", "interactive"])
+
+    assert order == ["i1", "i3", "b0", "b2"]
+
+
+def test_bulk_gets_its_min_share():
+    gate = AdmissionGate(max_concurrency=1, bulk_min_share=0.5)
+
+    order = _served_order(gate, ["bulk"] * 2 + ["interactive"] * 4)
+
+    # Every other slot goes to bulk while both lanes are waiting
+    assert order == ["i2", "b0", "i3", "b1", "i4", "i5"]
+
+
+def test_lanes_are_bounded_separately():
+    gate = AdmissionGate(max_concurrency=1, max_queue=1)
+    release = _occupied(gate)
+    waiter = _start(_hold, gate, 0.0)
+    _until(lambda: gate._waiting() == 1)
+
+    with pytest.raises(AppException):
+        with gate.admit("test"):
+            pass
+    bulk = _start(_hold, gate, 0.0, "bulk")
+    _until(lambda: gate._waiting() == 2)
+    release.set()
+    waiter.join(5)
+    bulk.join(5)
+
+    assert not bulk.is_alive()
+
+
+def test_concurrent_waits_count_once():
+    gate = AdmissionGate(max_concurrency=1)
+    holder = _start(_hold, gate, 0.2)
+    time.sleep(0.05)
+
+    start = time.perf_counter()
+    with measure_queue_wait() as queue_wait:
+        branches = [_start(_hold, gate, 0.0) for _ in range(3)]
+        for branch in branches:
+            branch.join(5)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    holder.join(5)
+
+    # Three branches each waited about 150ms, at the same time
+    assert 100 < queue_wait.millis <= elapsed_ms
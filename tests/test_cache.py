@@ -0,0 +1,81 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from ocrorchestrator.repos import LocalRepo
+from ocrorchestrator.repos.cache import ObjectInfo
+
+
+def _repo(root: Path, name: str = "remote") -> LocalRepo:
+    # A local dir apart from the source, so downloads go through the cache
+    remote = root / name
+    remote.mkdir(exist_ok=True)
+    return LocalRepo(str(remote), str(root / "local"))
+
+
+def _write(repo: LocalRepo, path: str, content: bytes, mtime_ns=None):
+    full_path = Path(repo.remote_path) / path
+    full_path.write_bytes(content)
+    if mtime_ns is not None:
+        os.utime(full_path, ns=(mtime_ns, mtime_ns))
+
+
+def test_hit_after_miss_and_miss_after_change(tmp_path):
+    repo = _repo(tmp_path)
+    _write(repo, "a.bin", b"first")
+
+    first = repo.download_obj("a.bin")
+    again = repo.download_obj("a.bin")
+    _write(repo, "a.bin", b"second version")
+    changed = repo.download_obj("a.bin")
+
+    assert first == again != changed
+    assert Path(changed).read_bytes() == b"second version"
+    stats = repo.cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_size_mismatch_is_not_cached(tmp_path):
+    repo = _repo(tmp_path)
+
+    def short_download(dest: str):
+        Path(dest).write_bytes(b"abc")
+
+    with pytest.raises(IOError):
+        repo.cache.fetch("a.bin", ObjectInfo("v1", 10), short_download)
+
+    entries = list((tmp_path / "local" / ".cache").rglob("a.bin*"))
+    assert entries == []
+
+
+def test_evicts_least_recently_fetched(tmp_path):
+    repo = _repo(tmp_path)
+    repo.cache.max_bytes = 250
+    year_ago = time.time_ns() - 365 * 24 * 3600 * 10**9
+    _write(repo, "a.bin", b"a" * 100)
+    # An old source mtime must not make a fresh download look stale
+    _write(repo, "b.bin", b"b" * 100, mtime_ns=year_ago)
+    _write(repo, "c.bin", b"c" * 100)
+
+    a = repo.download_obj("a.bin")
+    time.sleep(0.01)
+    b = repo.download_obj("b.bin")
+    time.sleep(0.01)
+    c = repo.download_obj("c.bin")
+
+    assert not Path(a).exists()
+    assert Path(b).exists() and Path(c).exists()
+    assert repo.cache.stats()["evictions"] == 1
+
+
+def test_repos_sharing_a_cache_root_keep_separate_entries(tmp_path):
+    first, second = _repo(tmp_path, "one"), _repo(tmp_path, "two")
+    # Same path, size and mtime, so the same version in both repos
+    mtime_ns = time.time_ns()
+    _write(first, "a.bin", b"from one", mtime_ns=mtime_ns)
+    _write(second, "a.bin", b"from two", mtime_ns=mtime_ns)
+
+    assert Path(first.download_obj("a.bin")).read_bytes() == b"from one"
+    assert Path(second.download_obj("a.bin")).read_bytes() == b"from two"
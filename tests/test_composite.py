@@ -0,0 +1,101 @@
+import pytest
+
+from ocrorchestrator.config.app_config import GeneralConfig, TaskConfig
+from ocrorchestrator.datamodels.api_io import (
+    AppException,
+    OCRRequest,
+    OCRRequestOffline,
+)
+from ocrorchestrator.processors import BaseProcessor
+from ocrorchestrator.processors.cascade import CascadeProcessor
+from ocrorchestrator.processors.pipeline import PipelineProcessor
+from ocrorchestrator.utils.admission import TaskBudget
+
+
+class UnsureClassifier(BaseProcessor):
+    """Classifier stand-in that always escalates."""
+
+    def _process(self, req: OCRRequest) -> dict:
+        return {"prediction": "invoice", "confidence": 0.1}
+
+
+def _pipeline(repo, llm) -> PipelineProcessor:
+    config = TaskConfig(
+        processor="PipelineProcessor",
+        steps=[{"name": "extract", "task": "test__llm"}],
+    )
+    pipeline = PipelineProcessor(config, GeneralConfig(), repo)
+    pipeline.bind({"test__llm": llm})
+    return pipeline
+
+
+def _cascade(repo, llm) -> CascadeProcessor:
+    config = TaskConfig(
+        processor="CascadeProcessor",
+        params=[{"classifier": "test__clf", "llm": "test__llm", "threshold": 0.5}],
+    )
+    cascade = CascadeProcessor(config, GeneralConfig(), repo)
+    classifier = UnsureClassifier(TaskConfig(processor="UnsureClassifier"), None, repo)
+    cascade.bind({"test__clf": classifier, "test__llm": llm})
+    return cascade
+
+
+def _spent_llm(make_llm):
+    # A budget with no permits left: online calls get 429, offline ones wait
+    llm = make_llm()
+    llm.budget = TaskBudget(max_qps=20)
+    llm.budget.acquire("test__llm", n=20)
+    return llm
+
+
+@pytest.mark.parametrize("build", [_pipeline, _cascade])
+def test_inner_steps_reject_online_requests(build, make_llm, repo, images):
+    composite = build(repo, _spent_llm(make_llm))
+    req = OCRRequest(image=images[0], category="test", task="composite")
+
+    with pytest.raises(AppException) as exc_info:
+        composite.process(req)
+
+    assert exc_info.value.status_code == 429
+
+
+@pytest.mark.parametrize("build", [_pipeline, _cascade])
+def test_inner_steps_wait_for_offline_requests(build, make_llm, repo, images):
+    composite = build(repo, _spent_llm(make_llm))
+    job = OCRRequestOffline(
+        location="x.png", guid="job", category="test", task="composite"
+    )
+    req = OCRRequest.from_offline_req(job, images[0])
+
+    result = composite.process(req)
+
+    assert req.offline and req.derive().offline
+    llm_result = result["extract"] if build is _pipeline else result
+    assert llm_result["invoice_no"] == "stub"
+
+
+def test_cascade_without_fields_returns_whole_llm_result(make_llm, repo, images):
+    cascade = _cascade(repo, make_llm())
+
+    result = cascade.process(OCRRequest(image=images[0], category="t", task="c"))
+
+    assert result["invoice_no"] == result["total"] == "stub"
+    assert result["cascade"]["reason"] == "low_confidence"
+
+
+def test_pipeline_projects_each_step_on_its_fields(make_llm, repo, images):
+    config = TaskConfig(
+        processor="PipelineProcessor",
+        steps=[
+            {"name": "classify", "task": "test__clf", "fields": ["prediction"]},
+            {"name": "extract", "task": "test__llm"},
+        ],
+    )
+    pipeline = PipelineProcessor(config, GeneralConfig(), repo)
+    classifier = UnsureClassifier(TaskConfig(processor="UnsureClassifier"), None, repo)
+    pipeline.bind({"test__clf": classifier, "test__llm": make_llm()})
+
+    result = pipeline.process(OCRRequest(image=images[0], category="t", task="p"))
+
+    assert result["classify"] == {"prediction": "invoice"}
+    assert result["extract"]["invoice_no"] == "stub"
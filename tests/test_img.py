@@ -0,0 +1,87 @@
+import base64
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from ocrorchestrator.config.app_config import ImagePrepConfig
+from ocrorchestrator.datamodels.api_io import OCRRequest
+from ocrorchestrator.utils.img import request_prepared_image
+from ocrorchestrator.utils.misc import RequestCache
+
+
+def _request(image: str) -> OCRRequest:
+    return OCRRequest(image=image, category="test", task="llm", log_result=False)
+
+
+def _large_image() -> str:
+    buffer = io.BytesIO()
+    Image.effect_noise((800, 600), 64).convert("RGB").save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def _call(func, *args):
+    # On a thread, so a deadlock fails the test instead of hanging it
+    result = {}
+    thread = threading.Thread(
+        target=lambda: result.update(value=func(*args)),
+        daemon=True,
+    )
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive(), f"{func.__name__} deadlocked"
+    return result["value"]
+
+
+def test_request_prepared_image_completes():
+    req = _request(_large_image())
+    opts = ImagePrepConfig(max_edge=200, format="jpeg", quality=70)
+
+    prepared, mime_type = _call(request_prepared_image, req, opts)
+
+    assert mime_type == "image/jpeg"
+    assert len(prepared) < len(req.image)
+    assert max(Image.open(io.BytesIO(base64.b64decode(prepared))).size) == 200
+    assert request_prepared_image(req, opts)[0] is prepared
+
+
+def test_request_prepared_image_keeps_smaller_original(images):
+    req = _request(images[0])
+    opts = ImagePrepConfig(format="png")
+
+    prepared, mime_type = _call(request_prepared_image, req, opts)
+
+    assert prepared == req.image
+    assert mime_type == "image/png"
+
+
+def test_request_cache_computes_each_key_once():
+    cache = RequestCache()
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    def get():
+        barrier.wait()
+        return cache.get("key", factory)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        values = list(pool.map(lambda _: get(), range(8)))
+
+    assert len(calls) == 1
+    assert all(value is values[0] for value in values)
+
+
+def test_request_cache_factory_can_use_other_keys():
+    cache = RequestCache()
+
+    value = _call(cache.get, "outer", lambda: cache.get("inner", lambda: 1) + 1)
+
+    assert value == 2
+    assert cache.get("inner", lambda: 0) == 1
@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.stubs import FakeChatModel
+from ocrorchestrator.datamodels.api_io import OCRRequest
+
+
+def _request(image: str, fields) -> OCRRequest:
+    return OCRRequest(
+        image=image,
+        category="test",
+        task="llm",
+        fields=fields,
+        log_result=False,
+    )
+
+
+def test_concurrent_requests_keep_their_fields(make_llm, images):
+    # The fake model answers with the fields its prompt asks for, and its
+    # latency keeps requests with different fields in flight together
+    llm = make_llm(fields=None, latency_ms=5)
+    field_sets = [["invoice_no"], ["total", "date"]]
+    reqs = [_request(images[i % len(images)], field_sets[i % 2]) for i in range(32)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(llm.process, reqs))
+
+    for req, result in zip(reqs, results):
+        assert set(result) == {field.name for field in req.fields}
+
+
+@pytest.mark.parametrize("style", ["compact", "schema"])
+def test_fix_prompt_uses_the_task_format_style(make_llm, images, style):
+    llm = make_llm(format_instructions=style)
+    prompts = []
+
+    def respond(messages):
+        content = messages[0].content
+        if isinstance(content, str):
+            prompts.append(content)
+            return '{"invoice_no": "A-1", "total": "3"}'
+        return "not json"
+
+    llm.model = FakeChatModel(0, respond)
+
+    result = llm.process(_request(images[0], ["invoice_no", "total"]))
+
+    assert result == {"invoice_no": "A-1", "total": "3"}
+    assert llm.format_instructions(llm.output_parser) in prompts[0]
+    assert ('"properties"' in prompts[0]) == (style == "schema")
@@ -0,0 +1,116 @@
+import json
+from typing import Any, List
+
+from benchmarks.stubs import FakeChatModel
+from ocrorchestrator.datamodels.api_io import AppException, OCRRequest
+
+
+class PackedAnswers:
+    """
+    Fake model answers naming the image each output came from, so results
+    can be matched to their request. Labels in `drop` are left out of
+    packed answers.
+    """
+
+    def __init__(self, images: List[str], drop=()):
+        self.images = images
+        self.drop = set(drop)
+        self.calls: List[int] = []  # images per model call
+
+    def _output(self, url: str) -> dict:
+        return {"invoice_no": str(self.images.index(url.split(",", 1)[1]))}
+
+    def __call__(self, messages: List[Any]) -> str:
+        content = messages[0].content
+        urls = [
+            part["image_url"]["url"] for part in content if part["type"] == "image_url"
+        ]
+        self.calls.append(len(urls))
+        if len(urls) == 1:
+            return json.dumps(self._output(urls[0]))
+        return json.dumps(
+            {
+                f"doc_{i}": self._output(url)
+                for i, url in enumerate(urls)
+                if i not in self.drop
+            }
+        )
+
+
+def _requests(images: List[str], fields=None) -> List[OCRRequest]:
+    return [
+        OCRRequest(
+            image=image,
+            category="test",
+            task="llm",
+            fields=fields,
+            log_result=False,
+        )
+        for image in images
+    ]
+
+
+def test_packed_call_splits_results_in_request_order(make_llm, images):
+    llm = make_llm(batch_size=8)
+    answers = PackedAnswers(images)
+    llm.model = FakeChatModel(0, answers)
+    order = [4, 2, 0, 3, 1]
+
+    results = llm.process_batch(_requests([images[i] for i in order]))
+
+    assert answers.calls == [5]
+    assert [result["invoice_no"] for result in results] == [str(i) for i in order]
+
+
+def test_packed_calls_are_chunked_by_batch_size(make_llm, images):
+    llm = make_llm(batch_size=2)
+    answers = PackedAnswers(images)
+    llm.model = FakeChatModel(0, answers)
+
+    results = llm.process_batch(_requests(images[:5]))
+
+    # The last chunk holds a single image, sent as a normal call
+    assert answers.calls == [2, 2, 1]
+    assert [result["invoice_no"] for result in results] == ["0", "1", "2", "3", "4"]
+
+
+def test_dropped_labels_fall_back_to_single_calls(make_llm, images):
+    llm = make_llm(batch_size=8)
+    answers = PackedAnswers(images, drop={1, 3})
+    llm.model = FakeChatModel(0, answers)
+
+    results = llm.process_batch(_requests(images[:5]))
+
+    assert answers.calls == [5, 1, 1]
+    assert [result["invoice_no"] for result in results] == ["0", "1", "2", "3", "4"]
+
+
+def test_failed_packed_call_is_not_retried_per_image(make_llm, images):
+    llm = make_llm(batch_size=8)
+    calls = []
+
+    def respond(messages):
+        calls.append(messages)
+        raise RuntimeError("model down")
+
+    llm.model = FakeChatModel(0, respond)
+
+    results = llm.process_batch(_requests(images[:3]))
+
+    assert len(calls) == 1
+    assert all(isinstance(result, AppException) for result in results)
+
+
+def test_requests_are_packed_per_field_set(make_llm, images):
+    llm = make_llm(fields=None, batch_size=8)
+    answers = PackedAnswers(images)
+    llm.model = FakeChatModel(0, answers)
+    reqs = _requests(images[:3], fields=["invoice_no"]) + _requests(
+        images[3:5], fields=["invoice_no", "total"]
+    )
+
+    results = llm.process_batch(reqs)
+
+    assert sorted(answers.calls) == [2, 3]
+    assert [result["invoice_no"] for result in results] == ["0", "1", "2", "3", "4"]
+    assert "total" in results[3] and "total" not in results[0]
@@ -0,0 +1,89 @@
+import base64
+import json
+
+import fitz
+
+from ocrorchestrator.datamodels.api_io import OCRRequestOffline
+from ocrorchestrator.repos import LocalRepo
+from ocrorchestrator.repos.manifest import Manifest
+
+
+def _repo(tmp_path) -> LocalRepo:
+    return LocalRepo(str(tmp_path), str(tmp_path / "local"))
+
+
+def _reloaded(manifest: Manifest) -> Manifest:
+    # What the next run of the same job sees
+    fresh = Manifest(manifest.repo, "out/")
+    fresh.load()
+    return fresh
+
+
+def test_source_completes_once_every_result_is_written(tmp_path):
+    manifest = Manifest(_repo(tmp_path), "out/")
+    manifest.expect("a.pdf", ["a_p0", "a_p1"])
+    manifest.expect("b.png", ["b"])
+
+    manifest.on_written(["a_p0", "b"])
+    assert "b.png" in manifest and "a.pdf" not in manifest
+    manifest.flush()
+    assert "a.pdf" not in _reloaded(manifest)
+
+    manifest.on_written(["a_p1", "unknown"])
+    manifest.flush()
+    assert "a.pdf" in _reloaded(manifest)
+
+
+def test_segments_of_every_run_are_loaded(tmp_path):
+    repo = _repo(tmp_path)
+    first, second = Manifest(repo, "out/", flush_every=2), Manifest(repo, "out/")
+    for name in ("a", "b", "c"):
+        first.expect(f"{name}.png", [name])
+        first.on_written([name])
+    # The first two were flushed by on_written, the last is still unsaved
+    assert len(list(repo.iter_objects("out/_manifest/"))) == 1
+    first.flush()
+    second.expect("d.png", [])  # nothing to wait for, e.g. an empty PDF
+    second.flush()
+
+    segments = repo.iter_objects("out/_manifest/")
+    batches = sorted(json.loads((tmp_path / path).read_text()) for path in segments)
+    assert batches == [["a.png", "b.png"], ["c.png"], ["d.png"]]
+    assert _reloaded(first).load() == 4
+
+
+def _offline_request() -> OCRRequestOffline:
+    return OCRRequestOffline(
+        location="file://bucket/docs/",
+        guid="job",
+        category="test",
+        task="llm",
+        pdf_options={"dpi": 20},
+        save_options={"path": "file://bucket/out/"},
+        log_result=False,
+    )
+
+
+def _write_pdf(path, pages: int):
+    doc = fitz.open()
+    for idx in range(pages):
+        doc.new_page(width=120, height=80).insert_text((10, 40), f"page {idx}")
+    doc.save(str(path))
+    doc.close()
+
+
+def test_resumed_job_skips_completed_files(make_llm, local_fs, images):
+    folder = local_fs / "bucket" / "docs"
+    folder.mkdir(parents=True)
+    _write_pdf(folder / "a.pdf", 2)
+    (folder / "x.png").write_bytes(base64.b64decode(images[0]))
+    llm = make_llm()
+
+    first = llm.process_offline(_offline_request())
+    _write_pdf(folder / "b.pdf", 1)
+    second = llm.process_offline(_offline_request())
+    third = llm.process_offline(_offline_request())
+
+    assert first == {"saved_count": 3, "skipped_count": 0}
+    assert second == {"saved_count": 1, "skipped_count": 2}
+    assert third == {"saved_count": 0, "skipped_count": 3}
@@ -0,0 +1,37 @@
+import fitz
+
+from ocrorchestrator.datamodels.api_io import FieldInfo, OCRRequestOffline
+
+
+def _write_pdf(path, pages: int):
+    doc = fitz.open()
+    for idx in range(pages):
+        doc.new_page(width=120, height=80).insert_text((10, 40), f"page {idx}")
+    doc.save(str(path))
+    doc.close()
+
+
+def test_folder_of_pdfs_keeps_each_page_source(make_llm, local_fs):
+    folder = local_fs / "bucket" / "docs"
+    folder.mkdir(parents=True)
+    _write_pdf(folder / "a.pdf", 2)
+    _write_pdf(folder / "b.pdf", 1)
+    llm = make_llm()
+    req = OCRRequestOffline(
+        location="file://bucket/docs/",
+        guid="job",
+        category="test",
+        task="llm",
+        pdf_options={"dpi": 20},
+        log_result=False,
+    )
+
+    results = llm.process_offline(req)
+
+    assert sorted((r["source"], r["page"]) for r in results) == [
+        ("docs/a.pdf", 0),
+        ("docs/a.pdf", 1),
+        ("docs/b.pdf", 0),
+    ]
+    projected = llm.format_response(results, [FieldInfo(name="total")])
+    assert {"total": "stub", "source": "docs/b.pdf", "page": 0} in projected
@@ -0,0 +1,63 @@
+import pytest
+
+from ocrorchestrator.utils.parsing import parse_partial_json, strip_fences
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"a": 1}', {"a": 1}),
+        ('```json\n{"a": 1}\n```', {"a": 1}),
+        ('Here it is:\n```json\n{"a": 1}\n```\nDone.', {"a": 1}),
+        ('{"a": "x"} ```', {"a": "x"}),
+        (
+            'Result: {"code": "```py\\nprint(1)\\n```"} as asked',
+            {"code": "```py\nprint(1)\n```"},
+        ),
+        ('```\n{"code": "a ``` b"}\n```', {"code": "a ``` b"}),
+        ('[{"a": 1}, {"a": 2}]', [{"a": 1}, {"a": 2}]),
+        ('{"a": "line\nbreak"}', {"a": "line\nbreak"}),
+    ],
+)
+def test_parses_without_repair(text, expected):
+    assert parse_partial_json(text) == (expected, False)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"a": 1, "b": 2,}', {"a": 1, "b": 2}),
+        ('{"a": [1, 2,], "b": {"c": 3,},}', {"a": [1, 2], "b": {"c": 3}}),
+        # Truncated: the unterminated trailing member is dropped, not closed
+        ('{"a": 1, "name": "Jo', {"a": 1}),
+        ('{"a": 1, "b": tru', {"a": 1}),
+        ('{"a": 1, "b": 2', {"a": 1}),
+        ('{"a": "x", "b": {"c": [1, 2', {"a": "x"}),
+        ('{"a": "x, y", "b": "z\\"', {"a": "x, y"}),
+        ('[{"a": 1}, {"a": 2}, {"a"', [{"a": 1}, {"a": 2}]),
+    ],
+)
+def test_repairs(text, expected):
+    assert parse_partial_json(text) == (expected, True)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{"name": "Jo',
+        '{"a": tru',
+        '{"a": [1, 2',
+        "no json here",
+        "{not json}",
+    ],
+)
+def test_unrecoverable_output_raises(text):
+    with pytest.raises(ValueError):
+        parse_partial_json(text)
+
+
+def test_strip_fences_only_strips_an_opening_fence():
+    assert strip_fences('```json\n{"a": 1}\n```') == '{"a": 1}\n```'
+    assert strip_fences('{"a": "```"}') == '{"a": "```"}'
+    assert strip_fences('{"a": 1} ```') == '{"a": 1} ```'
+    assert strip_fences("plain") == "plain"
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import fitz
+import pytest
+
+from ocrorchestrator.utils import pdf
+from ocrorchestrator.utils.pdf import render_pdf_page, render_pdf_pages
+
+SRC = Path(__file__).parent.parent / "src"
+
+
+def _pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for idx in range(pages):
+        doc.new_page(width=120, height=80).insert_text((10, 40), f"page {idx}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_render_workers_import_no_ml_libraries():
+    # What a spawned render worker imports to unpickle its task
+    probe = (
+        "import sys, ocrorchestrator.utils.pdf; "
+        "heavy = ('torch', 'torchvision', 'vertexai', 'langchain_core'); "
+        "print([m for m in heavy if m in sys.modules])"
+    )
+    env = {**os.environ, "PYTHONPATH": str(SRC)}
+
+    out = subprocess.run(
+        [sys.executable, "-c", probe],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert out.stdout.strip().splitlines()[-1] == "[]"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_render_pages_in_page_order(workers, monkeypatch):
+    # One worker renders in-process, more use the spawned pool
+    monkeypatch.setattr(pdf, "PDF_MAX_WORKERS", workers)
+    data = _pdf(5)
+
+    rendered = render_pdf_pages(data, pages=[4, 0, 2], dpi=20)
+
+    assert [page for page, _ in rendered] == [0, 2, 4]
+    assert all(image.startswith(b"\x89PNG") for _, image in rendered)
+    assert render_pdf_page(data, 2, dpi=20) == dict(rendered)[2]
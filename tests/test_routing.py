@@ -0,0 +1,130 @@
+import random
+from collections import Counter
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from benchmarks.stubs import FakeChatModel
+from ocrorchestrator.config.app_config import ModelEndpoint
+from ocrorchestrator.utils.routing import ModelRouter
+
+MESSAGES = [HumanMessage(content="extract")]
+
+
+@pytest.fixture(autouse=True)
+def _seed():
+    # Endpoint picks are random, keep them the same from run to run
+    random.seed(7)
+
+
+class Answers:
+    """Answers with the endpoint's name, counting the calls it gets."""
+
+    def __init__(self):
+        self.calls = Counter()
+
+    def __call__(self, name: str, fail: Exception = None):
+        def respond(messages):
+            self.calls[name] += 1
+            if fail is not None:
+                raise fail
+            return name
+
+        return respond
+
+
+def _router(*models) -> ModelRouter:
+    return ModelRouter(
+        [(ModelEndpoint(model=f"ep{i}"), model) for i, model in enumerate(models)],
+        task="test__llm",
+    )
+
+
+def _stats(router: ModelRouter) -> dict:
+    return {stat["endpoint"]: stat for stat in router.stats()}
+
+
+def test_quota_error_fails_over_and_cools_down():
+    answers = Answers()
+    router = _router(
+        FakeChatModel(0, answers("ep0"), error_rate=1.0),
+        FakeChatModel(0, answers("ep1")),
+    )
+
+    results = [router.invoke(MESSAGES).content for _ in range(10)]
+
+    assert results == ["ep1"] * 10
+    stats = _stats(router)
+    # Quota errors happen before the answer, and the cooldown stops retries
+    assert stats["ep0"]["calls"] <= 1
+    assert stats["ep0"]["errors"] == stats["ep0"]["calls"]
+    assert stats["ep1"]["calls"] == 10
+    if stats["ep0"]["calls"]:
+        assert stats["ep0"]["cooldown_s"] > 0
+
+
+def test_stream_fails_over_before_first_chunk():
+    answers = Answers()
+    router = _router(
+        FakeChatModel(0, answers("ep0"), error_rate=1.0),
+        FakeChatModel(0, answers("ep1")),
+    )
+
+    for _ in range(5):
+        chunks = [chunk.content for chunk in router.stream(MESSAGES, chunk_chars=1)]
+        assert "".join(chunks) == "ep1"
+
+
+def test_other_errors_are_raised_without_failover():
+    answers = Answers()
+    router = _router(
+        FakeChatModel(0, answers("ep0", ValueError("bad request"))),
+        FakeChatModel(0, answers("ep1")),
+    )
+
+    ok = 0
+    for _ in range(20):
+        try:
+            router.invoke(MESSAGES)
+            ok += 1
+        except ValueError:
+            pass
+
+    # ep1 only answers calls that went to it first
+    assert answers.calls["ep1"] == ok
+    assert answers.calls["ep0"] == 20 - ok
+    assert _stats(router)["ep0"]["cooldown_s"] == 0
+
+
+def test_failing_endpoint_is_not_preferred():
+    answers = Answers()
+    router = _router(
+        FakeChatModel(0, answers("ep0", ValueError("bad request"))),
+        FakeChatModel(0, answers("ep1")),
+    )
+
+    for _ in range(100):
+        try:
+            router.invoke(MESSAGES)
+        except ValueError:
+            pass
+
+    # Once measured, ep0 is only tried when drawn twice, about 1 in 4 calls
+    assert answers.calls["ep0"] < 40
+    assert _stats(router)["ep0"]["error_rate"] > 0.5
+
+
+def test_faster_endpoint_is_preferred():
+    answers = Answers()
+    router = _router(
+        FakeChatModel(20, answers("ep0")),
+        FakeChatModel(1, answers("ep1")),
+    )
+
+    for _ in range(40):
+        router.invoke(MESSAGES)
+
+    stats = _stats(router)
+    assert stats["ep0"]["latency_ms"] > stats["ep1"]["latency_ms"]
+    assert answers.calls["ep1"] > 2 * answers.calls["ep0"]
+    assert stats["ep0"]["errors"] == stats["ep1"]["errors"] == 0
@@ -0,0 +1,145 @@
+import json
+
+import pytest
+import structlog
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from benchmarks.stubs import FakeChatModel
+from ocrorchestrator.datamodels.api_io import AppException, OCRRequest
+from ocrorchestrator.deps import proc_manager
+from ocrorchestrator.routers import ocr_router, stream_request
+from ocrorchestrator.utils.constants import ErrorCode
+from ocrorchestrator.utils.logging import LoggerMiddleware
+from ocrorchestrator.utils.parsing import JSONFieldStream
+
+# Commas, braces, quotes and escapes inside strings, and a nested value
+ANSWER = (
+    '```json\n{"name": "Jo \\"JJ\\" Doe", "note": "a, b} [c", '
+    '"nested": {"x": [1, 2]}, "path": "C:\\\\tmp\\\\", "city": "K\\u00f6ln"}\n```'
+)
+FIELDS = [
+    ("name", 'Jo "JJ" Doe'),
+    ("note", "a, b} [c"),
+    ("nested", {"x": [1, 2]}),
+    ("path", "C:\\tmp\\"),
+    ("city", "Köln"),
+]
+
+
+def _feed(chunks):
+    stream = JSONFieldStream()
+    fields = []
+    for chunk in chunks:
+        fields.extend(stream.feed(chunk))
+    return fields
+
+
+@pytest.mark.parametrize("split", range(len(ANSWER) + 1))
+def test_field_stream_split_anywhere(split):
+    assert _feed([ANSWER[:split], ANSWER[split:]]) == FIELDS
+
+
+def test_field_stream_emits_each_field_once_it_is_complete():
+    # Each member completes at the comma or brace that follows it
+    ends = [ANSWER.index(', "note"'), ANSWER.index(', "nested"')]
+    ends += [ANSWER.index(', "path"'), ANSWER.index(', "city"')]
+    ends.append(ANSWER.rindex("}"))
+    stream = JSONFieldStream()
+    emitted = []
+    for i, ch in enumerate(ANSWER):
+        emitted.extend((i, field) for field in stream.feed(ch))
+
+    assert emitted == list(zip(ends, FIELDS))
+    assert stream.done
+
+
+def _request(image: str, fields=None) -> OCRRequest:
+    return OCRRequest(
+        image=image,
+        category="test",
+        task="llm",
+        fields=fields,
+        log_result=False,
+    )
+
+
+@pytest.mark.parametrize("chunk_chars", [1, 3, 16, 1000])
+def test_process_stream_events(make_llm, images, chunk_chars):
+    llm = make_llm()
+    answer = {"invoice_no": 'INV "7", b', "total": "12.50"}
+    model = FakeChatModel(0, lambda messages: json.dumps(answer))
+    llm.model.stream = lambda messages, **kwargs: model.stream(
+        messages, chunk_chars=chunk_chars
+    )
+
+    events = list(llm.process_stream(_request(images[0])))
+
+    assert events[0] == ("start", None)
+    assert events[1:3] == [
+        ("field", {"name": "invoice_no", "value": 'INV "7", b'}),
+        ("field", {"name": "total", "value": "12.50"}),
+    ]
+    assert events[3][0] == "result"
+    assert events[3][1]["invoice_no"] == 'INV "7", b'
+    assert len(events) == 4
+
+
+def test_stream_request_error_after_start(make_llm, images):
+    llm = make_llm()
+
+    def respond(messages):
+        raise RuntimeError("model down")
+
+    llm.model = FakeChatModel(0, respond)
+
+    events = list(stream_request(_request(images[0]), llm))
+
+    assert [event["event"] for event in events] == ["start", "error"]
+    assert events[1]["status_code"] == 500
+
+
+def test_stream_request_raises_before_start(make_llm, images, monkeypatch):
+    llm = make_llm()
+
+    def reject(*args, **kwargs):
+        raise AppException(ErrorCode.TOO_MANY_REQUESTS, "Over budget")
+
+    monkeypatch.setattr(llm.budget, "acquire", reject)
+
+    with pytest.raises(AppException):
+        next(stream_request(_request(images[0]), llm))
+
+
+def test_predict_stream_route(make_llm, images, monkeypatch):
+    llm = make_llm()
+    labels = {}
+
+    def respond(messages):
+        labels.update(structlog.contextvars.get_contextvars())
+        return json.dumps({"invoice_no": "A-1", "total": "3"})
+
+    llm.model = FakeChatModel(0, respond)
+    monkeypatch.setitem(proc_manager.processors, "test__llm", llm)
+    app = FastAPI()
+    app.add_middleware(LoggerMiddleware)
+    app.include_router(ocr_router)
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/ocrorchestrator/predict_stream",
+            json={
+                "image": images[0],
+                "category": "test",
+                "task": "llm",
+                "fields": ["total"],
+                "log_result": False,
+            },
+        )
+
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [event["event"] for event in events] == ["start", "field", "result"]
+    assert events[1] == {"event": "field", "name": "total", "value": "3"}
+    # Logging middleware labels streaming requests like /predict
+    assert labels["category"] == "test" and labels["task"] == "llm"